@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from admin_panel.metrics import backfill
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales, order status and product sales rollups from the order tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat,
+                            help='Only rebuild days on or after this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        backfill(since=options['since'])
+        since = options['since'] or 'the beginning'
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt dashboard metrics since {since}"))
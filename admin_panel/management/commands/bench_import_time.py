@@ -0,0 +1,93 @@
+import os
+import resource
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules web workers must not import at startup; model-building code imports them lazily
+HEAVY_MODULES = ('numpy', 'scipy', 'pandas', 'sklearn', 'joblib')
+MARKER = '-- bench_import_time --'
+
+COLD_START = f"""
+import sys
+sys.stderr.write({MARKER!r} + '\\n')
+sys.stderr.flush()
+import sentimart.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+"""
+
+
+def parse_importtime(output):
+    """(module, self us, cumulative us, depth) of every import logged after the marker"""
+    rows = []
+    started = False
+    for line in output.splitlines():
+        if line == MARKER:
+            started = True
+            continue
+        if not started or not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(own), int(cumulative), (len(name) - len(name.lstrip()) - 1) // 2))
+    return rows
+
+
+def importer_of(rows, index):
+    """The module whose import pulled in ``rows[index]``; children are logged before their parent"""
+    depth = rows[index][3]
+    for name, _, _, row_depth in rows[index + 1:]:
+        if row_depth < depth:
+            return name
+    return 'the cold start script'
+
+
+def cold_start():
+    """Import log of a fresh interpreter loading the WSGI application and the URLconf"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'sentimart.settings'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', COLD_START],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise CommandError(f"Cold start failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+class Command(BaseCommand):
+    help = 'Measure the cold-start import time of sentimart.wsgi with -X importtime and fail over budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters to time; the median is reported')
+        parser.add_argument('--top', type=int, default=10, help='Packages to list by import time')
+        parser.add_argument('--max-ms', type=float, default=800.0, help='Fail if the median import time is above this')
+        parser.add_argument('--max-rss-mb', type=float, help='Fail if a cold start peaks above this resident memory')
+
+    def handle(self, *args, **options):
+        totals = []
+        for _ in range(max(1, options['repeat'])):
+            rows = cold_start()
+            totals.append(sum(cumulative for _, _, cumulative, depth in rows if depth == 0))
+        # ru_maxrss of the largest child so far, in kilobytes on Linux
+        rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+        median_ms = statistics.median(totals) / 1000
+
+        packages = Counter()
+        for name, own, _, _ in rows:
+            packages[name.split('.')[0]] += own
+        for package, own in packages.most_common(options['top']):
+            self.stdout.write(f"{own / 1000:8.1f} ms  {package}")
+        self.stdout.write(f"Cold start: {median_ms:.1f} ms median over {len(totals)} runs, peak RSS {rss_mb:.0f} MB")
+
+        heavy = [f"{name} (from {importer_of(rows, i)})" for i, (name, _, _, _) in enumerate(rows) if name in HEAVY_MODULES]
+        if heavy:
+            raise CommandError(f"sentimart.wsgi imports {', '.join(heavy)} at startup")
+        if median_ms > options['max_ms']:
+            raise CommandError(f"Cold start {median_ms:.1f} ms, budget is {options['max_ms']} ms")
+        if options['max_rss_mb'] is not None and rss_mb > options['max_rss_mb']:
+            raise CommandError(f"Cold start peak RSS {rss_mb:.0f} MB, budget is {options['max_rss_mb']} MB")
+        self.stdout.write(self.style.SUCCESS('Cold start within budget'))
@@ -0,0 +1,140 @@
+from datetime import date
+from itertools import count
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from accounts.models import User
+from buyer.models import Buyer
+from categories.models import Category
+from delivery_agent.models import DeliveryAgent
+from products.models import (
+    CartItem, Order, OrderItem, Product, ProductAttribute, ProductAttributeValue, ProductVariant, Review,
+)
+from recommendations.tracking import view_counter
+from seller.models import Seller
+from sentimart.benchmarks import check_query_growth, scratch_database
+
+serial = count()
+
+
+def make_user(user_type):
+    n = next(serial)
+    user = User.objects.create(username=f'budget-{user_type}-{n}', email=f'{n}@example.com', user_type=user_type)
+    if user_type == 'buyer':
+        Buyer.objects.create(user=user, phone_number='9999999999')
+    elif user_type == 'seller':
+        Seller.objects.create(user=user, phone_number='9999999999', business_name=f'Shop {n}', is_approved=True)
+    elif user_type == 'delivery_agent':
+        DeliveryAgent.objects.create(
+            user=user, phone='9999999999', city='Kochi', location='Kochi', pincode='682001',
+            licence_number=str(n), licence_expiry_date=date(2030, 1, 1), driving_licence='driving_licences/x.jpg',
+        )
+    return user
+
+
+class Fixture:
+    """Users and catalog shared by every view check"""
+
+    def __init__(self):
+        self.category = Category.objects.create(name='Budget', image='categories/budget.jpg')
+        self.seller = make_user('seller')
+        self.buyer = make_user('buyer')
+        self.admin = make_user('admin')
+        self.agent = make_user('delivery_agent').delivery_agent_profile
+        make_user('delivery_agent')
+        self.product = self.make_product()
+        colour = ProductAttribute.objects.create(name='Colour')
+        size = ProductAttribute.objects.create(name='Size')
+        self.values = [
+            ProductAttributeValue.objects.create(attribute=colour, value='Blue'),
+            ProductAttributeValue.objects.create(attribute=size, value='XL'),
+        ]
+
+    def make_product(self, status='approved'):
+        n = next(serial)
+        return Product.objects.create(
+            seller=self.seller, category=self.category, sub_category='budget', name=f'Budget product {n}',
+            description='', image='products/budget.jpg', brand_name='Budget', model_number=str(n),
+            base_price=100, discount=10, stock=50, status=status, sku=f'budget-{n}',
+        )
+
+    def make_order(self, user=None, status='Pending', **kwargs):
+        order = Order.objects.create(user=user or self.buyer, total_price=200, status=status, **kwargs)
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, price=100)
+        OrderItem.objects.create(order=order, product=self.make_product(), quantity=1, price=100)
+        return order
+
+    def make_cart_item(self):
+        product = self.make_product()
+        variant = ProductVariant.objects.create(product=product, price=100, stock=5)
+        variant.attributes.set(self.values)
+        CartItem.objects.create(user=self.buyer, product=product, variant=variant)
+
+
+def view_checks(fx):
+    """(label, user, url, seed) for each listing view"""
+    return [
+        ('buyer orders', fx.buyer, reverse('orders'),
+         lambda: fx.make_order()),
+        ('buyer cart', fx.buyer, reverse('cart'),
+         fx.make_cart_item),
+        ('product detail', fx.buyer, reverse('product-detail', kwargs={'pk': fx.product.pk}),
+         lambda: Review.objects.create(product=fx.product, user=make_user('buyer'), rating=4, comment='ok')),
+        ('category products', fx.buyer, reverse('category_products', kwargs={'slug': fx.category.slug}),
+         fx.make_product),
+        ('seller products', fx.seller, reverse('view_products'),
+         fx.make_product),
+        ('seller orders', fx.seller, reverse('seller_orders'),
+         lambda: fx.make_order(user=make_user('buyer'))),
+        ('admin products', fx.admin, reverse('manage_products') + '?status=approved',
+         fx.make_product),
+        ('admin buyers', fx.admin, reverse('buyers-list'),
+         lambda: make_user('buyer')),
+        ('admin sellers', fx.admin, reverse('sellers-list'),
+         lambda: make_user('seller')),
+        ('admin orders', fx.admin, reverse('order_management'),
+         lambda: fx.make_order(user=make_user('buyer'))),
+        ('delivery requests', fx.agent.user, reverse('delivery_requests'),
+         lambda: fx.make_order(user=make_user('buyer'), status='Shipped', assigned_to=fx.agent, is_assigned=True)),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Render listing views against a scratch database and fail if their query count grows with row count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small', type=int, default=2)
+        parser.add_argument('--large', type=int, default=12)
+        parser.add_argument('--max-queries', type=int, default=15)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with scratch_database():
+                fx = Fixture()
+                for label, user, url, add_row in view_checks(fx):
+                    client = Client()
+                    client.force_login(user)
+
+                    def fetch():
+                        # Measure the database plan, not the catalog cache
+                        cache.clear()
+                        return client.get(url)
+
+                    counts = check_query_growth(
+                        label,
+                        lambda n: [add_row() for _ in range(n)],
+                        fetch,
+                        sizes=(options['small'], options['large']),
+                        max_queries=options['max_queries'],
+                    )
+                    self.stdout.write(f"{label}: {counts[-1]} queries")
+                # Product views are buffered; write them before the scratch database goes away
+                view_counter.flush()
+        finally:
+            teardown_test_environment()
+        self.stdout.write(self.style.SUCCESS("Every view is within its query budget"))
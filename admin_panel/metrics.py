@@ -0,0 +1,153 @@
+"""
+Daily rollups behind the admin dashboard.
+
+Orders, status changes and sold items bump per-day counters as they happen
+(admin_panel.signals, plus an explicit call from bulk code paths that skip
+signals), so the dashboard sums a few hundred small rows instead of
+scanning every order and order item on each page load. All writes are
+``F()`` increments, so concurrent requests never lose an update.
+``backfill`` rebuilds the rollups from the order tables when they drift.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from admin_panel.models import DailyOrderStatus, DailyProductSales, DailySales
+from products.models import Order, OrderItem, Product
+
+
+def order_date(order):
+    return timezone.localdate(order.created_at) if timezone.is_aware(order.created_at) else order.created_at.date()
+
+
+def _bump(model, deltas):
+    """
+    Apply ``{key: {field: delta}}`` where ``key`` is a tuple of
+    ``(field, value)`` pairs identifying one row, creating missing rows.
+    """
+    deltas = {key: changes for key, changes in deltas.items() if any(changes.values())}
+    if not deltas:
+        return
+    model.objects.bulk_create([model(**dict(key)) for key in deltas], ignore_conflicts=True)
+    match = Q()
+    for key in deltas:
+        match |= Q(**dict(key))
+    fields = {name for changes in deltas.values() for name in changes}
+    updates = {}
+    for name in fields:
+        updates[name] = F(name) + Case(
+            *[When(Q(**dict(key)), then=Value(changes.get(name, 0))) for key, changes in deltas.items()],
+            default=Value(0),
+            output_field=model._meta.get_field(name),
+        )
+    model.objects.filter(match).update(**updates)
+
+
+def record_order_created(order):
+    day = order_date(order)
+    with transaction.atomic():
+        if order.status not in Order.UNPAID_STATUSES:
+            record_order_paid(order)
+        _bump(DailyOrderStatus, {(('date', day), ('status', order.status)): {'count': 1}})
+
+
+def record_order_paid(order):
+    """Count an order in the sales figures; checkout orders are counted once their payment goes through"""
+    _bump(DailySales, {(('date', order_date(order)),): {'revenue': order.total_price, 'order_count': 1}})
+
+
+def record_status_changes(changes):
+    """Move orders between status buckets; ``changes`` is ``[(date, old, new), ...]``"""
+    net = Counter()
+    for day, old, new in changes:
+        if old == new:
+            continue
+        net[(('date', day), ('status', old))] -= 1
+        net[(('date', day), ('status', new))] += 1
+    _bump(DailyOrderStatus, {key: {'count': count} for key, count in net.items()})
+
+
+def record_order_items(order, items):
+    day = order_date(order)
+    deltas = defaultdict(lambda: {'units': 0, 'revenue': Decimal(0)})
+    for item in items:
+        row = deltas[(('date', day), ('product_id', item.product_id))]
+        row['units'] += item.quantity
+        row['revenue'] += item.price * item.quantity
+    _bump(DailyProductSales, dict(deltas))
+
+
+def backfill(since=None):
+    """
+    Recompute every rollup for orders placed on or after ``since`` (all time
+    if None). Unpaid checkout orders only count towards the status buckets.
+    """
+    orders = Order.objects.all()
+    items = OrderItem.objects.filter(order__isnull=False).exclude(order__status__in=Order.UNPAID_STATUSES)
+    if since:
+        orders = orders.filter(created_at__date__gte=since)
+        items = items.filter(order__created_at__date__gte=since)
+    orders = orders.annotate(day=TruncDate('created_at'))
+    items = items.annotate(day=TruncDate('order__created_at'))
+
+    with transaction.atomic():
+        for model in (DailySales, DailyOrderStatus, DailyProductSales):
+            stale = model.objects.all()
+            if since:
+                stale = stale.filter(date__gte=since)
+            stale.delete()
+
+        DailySales.objects.bulk_create([
+            DailySales(date=row['day'], revenue=row['revenue'] or 0, order_count=row['orders'])
+            for row in orders.exclude(status__in=Order.UNPAID_STATUSES).values('day').annotate(
+                revenue=Sum('total_price'), orders=Count('id'),
+            )
+        ], batch_size=1000)
+        DailyOrderStatus.objects.bulk_create([
+            DailyOrderStatus(date=row['day'], status=row['status'], count=row['orders'])
+            for row in orders.values('day', 'status').annotate(orders=Count('id'))
+        ], batch_size=1000)
+        DailyProductSales.objects.bulk_create([
+            DailyProductSales(date=row['day'], product_id=row['product_id'], units=row['units'], revenue=row['revenue'] or 0)
+            for row in items.values('day', 'product_id').annotate(
+                units=Sum('quantity'), revenue=Sum(F('price') * F('quantity')),
+            )
+        ], batch_size=1000)
+
+
+def sales_summary(today=None):
+    """Revenue and order totals: overall, this week and this month"""
+    today = today or timezone.localdate()
+    start_week = today - timedelta(days=today.weekday())
+    start_month = today.replace(day=1)
+    totals = DailySales.objects.aggregate(
+        total_revenue=Sum('revenue'),
+        weekly_revenue=Sum('revenue', filter=Q(date__gte=start_week)),
+        monthly_revenue=Sum('revenue', filter=Q(date__gte=start_month)),
+        total_orders=Sum('order_count'),
+    )
+    return {name: value or 0 for name, value in totals.items()}
+
+
+def status_counts(*statuses):
+    """Current number of orders in each of ``statuses``"""
+    rows = DailyOrderStatus.objects.filter(status__in=statuses).values('status').annotate(total=Sum('count'))
+    counts = dict.fromkeys(statuses, 0)
+    counts.update({row['status']: row['total'] for row in rows})
+    return counts
+
+
+def best_sellers(days=30, limit=5):
+    """Products with the most units sold in the last ``days`` days"""
+    since = timezone.localdate() - timedelta(days=days)
+    return (
+        Product.objects.filter(daily_sales__date__gte=since)
+        .select_related('category')
+        .annotate(total_sold=Sum('daily_sales__units'), sales_revenue=Sum('daily_sales__revenue'))
+        .order_by('-total_sold')[:limit]
+    )
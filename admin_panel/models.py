@@ -1,3 +1,38 @@
 from django.db import models
+from products.models import Product
 
 # Create your models here.
+
+class DailySales(models.Model):
+    """Revenue and order count of the orders placed on a day"""
+    date = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date}: {self.order_count} orders, ₹{self.revenue}"
+
+class DailyOrderStatus(models.Model):
+    """How many of the orders placed on a day are currently in each status"""
+    date = models.DateField()
+    status = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'status')
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.count}"
+
+class DailyProductSales(models.Model):
+    """Units and revenue per product for the orders placed on a day"""
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'product')
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}: {self.units}"
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from admin_panel import metrics
+from products.models import Order, OrderItem
+
+@receiver(post_save, sender=Order)
+def update_order_rollups(sender, instance, created, **kwargs):
+    if created:
+        metrics.record_order_created(instance)
+    else:
+        old = getattr(instance, '_loaded_status', None)
+        if old is not None and old != instance.status:
+            metrics.record_status_changes([(metrics.order_date(instance), old, instance.status)])
+            if old in Order.UNPAID_STATUSES and instance.status not in Order.UNPAID_STATUSES:
+                metrics.record_order_paid(instance)
+    instance._loaded_status = instance.status
+
+@receiver(post_save, sender=OrderItem)
+def update_product_rollups(sender, instance, created, **kwargs):
+    # Checkout inserts items with bulk_create and records them itself
+    if created and instance.order_id:
+        metrics.record_order_items(instance.order, [instance])
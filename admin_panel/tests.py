@@ -1,3 +1,41 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from admin_panel.management.commands.check_query_budgets import Fixture, view_checks
+from recommendations.tracking import view_counter
+
+MAX_QUERIES = 15
+
+
+class QueryBudgetTests(TestCase):
+    """The listing views of check_query_budgets: a fixed number of queries, whatever the row count"""
+
+    def setUp(self):
+        self.fx = Fixture()
+
+    def tearDown(self):
+        # Product views are buffered; write them while the test database is still there
+        view_counter.flush()
+
+    def fetch(self, client, url):
+        # Measure the database plan, not the catalog cache
+        cache.clear()
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_listing_views_are_within_budget(self):
+        for label, user, url, add_row in view_checks(self.fx):
+            with self.subTest(label):
+                client = Client()
+                client.force_login(user)
+                for _ in range(2):
+                    add_row()
+                with CaptureQueriesContext(connection) as small:
+                    self.fetch(client, url)
+                self.assertLessEqual(len(small), MAX_QUERIES)
+                for _ in range(10):
+                    add_row()
+                with self.assertNumQueries(len(small)):
+                    self.fetch(client, url)
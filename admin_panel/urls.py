@@ -21,6 +21,7 @@ urlpatterns = [
 
     path('order_management', views.order_management, name='order_management'),
     path('admin/ship/<int:order_id>/', views.ship_order, name='ship_order'),
+    path('admin/dispatch/', views.dispatch_orders, name='dispatch_orders'),
 
     path('delivery-agents/', views.delivery_agents_list, name='delivery-agents-list'),
     path('delivery-agent/<int:agent_id>/', views.delivery_agent_view, name='delivery-agent-view'),
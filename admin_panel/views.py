@@ -1,16 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from seller.models import Seller
 from buyer.models import Buyer
-from delivery_agent.models import DeliveryAgent
+from delivery_agent import dispatch
+from delivery_agent.models import DeliveryAgent, OrderVisibility
 from categories.models import Category
 from products.models import Product, Order
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_POST
 from django.urls import reverse
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Sum
+from admin_panel import metrics
+from sentimart.pagination import json_page, paginate, wants_json
 # Create your views here.
 
 @login_required
@@ -21,31 +23,21 @@ def dashboard(request):
     delivery_agent_count = DeliveryAgent.objects.count()
     sellers_request_count = Seller.objects.filter(is_approved=False, is_rejected=False).count()
     
-    # Sales data
+    # Sales data, read from the daily rollups maintained by admin_panel.metrics
     today = timezone.now().date()
-    start_week = today - timedelta(days=today.weekday())
-    start_month = today.replace(day=1)
-    
-    # Revenue calculations
-    total_revenue = Order.objects.aggregate(total=Sum('total_price'))['total'] or 0
-    weekly_revenue = Order.objects.filter(
-        created_at__date__gte=start_week
-    ).aggregate(total=Sum('total_price'))['total'] or 0
-    monthly_revenue = Order.objects.filter(
-        created_at__date__gte=start_month
-    ).aggregate(total=Sum('total_price'))['total'] or 0
+    sales = metrics.sales_summary(today)
+    total_revenue = sales['total_revenue']
+    weekly_revenue = sales['weekly_revenue']
+    monthly_revenue = sales['monthly_revenue']
     
     # Order counts
-    total_orders = Order.objects.count()
-    pending_orders = Order.objects.filter(status='pending').count()
-    completed_orders = Order.objects.filter(status='completed').count()
+    total_orders = sales['total_orders']
+    statuses = metrics.status_counts('pending', 'completed')
+    pending_orders = statuses['pending']
+    completed_orders = statuses['completed']
     
     # Best selling products (last 30 days)
-    best_sellers = Product.objects.annotate(
-    total_sold=Sum('orderitems__quantity')
-    ).filter(
-        orderitems__order__created_at__gte=timezone.now()-timedelta(days=30)
-    ).order_by('-total_sold')[:5]
+    best_sellers = metrics.best_sellers(days=30, limit=5)
     
     # Recent orders
     recent_orders = Order.objects.order_by('-created_at')[:5]
@@ -74,7 +66,7 @@ def dashboard(request):
 @login_required
 @never_cache
 def seller_requests(request):
-    sellers = Seller.objects.filter(is_approved=False, is_rejected=False)
+    sellers = Seller.objects.filter(is_approved=False, is_rejected=False).select_related('user')
     return render(request, 'admin_panel/sellers_requests.html', {'sellers': sellers})
 
 @login_required
@@ -117,7 +109,9 @@ def seller_view(request, seller_id):
 @login_required
 @never_cache
 def sellers_list(request):
-    sellers = Seller.objects.filter(is_approved=True)
+    sellers = paginate(request, Seller.objects.filter(is_approved=True).select_related('user'))
+    if wants_json(request):
+        return json_page(sellers, ['id', 'user__username', 'user__email', 'business_name', 'phone_number', 'user__is_active'])
     return render(request, 'admin_panel/sellers.html', {'sellers': sellers})
 
 @login_required
@@ -132,13 +126,15 @@ def toggle_seller_status(request, seller_id):
 @login_required
 @never_cache
 def buyers_list(request):
-    buyers = Buyer.objects.all()
+    buyers = paginate(request, Buyer.objects.select_related('user'))
+    if wants_json(request):
+        return json_page(buyers, ['id', 'user__username', 'user__email', 'phone_number', 'user__is_active'])
     return render(request, 'admin_panel/buyers.html', {'buyers': buyers})
 
 @login_required
 @never_cache
 def delivery_agents_list(request):
-    agents = DeliveryAgent.objects.all()
+    agents = DeliveryAgent.objects.select_related('user')
     return render(request, 'admin_panel/delivery_agents.html', {'agents': agents})
 
 @login_required
@@ -292,6 +288,9 @@ def manage_products(request):
         products = Product.objects.filter(status=status)
     else:
         products = Product.objects.filter(seller=request.user)
+    products = paginate(request, products.select_related('seller', 'category'))
+    if wants_json(request):
+        return json_page(products, ['id', 'sku', 'name', 'status', 'stock', 'seller_id'])
     return render(request, 'admin_panel/manage_products.html', {'products': products})
 
 @login_required
@@ -312,7 +311,19 @@ def order_management(request):
         orders = Order.objects.filter(status=status).prefetch_related('items__product')
     else:
         orders = Order.objects.filter(status='Pending').prefetch_related('items__product')
-    agents = DeliveryAgent.objects.all()
+    orders = paginate(
+        request,
+        orders.select_related('user__buyer_profile', 'delivery_address'),
+        ordering=('-created_at', '-id'),
+    )
+    if wants_json(request):
+        return json_page(orders, ['id', 'created_at', 'status', 'total_price', 'assigned_to_id'])
+    index = dispatch.AgentIndex.from_database()
+    agents = list(index.agents.values())
+    for order in orders:
+        address = order.delivery_address
+        # Agents serving the delivery pincode or city, falling back to everyone
+        order.candidate_agents = (address and index.candidates(address.zip_code, address.city)) or agents
     return render(request, 'admin_panel/order_management.html',  {'orders': orders, 'agents': agents})
 
 def ship_order(request, order_id):
@@ -335,5 +346,15 @@ def ship_order(request, order_id):
         order.assigned_to = agent
         order.is_assigned = True
         order.save()
+        OrderVisibility.objects.update_or_create(order=order, agent=agent, defaults={'rejected': False})
         messages.success(request, "Order shipped and agent assigned.")
+    return redirect('order_management')
+
+@login_required
+@require_POST
+def dispatch_orders(request):
+    result = dispatch.dispatch_pending()
+    messages.success(request, f"Assigned {result.assigned} pending orders to delivery agents.")
+    if result.unassigned:
+        messages.warning(request, f"{result.unassigned} orders have no available agent in their pincode or city.")
     return redirect('order_management')
\ No newline at end of file
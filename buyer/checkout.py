@@ -0,0 +1,180 @@
+"""
+Order placement from a buyer's cart.
+
+Everything happens in one transaction with a fixed number of queries no
+matter how many items the cart holds: one joined read of the cart, one
+conditional stock update for all products, one insert for the order and one
+bulk insert for its items, followed by the dashboard rollup updates that the
+per-item OrderItem signals would otherwise do. The recommendation updates
+are queued as a single background job for the whole order.
+
+The order waits in ``pending_payment`` holding its stock; the sales
+rollups and the recommendation updates are only recorded once it is paid. Placing the order
+again while it waits reuses it if the cart is unchanged and replaces it
+otherwise. An order still unpaid after ``CHECKOUT_PAYMENT_TIMEOUT`` seconds
+is moved to ``payment_expired`` by the ``release_unpaid_order`` job, which
+puts its stock back; ``manage.py release_unpaid_orders`` sweeps up any the
+job missed.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from admin_panel.metrics import record_order_items
+from products.models import CartItem, Order, OrderItem, Product
+from recommendations.tasks import record_purchases
+from tasks.queue import task
+
+PAYMENT_TIMEOUT = getattr(settings, 'CHECKOUT_PAYMENT_TIMEOUT', 30 * 60)
+PENDING_PAYMENT = 'pending_payment'
+PAYMENT_EXPIRED = 'payment_expired'
+
+
+class CheckoutError(Exception):
+    """Raised when the cart cannot be turned into an order"""
+
+
+def _per_product(quantities):
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def reserve_stock(quantities, products):
+    """
+    Decrement stock for ``{product_id: quantity}`` only if every product has
+    enough left. Must run inside a transaction; raises CheckoutError otherwise.
+    """
+    enough = Q()
+    for product_id, quantity in quantities.items():
+        enough |= Q(pk=product_id, stock__gte=quantity)
+
+    updated = Product.objects.filter(enough).update(stock=F('stock') - _per_product(quantities))
+    if updated != len(quantities):
+        short = next(
+            (products[pid] for pid, quantity in quantities.items() if quantity > products[pid].stock),
+            None,
+        )
+        name = short.name if short else "one of the items"
+        raise CheckoutError(f"Not enough stock for {name}.")
+
+
+def restore_stock(quantities):
+    """Give back stock taken by reserve_stock for ``{product_id: quantity}``"""
+    Product.objects.filter(pk__in=quantities).update(stock=F('stock') + _per_product(quantities))
+
+
+def _release(order):
+    quantities = defaultdict(int)
+    for product_id, quantity in order.items.values_list('product_id', 'quantity'):
+        quantities[product_id] += quantity
+    if quantities:
+        restore_stock(quantities)
+    order.status = PAYMENT_EXPIRED
+    order.save(update_fields=['status'])
+
+
+def release_order(order_id):
+    """Cancel ``order_id`` and restore its stock if it is still unpaid; returns whether it was"""
+    with transaction.atomic():
+        order = Order.objects.select_for_update().filter(pk=order_id, status=PENDING_PAYMENT).first()
+        if order is None:
+            return False
+        _release(order)
+    return True
+
+
+@task
+def release_unpaid_order(order_id):
+    release_order(order_id)
+
+
+def unpaid_orders(timeout=PAYMENT_TIMEOUT):
+    """Orders that have waited for payment longer than ``timeout`` seconds"""
+    return Order.objects.filter(status=PENDING_PAYMENT, created_at__lt=timezone.now() - timedelta(seconds=timeout))
+
+
+def paid_orders():
+    """Orders past payment, the ones that can have an invoice"""
+    return Order.objects.exclude(status__in=Order.UNPAID_STATUSES)
+
+
+def _record_sale(order, order_items):
+    record_purchases.delay(order.user_id, [(item.product_id, item.quantity) for item in order_items])
+    record_order_items(order, order_items)
+
+
+def confirm_payment(order, payment_method):
+    """Mark a pending order paid and record the sale; returns False if it expired in the meantime"""
+    with transaction.atomic():
+        locked = Order.objects.select_for_update().filter(pk=order.pk, status=PENDING_PAYMENT).first()
+        if locked is None:
+            return False
+        order.payment_method = payment_method
+        order.status = 'processing'
+        order.save()
+        _record_sale(order, list(order.items.all()))
+    return True
+
+
+def _same_items(order, cart_items):
+    ordered = Counter(order.items.values_list('product_id', 'variant_id', 'quantity'))
+    return ordered == Counter((item.product_id, item.variant_id, item.quantity) for item in cart_items)
+
+
+def place_order_from_cart(user, address, status=PENDING_PAYMENT, pending_order_id=None):
+    """
+    Create an order for everything in the user's cart. Returns None if the cart is empty.
+
+    ``pending_order_id`` is an earlier unpaid order for the same cart: it is
+    returned as is if the cart has not changed, and released otherwise.
+    """
+    with transaction.atomic():
+        cart_items = list(CartItem.objects.filter(user=user).select_related('product'))
+        if not cart_items:
+            return None
+
+        if pending_order_id:
+            pending = Order.objects.select_for_update().filter(
+                pk=pending_order_id, user=user, status=PENDING_PAYMENT,
+            ).first()
+            if pending is not None:
+                if _same_items(pending, cart_items):
+                    return pending
+                _release(pending)
+
+        quantities = defaultdict(int)
+        products = {}
+        for item in cart_items:
+            quantities[item.product_id] += item.quantity
+            products[item.product_id] = item.product
+
+        reserve_stock(quantities, products)
+
+        order = Order.objects.create(
+            user=user,
+            delivery_address=address,
+            total_price=sum(item.product.base_price * item.quantity for item in cart_items),
+            status=status,
+        )
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=item.product,
+                variant_id=item.variant_id,
+                quantity=item.quantity,
+                price=item.product.base_price,
+            )
+            for item in cart_items
+        ])
+        if status == PENDING_PAYMENT:
+            release_unpaid_order.schedule(args=(order.id,), countdown=PAYMENT_TIMEOUT)
+        else:
+            _record_sale(order, order_items)
+    return order
@@ -0,0 +1,83 @@
+"""
+Invoice PDFs.
+
+An invoice is rendered to PDF once, by the create_invoice job queued after
+payment, with xhtml2pdf from ``buyer/invoice_pdf.html``. The file goes to
+the content-addressed default storage and its sha256 doubles as the ETag,
+so a download is a conditional check plus a file read; rendering only
+happens inline if a buyer asks for the PDF before the job has run.
+
+The PDF is a snapshot of the order when it was paid and is not re-rendered
+when the order changes later.
+"""
+import hashlib
+import logging
+import uuid
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from products.models import Invoice
+
+logger = logging.getLogger(__name__)
+
+
+class InvoiceRenderError(Exception):
+    """Raised when xhtml2pdf cannot render an invoice"""
+
+
+def ensure_invoice(order_id):
+    """The order's invoice, created if it does not exist yet"""
+    invoice, _ = Invoice.objects.get_or_create(
+        order_id=order_id,
+        defaults={'invoice_id': str(uuid.uuid4())[:8].upper()},
+    )
+    return invoice
+
+
+def invoices_with_orders():
+    return Invoice.objects.select_related('order__user', 'order__delivery_address').prefetch_related('order__items__product')
+
+
+def render_pdf(invoice):
+    """PDF bytes of ``invoice``"""
+    from xhtml2pdf import pisa
+
+    html = render_to_string('buyer/invoice_pdf.html', {
+        'invoice': invoice,
+        'order': invoice.order,
+        'items': invoice.order.items.all(),
+    })
+    output = BytesIO()
+    result = pisa.CreatePDF(html, dest=output, encoding='utf-8')
+    if result.err:
+        raise InvoiceRenderError(f"Could not render invoice {invoice.invoice_id}")
+    return output.getvalue()
+
+
+def store_pdf(invoice, content):
+    invoice.pdf.save(f"{invoice.invoice_id}.pdf", ContentFile(content), save=False)
+    invoice.pdf_sha256 = hashlib.sha256(content).hexdigest()
+    invoice.rendered_at = timezone.now()
+    invoice.save(update_fields=['pdf', 'pdf_sha256', 'rendered_at'])
+
+
+def ensure_pdf(invoice, force=False):
+    """Render and store the invoice PDF unless it already exists. Returns True if it rendered."""
+    if invoice.pdf and not force:
+        return False
+    store_pdf(invoice, render_pdf(invoice))
+    return True
+
+
+def render_invoices(invoice_ids, force=False):
+    """Make sure every invoice in ``invoice_ids`` has its PDF; returns how many were rendered"""
+    rendered = 0
+    for invoice in invoices_with_orders().filter(pk__in=invoice_ids).order_by('pk'):
+        try:
+            rendered += ensure_pdf(invoice, force=force)
+        except InvoiceRenderError:
+            logger.exception("Skipping invoice %s", invoice.invoice_id)
+    return rendered
@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from buyer.invoices import render_invoices
+from products.models import Invoice
+
+
+def render_batch(invoice_ids, force):
+    try:
+        return render_invoices(invoice_ids, force=force)
+    finally:
+        connections.close_all()
+
+
+def month_range(value):
+    try:
+        start = datetime.strptime(value, '%Y-%m')
+    except ValueError:
+        raise CommandError(f"Invalid month {value!r}, expected YYYY-MM")
+    end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+class Command(BaseCommand):
+    help = "Render a month's invoice PDFs in a process pool and bundle them into a zip file"
+
+    def add_arguments(self, parser):
+        last_month = (timezone.localdate().replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+        parser.add_argument('--month', default=last_month, help='Month to export as YYYY-MM (default: last month)')
+        parser.add_argument('--output', help='Zip file to write (default: invoices-<month>.zip)')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=50, help='Invoices rendered per worker task')
+        parser.add_argument('--force', action='store_true', help='Re-render PDFs that already exist')
+
+    def handle(self, *args, **options):
+        start, end = month_range(options['month'])
+        invoices = Invoice.objects.filter(created_at__gte=start, created_at__lt=end).order_by('pk')
+        ids = list(invoices.values_list('pk', flat=True))
+        if not ids:
+            self.stdout.write(f"No invoices in {options['month']}")
+            return
+
+        size = max(1, options['batch_size'])
+        batches = [ids[i:i + size] for i in range(0, len(ids), size)]
+        started = time.perf_counter()
+        if options['processes'] > 1 and len(batches) > 1:
+            # Forked workers must not share the parent's database connections
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=min(options['processes'], len(batches)),
+                mp_context=multiprocessing.get_context('fork'),
+            ) as pool:
+                rendered = sum(pool.map(render_batch, batches, [options['force']] * len(batches)))
+        else:
+            rendered = sum(render_invoices(batch, force=options['force']) for batch in batches)
+        elapsed = time.perf_counter() - started
+
+        output = options['output'] or f"invoices-{options['month']}.zip"
+        missing = 0
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for invoice_id, name in invoices.values_list('invoice_id', 'pdf').iterator():
+                if not name:
+                    missing += 1
+                    continue
+                with default_storage.open(name, 'rb') as fh:
+                    archive.writestr(f"{invoice_id}.pdf", fh.read())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {len(ids) - missing} invoices to {output}; rendered {rendered} in {elapsed:.1f}s"
+        ))
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} invoices have no PDF"))
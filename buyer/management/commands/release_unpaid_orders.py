@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from buyer.checkout import PAYMENT_TIMEOUT, release_order, unpaid_orders
+
+
+class Command(BaseCommand):
+    help = 'Cancel orders left unpaid past the payment timeout and put their stock back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=int, default=PAYMENT_TIMEOUT,
+                            help='Release orders that have waited for payment longer than this many seconds')
+
+    def handle(self, *args, **options):
+        order_ids = list(unpaid_orders(options['timeout']).values_list('id', flat=True).iterator())
+        released = sum(release_order(order_id) for order_id in order_ids)
+        self.stdout.write(self.style.SUCCESS(f"Released {released} unpaid orders"))
@@ -0,0 +1,9 @@
+from tasks.queue import task
+
+from .invoices import ensure_invoice, ensure_pdf, invoices_with_orders
+
+
+@task
+def create_invoice(order_id):
+    invoice = ensure_invoice(order_id)
+    ensure_pdf(invoices_with_orders().get(pk=invoice.pk))
@@ -1,3 +1,96 @@
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import User
+from admin_panel.models import DailyProductSales, DailySales
+from buyer.checkout import (
+    PAYMENT_EXPIRED, PENDING_PAYMENT, CheckoutError, confirm_payment, place_order_from_cart, release_order,
+)
+from buyer.models import Address, Buyer
+from categories.models import Category
+from products.models import CartItem, Order, Product
+from tasks.models import Task
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        seller = User.objects.create(username='seller', user_type='seller')
+        category = Category.objects.create(name='Checkout', image='categories/checkout.jpg')
+        self.products = [
+            Product.objects.create(
+                seller=seller, category=category, sub_category='x', name=f'Product {n}', description='',
+                image='products/x.jpg', brand_name='Acme', model_number=str(n), base_price=100, discount=0, stock=5,
+            )
+            for n in range(2)
+        ]
+        self.user = User.objects.create(username='buyer', user_type='buyer')
+        buyer = Buyer.objects.create(user=self.user, phone_number='9999999999')
+        self.address = Address.objects.create(
+            buyer=buyer, name='Home', phone_number='9999999999', street_address='1 Road',
+            city='Kochi', state='Kerala', zip_code='682001', is_default=True,
+        )
+        for product in self.products:
+            CartItem.objects.create(user=self.user, product=product, quantity=2)
+
+    def stock(self):
+        return [product.stock for product in Product.objects.filter(pk__in=[p.pk for p in self.products]).order_by('pk')]
+
+    def place(self, pending_order_id=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return place_order_from_cart(self.user, self.address, pending_order_id=pending_order_id)
+
+    def test_placing_reserves_stock_until_paid(self):
+        order = self.place()
+        self.assertEqual(order.status, PENDING_PAYMENT)
+        self.assertEqual(order.total_price, 400)
+        self.assertEqual(self.stock(), [3, 3])
+        self.assertTrue(Task.objects.filter(name='buyer.checkout.release_unpaid_order', args=[order.id]).exists())
+        # Not a sale yet
+        self.assertFalse(DailySales.objects.exists())
+        self.assertFalse(Task.objects.filter(name__startswith='recommendations').exists())
+
+    def test_not_enough_stock_reserves_nothing(self):
+        CartItem.objects.filter(product=self.products[1]).update(quantity=6)
+        with self.assertRaises(CheckoutError):
+            self.place()
+        self.assertEqual(self.stock(), [5, 5])
+        self.assertFalse(Order.objects.exists())
+
+    def test_unchanged_cart_reuses_the_pending_order(self):
+        order = self.place()
+        self.assertEqual(self.place(pending_order_id=order.id), order)
+        self.assertEqual(self.stock(), [3, 3])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_changed_cart_releases_the_pending_order(self):
+        order = self.place()
+        CartItem.objects.filter(product=self.products[0]).update(quantity=1)
+        replacement = self.place(pending_order_id=order.id)
+        self.assertNotEqual(replacement, order)
+        order.refresh_from_db()
+        self.assertEqual(order.status, PAYMENT_EXPIRED)
+        self.assertEqual(self.stock(), [4, 3])
+
+    def test_release_puts_the_stock_back_once(self):
+        order = self.place()
+        self.assertTrue(release_order(order.id))
+        self.assertFalse(release_order(order.id))
+        self.assertEqual(self.stock(), [5, 5])
+        order.refresh_from_db()
+        self.assertEqual(order.status, PAYMENT_EXPIRED)
+        # Paying too late does not revive it
+        self.assertFalse(confirm_payment(order, 'upi'))
+        self.assertFalse(DailySales.objects.exists())
+
+    def test_payment_records_the_sale(self):
+        order = self.place()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(confirm_payment(order, 'upi'))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'processing')
+        self.assertEqual(self.stock(), [3, 3])
+        self.assertEqual(DailySales.objects.get().order_count, 1)
+        self.assertEqual(DailyProductSales.objects.filter(units=2).count(), 2)
+        self.assertTrue(Task.objects.filter(name='recommendations.tasks.record_purchases').exists())
+        # A paid order is not released
+        self.assertFalse(release_order(order.id))
+        self.assertEqual(self.stock(), [3, 3])
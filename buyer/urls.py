@@ -21,6 +21,7 @@ urlpatterns = [
     path('track-order/<int:order_id>/', views.track_order_view, name='track_order'),
     path('product/<int:product_id>/review/', views.add_review, name='add_review'),
     path('buyer/invoice/<int:order_id>/', views.view_invoice, name='view_invoice'),
+    path('buyer/invoice/<int:order_id>/pdf/', views.download_invoice, name='download_invoice'),
     path('addresses/', views.address_list, name='address_list'),
     path('addresses/add/', views.add_address, name='add_address'),
     path('addresses/<int:address_id>/edit/', views.edit_address, name='edit_address'),
@@ -1,10 +1,10 @@
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from accounts.models import User
 from .models import Buyer, Address
 from django.contrib import messages
 from categories.models import Category  
-from products.models import Product, CartItem, Order, OrderItem, ProductVariant, ProductAttribute, ProductAttributeValue, Invoice
+from products.models import Product, CartItem, Order, OrderItem, ProductVariant, ProductAttribute, ProductAttributeValue, Invoice, ProductRating
 from categories.models import Category
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import never_cache
@@ -13,14 +13,23 @@ from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 import json
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F, Q
 from django.http import HttpResponseForbidden
 from .forms import ReviewForm
+from .checkout import PENDING_PAYMENT, CheckoutError, confirm_payment, paid_orders, place_order_from_cart
+from .invoices import InvoiceRenderError, ensure_invoice, ensure_pdf, invoices_with_orders
+from .tasks import create_invoice
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.template.loader import get_template
-import uuid
+from products import autocomplete, catalog_cache
+from sentimart.pagination import CURSOR_PARAM, KeysetPaginator, json_page, paginate, wants_json
+from products.search import search_products
 from recommendations.models import UserProductInteraction
-from recommendations.utils import get_popular_products, get_personalized_recommendations
+from recommendations.tracking import record_view
+from recommendations.utils import get_personalized_recommendations
 from django.db.models import Avg
 # Create your views here.
 
@@ -133,64 +142,36 @@ from django.db.models import Subquery, OuterRef
 @never_cache
 def buyer_home(request):
     
-    categories = Category.objects.all()
-    popular_products = get_popular_products(limit=8)
-    popular_product_ids = OrderItem.objects.values('product') \
-        .annotate(order_count=Count('id')) \
-        .order_by('-order_count') \
-        .values_list('product', flat=True)[:1]
-
-    best_seller = Product.objects.filter(
-        id__in=Subquery(popular_product_ids),
-        status='approved'
-    ).first()
-    
+    categories = catalog_cache.categories()
+    popular_products = catalog_cache.popular_products(limit=8)
+    best_seller = catalog_cache.best_seller()
 
     if not best_seller and popular_products:
         best_seller = popular_products[0]
     
     query = request.GET.get('q', '').strip()
     if query:
-       
-        search_results = Product.objects.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(brand_name__icontains=query) |
-            Q(model_number__icontains=query) |
-            Q(category__name__icontains=query),
-            status='approved'
-        ).distinct().order_by('-created_at')
-        
-       
-        if not search_results.exists():
-            words = query.split()
-            if len(words) > 1:
-                q_objects = Q()
-                for word in words:
-                    q_objects |= (
-                        Q(name__icontains=word) |
-                        Q(description__icontains=word) |
-                        Q(brand_name__icontains=word) |
-                        Q(model_number__icontains=word) |
-                        Q(category__name__icontains=word)
-                    )
-                search_results = Product.objects.filter(
-                    q_objects,
-                    status='approved'
-                ).distinct().order_by('-created_at')
-        
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        search_results, has_next = search_products(query, page=page)
+
         context = {
             'is_search_page': True,
             'query': query,
             'search_results': search_results,
+            'page': page,
+            'has_next': has_next,
             'categories': categories,
             'popular_products': popular_products,
             'best_seller': best_seller,
         }
+        context.update(catalog_cache.fragment_context(request))
         return render(request, 'buyer/buyer_home.html', context)
   
-    smart_phones = Product.objects.filter(category__name='Smart Phones', status='approved')
-    smart_watches = Product.objects.filter(category__name='Smart Watches', status='approved')
+    smart_phones = catalog_cache.category_shelf('Smart Phones')
+    smart_watches = catalog_cache.category_shelf('Smart Watches')
     
     personalized_products = []
     if request.user.is_authenticated:
@@ -205,6 +186,7 @@ def buyer_home(request):
         'personalized_products': personalized_products,
         'best_seller': best_seller,
     }
+    context.update(catalog_cache.fragment_context(request))
     return render(request, 'buyer/buyer_home.html', context)
 
 @csrf_exempt
@@ -213,34 +195,7 @@ def search_suggestions(request):
     suggestions = []
     
     if query and len(query) >= 2:
-        # Product suggestions
-        products = Product.objects.filter(
-            Q(name__icontains=query) |
-            Q(brand_name__icontains=query),
-            status='approved'
-        )[:3]
-        
-        # Category suggestions
-        categories = Category.objects.filter(
-            name__icontains=query
-        )[:2]
-        
-        suggestions = [
-            {
-                'type': 'product',
-                'id': p.id,
-                'name': p.name,
-                'brand_name': p.brand_name,
-                'url': reverse('product-detail', kwargs={'pk': p.id})
-            } for p in products
-        ] + [
-            {
-                'type': 'category',
-                'id': c.id,
-                'name': c.name,
-                'url': reverse('category_products', kwargs={'slug': c.slug})
-            } for c in categories
-        ]
+        suggestions = autocomplete.suggest(query)
     
     return JsonResponse({'suggestions': suggestions})
         
@@ -249,15 +204,10 @@ from datetime import datetime, timedelta
 @login_required
 @never_cache
 def product_detail(request, pk):
-    product = Product.objects.get(pk=pk)
+    product = get_object_or_404(Product.objects.select_related('rating_summary'), pk=pk)
     # Track view if user is authenticated
     if request.user.is_authenticated:
-        interaction, created = UserProductInteraction.objects.get_or_create(
-            user=request.user,
-            product=product
-        )
-        interaction.view_count += 1
-        interaction.save()
+        record_view(request.user.id, product.id)
     variants = product.variants.prefetch_related('attributes__attribute').all()
     attributes_dict = defaultdict(set)
     for variant in variants:
@@ -270,8 +220,15 @@ def product_detail(request, pk):
         for name, values in attributes_dict.items()
     ]
 
-    avg_rating = product.reviews.aggregate(avg=Avg('rating'))['avg'] or 0
-    rating_count = product.reviews.count()
+    try:
+        rating_summary = product.rating_summary
+    except ProductRating.DoesNotExist:
+        rating_summary = ProductRating(product=product)
+    reviews = KeysetPaginator(
+        product.reviews.select_related('user'),
+        ordering=('-created_at', '-id'),
+        per_page=10,
+    ).page(request.GET.get('reviews_after'))
 
     today = datetime.today()
     delivery_date = today + timedelta(days=7)
@@ -280,8 +237,10 @@ def product_detail(request, pk):
     return render(request, "buyer/product_detail.html", {
         "product": product,
         "attributes": attributes_data,
-        'avg_rating': round(avg_rating, 1),
-        'rating_count': rating_count,
+        'avg_rating': rating_summary.average,
+        'rating_count': rating_summary.count,
+        'rating_summary': rating_summary,
+        'reviews': reviews,
         'delivery_date': delivery_date,
     })
     
@@ -290,58 +249,69 @@ def product_detail(request, pk):
 @never_cache
 def add_to_cart(request, product_id):
     product = get_object_or_404(Product, pk=product_id)
-    quantity = int(request.POST.get('quantity', 1))
+    try:
+        quantity = int(request.POST.get('quantity', 1))
+    except ValueError:
+        quantity = 0
+    if quantity < 1:
+        messages.error(request, "Please choose a valid quantity.")
+        return redirect('product-detail', pk=product_id)
 
+    selected = [
+        (key, value) for key, value in request.POST.items()
+        if key not in ['csrfmiddlewaretoken', 'quantity']
+    ]
     selected_attrs = []
-    for key, value in request.POST.items():
-        if key not in ['csrfmiddlewaretoken', 'quantity']:
-            try:
-                attr = ProductAttribute.objects.get(name=key)
-                attr_val = ProductAttributeValue.objects.get(attribute=attr, value=value)
-                selected_attrs.append(attr_val.id)
-            except ProductAttributeValue.DoesNotExist:
-                messages.error(request, "Invalid product attribute selected.")
-                return redirect('product-detail', pk=product_id)
-
-    variants = ProductVariant.objects.filter(product=product)
-    matched_variant = None
+    if selected:
+        match = Q()
+        for name, value in selected:
+            match |= Q(attribute__name=name, value=value)
+        selected_attrs = list(
+            ProductAttributeValue.objects.filter(match, productvariant__product=product)
+            .values_list('id', flat=True).distinct()
+        )
+        if len(selected_attrs) != len(selected):
+            messages.error(request, "Invalid product attribute selected.")
+            return redirect('product-detail', pk=product_id)
 
-    for variant in variants:
-        variant_attr_ids = set(variant.attributes.values_list('id', flat=True))
-        if set(selected_attrs) == variant_attr_ids:
-            matched_variant = variant
-            break
+    matched_variant = ProductVariant.objects.filter(
+        product=product,
+        attribute_signature=ProductVariant.signature_for(selected_attrs)
+    ).first()
 
     if not matched_variant:
         messages.error(request, "Selected variant does not exist.")
         return redirect('product-detail', pk=product_id)
 
-    if quantity > matched_variant.stock:
-        messages.error(request, "Not enough stock for the selected variant.")
-        return redirect('product-detail', pk=product_id)
-
-    cart_item, created = CartItem.objects.get_or_create(
-        user=request.user,
-        product=product,
-        variant=matched_variant,
-        defaults={'quantity': quantity}
-    )
+    with transaction.atomic():
+        # Conditional decrement: concurrent requests cannot take the stock below zero
+        reserved = ProductVariant.objects.filter(
+            pk=matched_variant.pk, stock__gte=quantity
+        ).update(stock=F('stock') - quantity)
+        if not reserved:
+            messages.error(request, "Not enough stock for the selected variant.")
+            return redirect('product-detail', pk=product_id)
 
-    if not created:
-        cart_item.quantity += quantity
-        cart_item.save()
+        cart_item, created = CartItem.objects.get_or_create(
+            user=request.user,
+            product=product,
+            variant=matched_variant,
+            defaults={'quantity': quantity}
+        )
+        if not created:
+            CartItem.objects.filter(pk=cart_item.pk).update(quantity=F('quantity') + quantity)
 
-    matched_variant.stock -= quantity
-    matched_variant.save()
-    print("Selected attribute IDs:", selected_attrs)
-    print("Variant attributes:", list(variant.attributes.values_list('id', flat=True)))
     messages.success(request, "Product added to cart.")
     return redirect('product-detail', pk=product_id)
 
 @login_required
 @never_cache
 def cart_view(request):
-    cart_items = CartItem.objects.filter(user=request.user)
+    cart_items = list(
+        CartItem.objects.filter(user=request.user)
+        .select_related('product', 'variant')
+        .prefetch_related('variant__attributes__attribute')
+    )
     total = sum(item.total_price() for item in cart_items)
     return render(request, 'buyer/cart.html', {'cart_items': cart_items, 'total': total})
 
@@ -349,7 +319,7 @@ def cart_view(request):
 
 @login_required
 def place_order(request):
-    cart_items = CartItem.objects.filter(user=request.user)
+    cart_items = CartItem.objects.filter(user=request.user).select_related('product')
     if not cart_items.exists():
         return redirect('cart')
 
@@ -361,28 +331,16 @@ def place_order(request):
             messages.error(request, "No default address set.")
             return redirect('address_list')
 
-        total = sum(item.product.base_price * item.quantity for item in cart_items)
-
-        for item in cart_items:
-            if item.quantity > item.product.stock:
-                messages.error(request, f"Not enough stock for {item.product.name}.")
-                return redirect('cart')
-
-        # Create order but don't process it yet
-        order = Order.objects.create(
-            user=request.user,
-            delivery_address=default_address,
-            total_price=total,
-            status='pending_payment'  # Add this status to your Order model
-        )
-
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price=item.product.base_price
+        # Create order but don't process it yet; a repost or a trip back from payment reuses the unpaid one
+        try:
+            order = place_order_from_cart(
+                request.user, default_address, pending_order_id=request.session.get('current_order_id'),
             )
+        except CheckoutError as e:
+            messages.error(request, str(e))
+            return redirect('cart')
+        if order is None:
+            return redirect('cart')
 
         # Store order ID in session for payment processing
         request.session['current_order_id'] = order.id
@@ -405,14 +363,18 @@ def payment(request):
     
     order = get_object_or_404(Order, id=order_id, user=request.user)
     
-    if request.method == 'POST':
+    expired = order.status != PENDING_PAYMENT
+    if not expired and request.method == 'POST':
         # Get payment method
         payment_method = request.POST.get('payment_method')
-        # Update order with payment method
-        order.payment_method = payment_method
-        order.status = 'processing'
-        order.save()
-        
+        # Update order with payment method; fails if the unpaid order was released meanwhile
+        expired = not confirm_payment(order, payment_method)
+    if expired:
+        del request.session['current_order_id']
+        messages.error(request, "Your order was not paid in time and has been cancelled. Please place it again.")
+        return redirect('cart')
+
+    if request.method == 'POST':
         # Clear cart
         CartItem.objects.filter(user=request.user).delete()
         
@@ -420,8 +382,8 @@ def payment(request):
         if 'current_order_id' in request.session:
             del request.session['current_order_id']
         
-        # Create invoice
-        Invoice.objects.create(order=order, invoice_id=str(uuid.uuid4())[:8].upper())
+        # Create invoice in the background
+        create_invoice.delay(order.id)
         
         return redirect('order_success', order_id=order.id)
     
@@ -432,7 +394,8 @@ def payment(request):
 @login_required
 def order_success(request, order_id):
     order = get_object_or_404(Order, id=order_id, user=request.user)
-    invoice = get_object_or_404(Invoice, order=order)
+    # The invoice job may not have run yet
+    invoice = Invoice.objects.filter(order=order).first()
     return render(request, 'buyer/order_success.html', {
         'order': order,
         'invoice': invoice,
@@ -447,15 +410,44 @@ def payment_webhook(request):
         return JsonResponse({'status': 'success'})
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
+@login_required
 def view_invoice(request, order_id):
-    order = get_object_or_404(Order, pk=order_id, user=request.user)
-    invoice = get_object_or_404(Invoice, order=order)
+    # Unpaid orders get no invoice, even on demand
+    order = get_object_or_404(paid_orders(), pk=order_id, user=request.user)
+    invoice = ensure_invoice(order.id)
     
     return render(request, 'buyer/invoice_template.html', {
         'order': order,
         'invoice': invoice,
     })
 
+@login_required
+def download_invoice(request, order_id):
+    order = get_object_or_404(paid_orders(), pk=order_id, user=request.user)
+    invoice = Invoice.objects.filter(order=order).first()
+    if invoice is None or not invoice.pdf:
+        # Asked for before the invoice job has run
+        invoice = invoices_with_orders().get(pk=ensure_invoice(order.id).pk)
+        try:
+            ensure_pdf(invoice)
+        except InvoiceRenderError:
+            messages.error(request, "Your invoice PDF could not be generated right now. Please try again later.")
+            return redirect('view_invoice', order_id=order.id)
+
+    etag = f'"{invoice.pdf_sha256}"'
+    rendered_at = int(invoice.rendered_at.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=rendered_at)
+    if response is None:
+        response = FileResponse(
+            invoice.pdf.open('rb'),
+            content_type='application/pdf',
+            filename=f"invoice-{invoice.invoice_id}.pdf",
+        )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(rendered_at)
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
+
 
 def update_cart_item(request):
     if request.method == 'POST':
@@ -519,9 +511,13 @@ def smart_phones(request):
 
 @login_required
 def category_products(request, slug):
-    category = Category.objects.get(slug=slug)
-    products = Product.objects.filter(category=category)
-    return render(request, 'buyer/Category_products.html', {
+    category = catalog_cache.category_by_slug(slug)
+    if category is None:
+        raise Http404("Category not found")
+    products = catalog_cache.category_products(category, request.GET.get(CURSOR_PARAM))
+    if wants_json(request):
+        return json_page(products, ['id', 'name', 'brand_name', 'base_price', 'discount', 'image__url'])
+    return render(request, 'buyer/category_products.html', {
         'category': category,
         'products': products
     })
@@ -533,6 +529,9 @@ def orders(request):
         orders = Order.objects.filter(user=request.user, status=status)
     else:
         orders = Order.objects.filter(user=request.user)
+    orders = paginate(request, orders.prefetch_related('items__product'), ordering=('-created_at', '-id'))
+    if wants_json(request):
+        return json_page(orders, ['id', 'created_at', 'status', 'total_price'])
 
     return render(request, 'buyer/orders.html', {
         'orders': orders,
@@ -2,7 +2,7 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import ChatSession, ChatMessage
+from .models import ChatSession, ChatMessage, ChatArchive, ProductIndexChange
 
 class ChatMessageInline(admin.TabularInline):
     model = ChatMessage
@@ -23,4 +23,13 @@ class ChatMessageAdmin(admin.ModelAdmin):
     
     def message_short(self, obj):
         return obj.message[:50] + '...' if len(obj.message) > 50 else obj.message
-    message_short.short_description = 'Message'
\ No newline at end of file
+    message_short.short_description = 'Message'
+
+@admin.register(ChatArchive)
+class ChatArchiveAdmin(admin.ModelAdmin):
+    list_display = ('session', 'message_count', 'started_at', 'ended_at')
+    exclude = ('data',)
+
+@admin.register(ProductIndexChange)
+class ProductIndexChangeAdmin(admin.ModelAdmin):
+    list_display = ('product_id', 'created_at')
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ChatbotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chatbot'
+
+    def ready(self):
+        import chatbot.signals
+        from chatbot.intents import registry
+        # Compile the keyword automaton once at startup rather than on the first message
+        registry.automaton
@@ -0,0 +1,78 @@
+"""
+Fallback intent classifier for messages no keyword matched.
+
+A TF-IDF (word and character n-grams) + logistic regression pipeline is
+trained offline by ``manage.py train_intent_classifier`` and saved to
+``CHATBOT_INTENT_MODEL``. Each process loads it once, on the first message
+that needs it; without a trained model unmatched messages get the default
+answer as before. Predictions below ``CHATBOT_INTENT_MIN_CONFIDENCE`` are
+treated as unknown.
+"""
+import os
+import threading
+
+from django.conf import settings
+
+MODEL_PATH = getattr(settings, 'CHATBOT_INTENT_MODEL', os.path.join(settings.BASE_DIR, 'var', 'intent_classifier.joblib'))
+MIN_CONFIDENCE = getattr(settings, 'CHATBOT_INTENT_MIN_CONFIDENCE', 0.4)
+
+
+class IntentClassifier:
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    @classmethod
+    def train(cls, texts, labels):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import FeatureUnion, Pipeline
+
+        pipeline = Pipeline([
+            ('features', FeatureUnion([
+                ('words', TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True)),
+                ('chars', TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), sublinear_tf=True)),
+            ])),
+            ('model', LogisticRegression(max_iter=1000, C=10)),
+        ])
+        pipeline.fit([text.lower() for text in texts], labels)
+        return cls(pipeline)
+
+    def predict(self, messages, min_confidence=MIN_CONFIDENCE):
+        """(intent name or None, probability) for every message, in one vectorized pass"""
+        if not messages:
+            return []
+        probabilities = self.pipeline.predict_proba([message.lower() for message in messages])
+        classes = self.pipeline.classes_
+        best = probabilities.argmax(axis=1)
+        return [
+            (classes[i] if probabilities[row, i] >= min_confidence else None, float(probabilities[row, i]))
+            for row, i in enumerate(best)
+        ]
+
+    def save(self, path=MODEL_PATH):
+        import joblib
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(self.pipeline, path)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        import joblib
+
+        return cls(joblib.load(path))
+
+
+_classifier = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def get_classifier():
+    """The trained classifier, loaded once per process, or None if none was trained"""
+    global _classifier, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                _classifier = IntentClassifier.load() if os.path.exists(MODEL_PATH) else None
+                _loaded = True
+    return _classifier
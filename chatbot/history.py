@@ -0,0 +1,153 @@
+"""
+Chat persistence.
+
+The active session id of each user is cached, so recording an exchange is
+one ``bulk_create`` of the user/bot message pair; the session's
+``updated_at`` is refreshed at most once per ``CHAT_TOUCH_INTERVAL``
+seconds. Only the latest ``CHAT_HOT_MESSAGES`` messages of a session are
+kept as ChatMessage rows: once a session has written that many more, a
+background job folds everything older into a compressed ChatArchive row,
+and ``manage.py compact_chat_history`` does the same for every session.
+"""
+import json
+import zlib
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from chatbot.models import ChatArchive, ChatMessage, ChatSession
+from tasks.queue import task
+
+HOT_MESSAGES = getattr(settings, 'CHAT_HOT_MESSAGES', 50)
+TOUCH_INTERVAL = getattr(settings, 'CHAT_TOUCH_INTERVAL', 60)
+SESSION_TIMEOUT = 24 * 3600
+ARCHIVE_CHUNK = 1000
+
+
+def _session_key(user_id):
+    return f'chat-session:{user_id}'
+
+
+def active_session_id(user):
+    key = _session_key(user.id)
+    session_id = cache.get(key)
+    if session_id is None:
+        session_id = (
+            ChatSession.objects.filter(user=user, is_active=True).order_by('-id').values_list('id', flat=True).first()
+            or ChatSession.objects.create(user=user).id
+        )
+        cache.set(key, session_id, SESSION_TIMEOUT)
+    return session_id
+
+
+def _write_pair(session_id, message, reply):
+    ChatMessage.objects.bulk_create([
+        ChatMessage(session_id=session_id, message=message, is_bot=False),
+        ChatMessage(session_id=session_id, message=reply, is_bot=True),
+    ])
+
+
+def record_exchange(user, message, reply):
+    """Store a user message and the bot's reply"""
+    session_id = active_session_id(user)
+    try:
+        with transaction.atomic():
+            _write_pair(session_id, message, reply)
+    except IntegrityError:
+        # The cached session was deleted; look the active one up again
+        cache.delete(_session_key(user.id))
+        session_id = active_session_id(user)
+        _write_pair(session_id, message, reply)
+
+    if cache.add(f'chat-touched:{session_id}', True, TOUCH_INTERVAL):
+        ChatSession.objects.filter(pk=session_id).update(updated_at=timezone.now())
+
+    writes_key = f'chat-writes:{session_id}'
+    cache.add(writes_key, 0, SESSION_TIMEOUT)
+    try:
+        writes = cache.incr(writes_key, 2)
+    except ValueError:
+        writes = 2  # evicted between add and incr
+    if writes // HOT_MESSAGES != (writes - 2) // HOT_MESSAGES:
+        # Another HOT_MESSAGES messages since the last compaction job
+        compact_session.delay(session_id)
+    return session_id
+
+
+def _pack(rows):
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode(), 9)
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def unpack(archive):
+    """(is_bot, created_at, message) tuples of an archive row"""
+    for is_bot, created_at, message in _unpack(archive.data):
+        yield bool(is_bot), datetime.fromisoformat(created_at), message
+
+
+def _archive(session_id, rows, into=None):
+    """Store ``(id, is_bot, created_at, message)`` rows, topping up the ``into`` archive first"""
+    if not rows:
+        return
+    packed = [[int(is_bot), created_at.isoformat(), message] for _, is_bot, created_at, message in rows]
+    if into is not None and into.message_count < ARCHIVE_CHUNK:
+        take = ARCHIVE_CHUNK - into.message_count
+        merged = _unpack(into.data) + packed[:take]
+        into.data = _pack(merged)
+        into.message_count = len(merged)
+        into.last_message_id = rows[:take][-1][0]
+        into.ended_at = rows[:take][-1][2]
+        into.save(update_fields=['data', 'message_count', 'last_message_id', 'ended_at'])
+        rows, packed = rows[take:], packed[take:]
+    ChatArchive.objects.bulk_create([
+        ChatArchive(
+            session_id=session_id,
+            first_message_id=rows[start][0],
+            last_message_id=rows[start:start + ARCHIVE_CHUNK][-1][0],
+            message_count=len(packed[start:start + ARCHIVE_CHUNK]),
+            started_at=rows[start][2],
+            ended_at=rows[start:start + ARCHIVE_CHUNK][-1][2],
+            data=_pack(packed[start:start + ARCHIVE_CHUNK]),
+        )
+        for start in range(0, len(rows), ARCHIVE_CHUNK)
+    ])
+
+
+def compact(session_id, keep=HOT_MESSAGES):
+    """Archive all but the latest ``keep`` messages of a session; returns how many were archived"""
+    with transaction.atomic():
+        # Locking the session serializes compactions of it; read the cutoff after taking the lock
+        if ChatSession.objects.select_for_update().filter(pk=session_id).values_list('pk', flat=True).first() is None:
+            return 0
+        newest = ChatMessage.objects.filter(session_id=session_id).order_by('-id').values_list('id', flat=True)
+        cutoff = newest[keep:keep + 1]
+        if not cutoff:
+            return 0
+        old = ChatMessage.objects.filter(session_id=session_id, id__lte=cutoff[0])
+        rows = list(old.order_by('id').values_list('id', 'is_bot', 'created_at', 'message'))
+        if not rows:
+            return 0
+        last = ChatArchive.objects.filter(session_id=session_id).order_by('-first_message_id').first()
+        _archive(session_id, rows, into=last)
+        old.delete()
+    return len(rows)
+
+
+@task
+def compact_session(session_id):
+    compact(session_id)
+
+
+def history(session_id):
+    """(is_bot, created_at, message) of a session, oldest first, archived messages included"""
+    for archive in ChatArchive.objects.filter(session_id=session_id).order_by('first_message_id'):
+        yield from unpack(archive)
+    messages = ChatMessage.objects.filter(session_id=session_id).order_by('id')
+    for message in messages.values_list('is_bot', 'created_at', 'message').iterator():
+        yield message
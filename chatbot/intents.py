@@ -0,0 +1,175 @@
+"""
+Intent registry and keyword routing for the chatbot.
+
+Every intent lists the keywords that trigger it, the ChatbotEngine method
+that answers it and a few example messages for the fallback classifier.
+All keywords are compiled into one Aho-Corasick automaton, so matching a
+message is a single pass over its characters however many intents exist.
+When several intents match, the one registered first wins, as the old
+if/elif chain did.
+"""
+from collections import deque
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Intent:
+    name: str
+    keywords: list
+    handler: str
+    examples: list = field(default_factory=list)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton finding every keyword occurring in a text"""
+
+    def __init__(self, keywords):
+        """``keywords`` maps each keyword to a value reported when it matches"""
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for keyword, value in keywords.items():
+            state = 0
+            for char in keyword:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append(value)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def values(self, text):
+        """Values of all keywords found in ``text``"""
+        found = set()
+        state = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class IntentRegistry:
+    def __init__(self):
+        self.intents = []
+        self.by_name = {}
+        self._automaton = None
+
+    def register(self, name, keywords, handler, examples=()):
+        intent = Intent(name, [k.lower() for k in keywords], handler, list(examples))
+        self.intents.append(intent)
+        self.by_name[name] = intent
+        self._automaton = None
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    @property
+    def automaton(self):
+        if self._automaton is None:
+            keywords = {}
+            for priority, intent in enumerate(self.intents):
+                for keyword in intent.keywords:
+                    keywords.setdefault(keyword, priority)
+            self._automaton = KeywordAutomaton(keywords)
+        return self._automaton
+
+    def match(self, message):
+        """The highest priority intent with a keyword in ``message``, or None"""
+        priorities = self.automaton.values(message.lower())
+        return self.intents[min(priorities)] if priorities else None
+
+    def training_data(self):
+        """(texts, intent names) built from every intent's keywords and examples"""
+        texts, labels = [], []
+        for intent in self.intents:
+            for text in intent.keywords + intent.examples:
+                texts.append(text)
+                labels.append(intent.name)
+        return texts, labels
+
+
+registry = IntentRegistry()
+
+registry.register(
+    'order_status',
+    ['order status', 'where is my order', 'track order', 'order tracking'],
+    'handle_order_status',
+    examples=[
+        'has my package shipped yet', 'i want to know about my purchase', 'show my recent orders',
+        'what happened to the thing i bought', 'is my parcel on the way', 'check my last order',
+    ],
+)
+registry.register(
+    'prime',
+    ['prime', 'sentimart prime', 'membership'],
+    'handle_prime_question',
+    examples=[
+        'what do members get', 'is there a subscription plan', 'benefits of joining',
+        'how much does the premium plan cost', 'tell me about the loyalty program',
+    ],
+)
+registry.register(
+    'payment',
+    ['payment', 'refund', 'money back'],
+    'handle_payment_questions',
+    examples=[
+        'can i pay with upi', 'my card was charged twice', 'how do i get reimbursed',
+        'which cards do you accept', 'i was billed wrongly', 'can i pay cash when it comes',
+    ],
+)
+registry.register(
+    'delivery',
+    ['delivery', 'shipping', 'when will it arrive'],
+    'handle_delivery_questions',
+    examples=[
+        'how long does it take to ship', 'do you deliver to my city', 'how many days to receive',
+        'can i get it tomorrow', 'is same day available', 'what are the courier charges',
+    ],
+)
+registry.register(
+    'help',
+    ['help', 'support', 'contact'],
+    'handle_help_questions',
+    examples=[
+        'i need to talk to someone', 'customer care number', 'how do i reach you',
+        'i have a problem', 'can i speak to an agent', 'email address for complaints',
+    ],
+)
+registry.register(
+    'product_question',
+    [
+        'does the', 'does it', 'does this', 'do the', 'do these', 'is the', 'is this', 'are the',
+        'come with', 'comes with', 'compatible with', 'made of', 'suitable for',
+    ],
+    'handle_product_question',
+    examples=[
+        'does the phone have wireless charging', 'is this laptop good for gaming', 'what material is the jacket',
+        'can the blender crush ice', 'which sizes are available for these shoes', 'battery life of the headphones',
+        'is the watch waterproof', 'do these earbuds have noise cancellation',
+    ],
+)
+registry.register(
+    'unknown',
+    [],
+    'default_response',
+    examples=[
+        'hello', 'hi there', 'good morning', 'what is the weather like', 'tell me a joke',
+        'who are you', 'thanks', 'ok', 'asdf', 'what time is it',
+    ],
+)
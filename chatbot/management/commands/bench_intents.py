@@ -0,0 +1,101 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.classifier import IntentClassifier
+from chatbot.intents import IntentRegistry
+
+WORDS = [
+    'order', 'refund', 'delivery', 'prime', 'phone', 'laptop', 'return', 'invoice', 'coupon', 'wallet',
+    'address', 'account', 'password', 'seller', 'review', 'warranty', 'exchange', 'cancel', 'gift', 'offer',
+]
+
+
+def synthetic_registry(intents, rng):
+    """``intents`` intents with three unique two-word keywords each"""
+    registry = IntentRegistry()
+    for i in range(intents):
+        keywords = [f'{rng.choice(WORDS)} topic{i}x{k}' for k in range(3)]
+        registry.register(f'intent{i}', keywords, 'default_response', examples=[f'question about topic{i}x{k}' for k in range(3)])
+    return registry
+
+
+def messages(registry, count, rng):
+    """Chat-length messages, half containing a keyword and half matching nothing"""
+    result = []
+    for n in range(count):
+        filler = ' '.join(rng.choice(WORDS) for _ in range(12))
+        if n % 2:
+            keyword = rng.choice(rng.choice(registry.intents).keywords)
+            result.append(f'{filler} {keyword} please')
+        else:
+            result.append(f'{filler} anything else')
+    return result
+
+
+def linear_match(registry, message):
+    """The old if/elif routing: one substring scan per keyword of every intent"""
+    message = message.lower()
+    for intent in registry.intents:
+        if any(keyword in message for keyword in intent.keywords):
+            return intent
+    return None
+
+
+def per_message_us(func, items):
+    started = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+class Command(BaseCommand):
+    help = 'Compare per-message intent routing latency of the keyword automaton and a linear scan as intents grow'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intents', default='5,50,200,800', help='Comma-separated registry sizes')
+        parser.add_argument('--messages', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--max-growth', type=float, default=3.0,
+                            help='Fail if automaton latency at the largest size exceeds this multiple of the smallest')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        sizes = [int(size) for size in options['intents'].split(',')]
+        automaton_latency = []
+        for size in sizes:
+            registry = synthetic_registry(size, rng)
+            sample = messages(registry, options['messages'], rng)
+            started = time.perf_counter()
+            registry.automaton
+            compile_ms = (time.perf_counter() - started) * 1000
+
+            for message in sample:
+                if registry.match(message) is not linear_match(registry, message):
+                    raise CommandError(f"Automaton and linear scan disagree on {message!r}")
+            automaton_us = statistics.median(per_message_us(registry.match, sample) for _ in range(3))
+            linear_us = statistics.median(per_message_us(lambda m: linear_match(registry, m), sample) for _ in range(3))
+            automaton_latency.append(automaton_us)
+
+            classifier = IntentClassifier.train(*registry.training_data())
+            misses = [message for message in sample if registry.match(message) is None]
+            started = time.perf_counter()
+            classifier.predict(misses)
+            batch_us = (time.perf_counter() - started) / len(misses) * 1e6
+            started = time.perf_counter()
+            for message in misses[:100]:
+                classifier.predict([message])
+            single_us = (time.perf_counter() - started) / min(len(misses), 100) * 1e6
+
+            self.stdout.write(
+                f"{size:>5} intents: automaton {automaton_us:7.1f} us/msg (compiled in {compile_ms:.1f} ms), "
+                f"linear scan {linear_us:8.1f} us/msg; classifier {batch_us:7.1f} us/msg batched, "
+                f"{single_us:8.1f} us/msg one at a time"
+            )
+
+        growth = automaton_latency[-1] / automaton_latency[0]
+        if growth > options['max_growth']:
+            raise CommandError(f"Automaton latency grew {growth:.1f}x from {sizes[0]} to {sizes[-1]} intents")
+        self.stdout.write(self.style.SUCCESS(f"Automaton latency grew {growth:.1f}x from {sizes[0]} to {sizes[-1]} intents"))
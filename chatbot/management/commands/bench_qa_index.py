@@ -0,0 +1,116 @@
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+from categories.models import Category
+from chatbot import qa_index
+from products.models import Product, Review
+from sentimart.benchmarks import scratch_database
+
+FEATURES = [
+    'bluetooth', 'wireless charging', 'noise cancellation', 'fast charging', 'a steel body', 'a backlit keyboard',
+    'water resistance', 'a fingerprint sensor', 'dual sim', 'an oled display', 'usb c', 'a glass back',
+    'a detachable cable', 'memory foam', 'a non stick coating', 'an auto shutoff', 'a carry case', 'gps',
+]
+NOUNS = ['phone', 'laptop', 'speaker', 'headphones', 'watch', 'blender', 'kettle', 'backpack', 'mattress', 'camera']
+FILLER = (
+    'Designed for everyday use and built to last. Ships in recyclable packaging. '
+    'Backed by a one year manufacturer warranty. Easy to set up in minutes.'
+)
+
+
+def seed(products, reviews_per_product, rng):
+    """Approved products whose descriptions each mention three features; returns (product, feature) pairs"""
+    seller = User.objects.create(username='bench-seller', user_type='seller')
+    buyer = User.objects.create(username='bench-buyer', user_type='buyer')
+    category = Category.objects.create(name='Bench', image='categories/x.jpg')
+    rows, facts = [], []
+    for i in range(products):
+        features = rng.sample(FEATURES, 3)
+        name = f'Model{i} {rng.choice(NOUNS)}'
+        description = f"The {name} comes with {features[0]} and {features[1]}. {FILLER} It also has {features[2]}."
+        rows.append(Product(
+            seller=seller, category=category, sub_category='bench', name=name, description=description,
+            image='products/x.jpg', brand_name=f'Brand{i % 50}', model_number=f'M{i}', base_price=100, discount=0,
+            stock=10, status='approved',
+        ))
+        facts.append((name, features[2]))
+    rows = Product.objects.bulk_create(rows, batch_size=1000)
+    Review.objects.bulk_create([
+        Review(product=product, user=buyer, rating=rng.randint(1, 5),
+               comment=f"Loved the {rng.choice(FEATURES)}, the {rng.choice(FEATURES)} could be better.")
+        for product in rows for _ in range(reviews_per_product)
+    ], batch_size=1000)
+    return [(product, feature) for product, (_, feature) in zip(rows, facts)]
+
+
+class Command(BaseCommand):
+    help = 'Measure Q&A index build, incremental refresh and question latency on a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--reviews', type=int, default=3, help='Reviews per product')
+        parser.add_argument('--questions', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--max-ms', type=float, default=20.0, help='Fail if the p95 question latency is above this')
+        parser.add_argument('--min-accuracy', type=float, default=0.9,
+                            help='Fail if fewer questions than this are answered from the right product')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        directory = tempfile.mkdtemp(prefix='qa-index-')
+        try:
+            with scratch_database():
+                facts = seed(options['products'], options['reviews'], rng)
+
+                started = time.perf_counter()
+                manifest = qa_index.build(directory)
+                build_s = time.perf_counter() - started
+                index = qa_index.QAIndex(directory, manifest)
+                self.stdout.write(f"Built {index.passages} passages from {len(facts)} products in {build_s:.2f} s")
+
+                changed = rng.sample(facts, min(50, len(facts)))
+                for product, feature in changed:
+                    product.description += f" Now also includes {feature} support."
+                    product.save()
+                started = time.perf_counter()
+                manifest = qa_index.update(directory)
+                self.stdout.write(
+                    f"Refreshed {len(changed)} changed products in {(time.perf_counter() - started) * 1000:.1f} ms "
+                    f"({len(manifest['segments'])} segments)"
+                )
+
+                index = qa_index.QAIndex(directory, manifest)
+                sample = [rng.choice(facts) for _ in range(options['questions'])]
+                timings, correct = [], 0
+                with CaptureQueriesContext(connection) as captured:
+                    for product, feature in sample:
+                        started = time.perf_counter()
+                        hits = index.answer(f"Does the {product.name} have {feature}?")
+                        timings.append(time.perf_counter() - started)
+                        correct += bool(hits) and hits[0].product_id == product.id
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        timings.sort()
+        p50 = statistics.median(timings) * 1000
+        p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+        accuracy = correct / len(sample)
+        self.stdout.write(
+            f"{len(sample)} questions: p50 {p50:.2f} ms, p95 {p95:.2f} ms, "
+            f"{accuracy:.0%} answered from the right product, {len(captured)} database queries"
+        )
+        if len(captured):
+            raise CommandError(f"Answering questions ran {len(captured)} database queries")
+        if accuracy < options['min_accuracy']:
+            raise CommandError(f"Only {accuracy:.0%} of questions were answered from the right product")
+        if p95 > options['max_ms']:
+            raise CommandError(f"p95 question latency {p95:.2f} ms, budget is {options['max_ms']} ms")
+        self.stdout.write(self.style.SUCCESS('Q&A index within budget'))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from chatbot import qa_index
+
+
+class Command(BaseCommand):
+    help = "Build the chatbot's product Q&A index, or apply the catalog changes logged since it was written"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only reindex products changed since the last build or refresh')
+        parser.add_argument('--directory', default=str(qa_index.INDEX_DIR))
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['incremental']:
+            manifest = qa_index.update(options['directory'])
+        else:
+            manifest = qa_index.build(options['directory'])
+        index = qa_index.QAIndex(options['directory'], manifest)
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {index.passages} passages in {len(index.segments)} segments "
+            f"in {time.perf_counter() - started:.1f} s; saved to {options['directory']}"
+        ))
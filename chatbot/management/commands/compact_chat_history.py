@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+
+from chatbot.history import HOT_MESSAGES, compact
+from chatbot.models import ChatSession
+
+
+class Command(BaseCommand):
+    help = "Fold chat messages beyond each session's recent window into compressed archive rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=HOT_MESSAGES, help='Recent messages to keep per session')
+        parser.add_argument('--inactive-days', type=int,
+                            help='Also close sessions idle this many days (at least 1) and archive all their messages')
+
+    def handle(self, *args, **options):
+        archived = sessions = 0
+        if options['inactive_days'] is not None:
+            # Cached session ids expire after a day, so no process still writes to these
+            if options['inactive_days'] < 1:
+                raise CommandError('--inactive-days must be at least 1')
+            cutoff = timezone.now() - timedelta(days=options['inactive_days'])
+            idle = list(ChatSession.objects.filter(is_active=True, updated_at__lt=cutoff).values_list('id', flat=True))
+            ChatSession.objects.filter(id__in=idle).update(is_active=False)
+            for session_id in idle:
+                archived += compact(session_id, keep=0)
+            sessions += len(idle)
+            self.stdout.write(f"Closed {len(idle)} idle sessions")
+
+        busy = (
+            ChatSession.objects.annotate(hot=Count('messages'))
+            .filter(hot__gt=options['keep'])
+            .values_list('id', flat=True)
+        )
+        for session_id in busy.iterator():
+            archived += compact(session_id, keep=options['keep'])
+            sessions += 1
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} messages from {sessions} sessions"))
@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.classifier import MODEL_PATH, IntentClassifier
+from chatbot.intents import registry
+
+
+class Command(BaseCommand):
+    help = "Train the chatbot's fallback intent classifier from the intent registry and optional labelled messages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', help='NDJSON file of {"text": ..., "intent": ...} lines to train on as well')
+        parser.add_argument('--output', default=str(MODEL_PATH))
+
+    def handle(self, *args, **options):
+        texts, labels = registry.training_data()
+        if options['data']:
+            with open(options['data'], encoding='utf-8') as fh:
+                for number, line in enumerate(fh, 1):
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    if registry.get(row.get('intent')) is None:
+                        raise CommandError(f"Line {number}: unknown intent {row.get('intent')!r}")
+                    texts.append(row['text'])
+                    labels.append(row['intent'])
+
+        classifier = IntentClassifier.train(texts, labels)
+        classifier.save(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained on {len(texts)} messages for {len(set(labels))} intents; saved to {options['output']}"
+        ))
@@ -21,4 +21,28 @@ class ChatMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{'Bot' if self.is_bot else 'User'}: {self.message[:50]}"
\ No newline at end of file
+        return f"{'Bot' if self.is_bot else 'User'}: {self.message[:50]}"
+
+class ChatArchive(models.Model):
+    """A compacted run of older messages of a session, stored as zlib-compressed JSON (see chatbot.history)"""
+    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='archives')
+    first_message_id = models.BigIntegerField()
+    last_message_id = models.BigIntegerField()
+    message_count = models.PositiveIntegerField()
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ['session', 'first_message_id']
+
+    def __str__(self):
+        return f"{self.message_count} archived messages of session {self.session_id}"
+
+class ProductIndexChange(models.Model):
+    """A product whose Q&A passages changed since the index was written (see chatbot.retrieval)"""
+    product_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Product {self.product_id} changed"
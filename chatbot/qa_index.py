@@ -0,0 +1,292 @@
+"""
+On-disk BM25 index of the product Q&A passages (see chatbot.retrieval).
+
+The index lives in ``CHATBOT_QA_INDEX`` as segments of numpy arrays. Each
+segment holds its terms (crc32 hashes, so segments need no shared
+vocabulary), postings, passage lengths and texts. Queries memory-map the
+segments and never touch the database. ``build`` writes a single segment.
+``update`` applies the changes logged in ProductIndexChange: it masks the
+changed products' passages out of the old segments and writes them to a
+new delta segment. Once there are ``CHATBOT_QA_MAX_SEGMENTS`` segments,
+the next update rebuilds the index.
+
+``manifest.json`` names the live segments and is replaced atomically;
+readers reopen the index when its modification time changes.
+"""
+import fcntl
+import json
+import os
+import shutil
+import threading
+import uuid
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+
+from chatbot.models import ProductIndexChange
+from chatbot.retrieval import Hit, product_passages, tokenize
+
+INDEX_DIR = getattr(settings, 'CHATBOT_QA_INDEX', os.path.join(settings.BASE_DIR, 'var', 'qa_index'))
+MAX_SEGMENTS = getattr(settings, 'CHATBOT_QA_MAX_SEGMENTS', 8)
+MANIFEST = 'manifest.json'
+
+K1 = 1.2
+B = 0.75
+MAX_QUERY_TERMS = 16
+# In a large index, terms found in more than this share of passages are skipped
+COMMON_TERM_RATIO = 0.5
+COMMON_TERM_MIN_PASSAGES = 1000
+
+
+def term_ids(tokens):
+    return np.array([zlib.crc32(token.encode()) for token in tokens], dtype=np.uint32)
+
+
+def _save_strings(path, strings):
+    encoded = [string.encode() for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    np.save(f'{path}.npy', np.frombuffer(b''.join(encoded) or b'\0', dtype=np.uint8))
+    np.save(f'{path}_offsets.npy', offsets)
+
+
+def write_segment(directory, passages):
+    """Write ``passages`` as a new segment; returns its name, or None if there were none"""
+    passages = list(passages)
+    if not passages:
+        return None
+    doc_terms = [term_ids(tokenize(f'{passage.context} {passage.text}')) for passage in passages]
+    lengths = np.array([len(terms) for terms in doc_terms], dtype=np.int64)
+    terms = np.concatenate(doc_terms).astype(np.uint64)
+    docs = np.repeat(np.arange(len(passages), dtype=np.uint64), lengths)
+    # Sorting (term, passage) pairs groups the postings of each term, in passage order
+    pairs, frequencies = np.unique((terms << np.uint64(32)) | docs, return_counts=True)
+    posting_terms = (pairs >> np.uint64(32)).astype(np.uint32)
+    vocabulary, starts = np.unique(posting_terms, return_index=True)
+
+    name = f'segment-{uuid.uuid4().hex[:12]}'
+    building = os.path.join(directory, f'.{name}')
+    os.makedirs(building)
+    arrays = {
+        'terms': vocabulary,
+        'offsets': np.append(starts, len(posting_terms)).astype(np.int64),
+        'docs': (pairs & np.uint64(0xFFFFFFFF)).astype(np.uint32),
+        'frequencies': np.minimum(frequencies, np.iinfo(np.uint16).max).astype(np.uint16),
+        'lengths': lengths.astype(np.float32),
+        'products': np.array([passage.product_id for passage in passages], dtype=np.int64),
+        'sources': np.array([passage.source for passage in passages], dtype=np.uint8),
+    }
+    for key, array in arrays.items():
+        np.save(os.path.join(building, f'{key}.npy'), array)
+    _save_strings(os.path.join(building, 'texts'), [passage.text for passage in passages])
+    _save_strings(os.path.join(building, 'titles'), [passage.title for passage in passages])
+    os.rename(building, os.path.join(directory, name))
+    return name
+
+
+class Segment:
+    def __init__(self, directory, name, deleted=None):
+        path = os.path.join(directory, name)
+        load = lambda key: np.load(os.path.join(path, f'{key}.npy'), mmap_mode='r')
+        self.terms = load('terms')
+        self.offsets = load('offsets')
+        self.docs = load('docs')
+        self.frequencies = load('frequencies')
+        self.lengths = load('lengths')
+        self.products = load('products')
+        self.sources = load('sources')
+        self._texts, self._text_offsets = load('texts'), load('texts_offsets')
+        self._titles, self._title_offsets = load('titles'), load('titles_offsets')
+        self.deleted = np.load(os.path.join(directory, deleted)) if deleted else None
+
+    @property
+    def live(self):
+        return len(self.lengths) - (int(self.deleted.sum()) if self.deleted is not None else 0)
+
+    @property
+    def live_length(self):
+        lengths = self.lengths if self.deleted is None else self.lengths[~self.deleted]
+        return float(lengths.sum())
+
+    def postings(self, terms):
+        """(start, end) offsets into ``docs`` of each of ``terms``; empty where absent"""
+        positions = np.searchsorted(self.terms, terms)
+        clipped = np.minimum(positions, len(self.terms) - 1)
+        found = self.terms[clipped] == terms
+        starts = np.where(found, self.offsets[clipped], 0)
+        ends = np.where(found, self.offsets[clipped + 1], 0)
+        return starts, ends
+
+    def _string(self, blob, offsets, doc):
+        return bytes(blob[offsets[doc]:offsets[doc + 1]]).decode()
+
+    def hit(self, doc, score):
+        return Hit(
+            score=float(score),
+            product_id=int(self.products[doc]),
+            source=int(self.sources[doc]),
+            title=self._string(self._titles, self._title_offsets, doc),
+            text=self._string(self._texts, self._text_offsets, doc),
+        )
+
+
+class QAIndex:
+    def __init__(self, directory, manifest):
+        self.segments = [Segment(directory, entry['name'], entry.get('deleted')) for entry in manifest['segments']]
+        self.passages = sum(segment.live for segment in self.segments)
+        self.average_length = sum(segment.live_length for segment in self.segments) / max(self.passages, 1)
+
+    def search(self, query, limit=5):
+        """The ``limit`` best passages for ``query`` by BM25, best first"""
+        terms = np.unique(term_ids(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not len(terms) or not self.passages:
+            return []
+        postings = [segment.postings(terms) for segment in self.segments]
+        found = sum(ends - starts for starts, ends in postings)
+        weights = np.log1p((self.passages - found + 0.5) / (found + 0.5))
+        useful = found > 0
+        if self.passages >= COMMON_TERM_MIN_PASSAGES:
+            useful &= found <= COMMON_TERM_RATIO * self.passages
+
+        candidates = []
+        for segment, (starts, ends) in zip(self.segments, postings):
+            spans = [(start, end, weight) for start, end, weight, use in zip(starts, ends, weights, useful) if use and end > start]
+            if not spans:
+                continue
+            docs = np.concatenate([segment.docs[start:end] for start, end, _ in spans])
+            frequencies = np.concatenate([segment.frequencies[start:end] for start, end, _ in spans]).astype(np.float32)
+            idf = np.concatenate([np.full(end - start, weight, dtype=np.float32) for start, end, weight in spans])
+            norm = K1 * (1 - B + B * segment.lengths[docs] / self.average_length)
+            scores = np.bincount(docs, weights=idf * frequencies * (K1 + 1) / (frequencies + norm))
+            if segment.deleted is not None:
+                scores[segment.deleted[:len(scores)]] = 0
+            best = np.flatnonzero(scores)
+            if len(best) > limit:
+                best = best[np.argpartition(scores[best], -limit)[-limit:]]
+            candidates.extend((scores[doc], segment, doc) for doc in best)
+        candidates.sort(key=lambda candidate: -candidate[0])
+        return [segment.hit(doc, score) for score, segment, doc in candidates[:limit]]
+
+    def answer(self, question, passages=3, depth=20):
+        """The best passages of the product best matching ``question``"""
+        hits = self.search(question, limit=depth)
+        if not hits:
+            return []
+        return [hit for hit in hits if hit.product_id == hits[0].product_id][:passages]
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(directory, segments):
+    manifest = {'segments': segments}
+    temporary = os.path.join(directory, f'.{MANIFEST}.{uuid.uuid4().hex[:8]}')
+    with open(temporary, 'w') as output:
+        json.dump(manifest, output)
+    os.replace(temporary, os.path.join(directory, MANIFEST))
+    # Drop files the new manifest no longer names; processes still mapping them keep their copy
+    referenced = {MANIFEST, '.lock'}
+    for entry in segments:
+        referenced.update(filter(None, [entry['name'], entry.get('deleted')]))
+    for name in os.listdir(directory):
+        if name not in referenced and not name.startswith('.'):
+            path = os.path.join(directory, name)
+            shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+    return manifest
+
+
+@contextmanager
+def _writing(directory):
+    """Serialize index writers across processes"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _pending_changes():
+    return ProductIndexChange.objects.aggregate(last=Max('id'))['last']
+
+
+def _rebuild(directory):
+    last_change = _pending_changes()
+    name = write_segment(directory, product_passages())
+    manifest = _write_manifest(directory, [{'name': name}] if name else [])
+    if last_change is not None:
+        ProductIndexChange.objects.filter(id__lte=last_change).delete()
+    return manifest
+
+
+def build(directory=INDEX_DIR):
+    """Index every approved product from scratch"""
+    with _writing(directory):
+        return _rebuild(directory)
+
+
+def update(directory=INDEX_DIR):
+    """Reindex the products changed since the index was last written"""
+    with _writing(directory):
+        manifest = _read_manifest(directory)
+        if manifest is None or len(manifest['segments']) >= MAX_SEGMENTS:
+            return _rebuild(directory)
+        last_change = _pending_changes()
+        if last_change is None:
+            return manifest
+        changed = np.array(sorted(set(
+            ProductIndexChange.objects.filter(id__lte=last_change).values_list('product_id', flat=True)
+        )), dtype=np.int64)
+
+        segments = []
+        for entry in manifest['segments']:
+            products = np.load(os.path.join(directory, entry['name'], 'products.npy'), mmap_mode='r')
+            deleted = np.isin(products, changed)
+            if entry.get('deleted'):
+                deleted |= np.load(os.path.join(directory, entry['deleted']))
+            if deleted.all():
+                continue
+            if deleted.any():
+                entry = {'name': entry['name'], 'deleted': f"{entry['name']}-deleted-{uuid.uuid4().hex[:8]}.npy"}
+                np.save(os.path.join(directory, entry['deleted']), deleted)
+            segments.append(entry)
+        name = write_segment(directory, product_passages(changed.tolist()))
+        if name:
+            segments.append({'name': name})
+        manifest = _write_manifest(directory, segments)
+        ProductIndexChange.objects.filter(id__lte=last_change).delete()
+        return manifest
+
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+
+def get_index(directory=INDEX_DIR):
+    """The current index, reopened whenever the manifest changes, or None if none was built"""
+    global _index, _index_version
+    try:
+        version = os.stat(os.path.join(directory, MANIFEST)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if version != _index_version:
+        with _lock:
+            if version != _index_version:
+                manifest = _read_manifest(directory)
+                try:
+                    _index = QAIndex(directory, manifest) if manifest else None
+                except FileNotFoundError:
+                    return _index  # replaced while opening; the next call picks the new one up
+                _index_version = version
+    return _index
+
@@ -0,0 +1,140 @@
+"""
+Product Q&A retrieval for the chatbot.
+
+Approved products are split into passages: runs of sentences from the
+description, one passage listing the variant options and runs of
+sentences from each review comment. Every passage is indexed under its own
+words plus the product's name, brand and category, so a question naming a
+product and a feature ranks that product's passages first.
+
+The passages are searched through the BM25 index in ``chatbot.qa_index``,
+which is built by ``manage.py build_qa_index``. Product, variant and
+review changes, including the catalog importer's bulk writes, are logged
+in ProductIndexChange by chatbot.signals and applied by the
+``refresh_qa_index`` job. The index needs numpy, so it is only imported
+by the processes that answer a product question or write the index.
+"""
+import re
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from chatbot.models import ProductIndexChange
+from products.models import Product, ProductAttributeValue, Review
+from tasks.queue import task
+
+REFRESH_DELAY = getattr(settings, 'CHATBOT_QA_REFRESH_DELAY', 30)
+
+PASSAGE_WORDS = 60
+SNIPPET_CHARS = 240
+
+DESCRIPTION, OPTIONS, REVIEW = 0, 1, 2
+SOURCES = {DESCRIPTION: 'the product description', OPTIONS: 'the available options', REVIEW: 'a customer review'}
+
+STOPWORDS = frozenset("""
+    a an and any are as at be but by can could do does for from get got has have how i if in is it its
+    me my of on or so than that the their them there these they this those to was were what when where
+    which who will with would you your
+""".split())
+WORD_RE = re.compile(r'\w+')
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def _stem(word):
+    """Fold plain plurals and third person verbs ("floats", "cables") onto their stem"""
+    return word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+
+
+def tokenize(text):
+    return [_stem(word) for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+@dataclass
+class Passage:
+    product_id: int
+    source: int
+    title: str
+    context: str
+    text: str
+
+
+@dataclass
+class Hit:
+    score: float
+    product_id: int
+    source: int
+    title: str
+    text: str
+
+    def snippet(self, question):
+        """The sentence of the passage sharing most words with ``question``, not counting the product name"""
+        wanted = set(tokenize(question))
+        wanted = (wanted - set(tokenize(self.title))) or wanted
+        sentences = [sentence for sentence in SENTENCE_RE.split(self.text) if sentence.strip()] or [self.text]
+        best = max(sentences, key=lambda sentence: len(wanted.intersection(tokenize(sentence))))
+        return best if len(best) <= SNIPPET_CHARS else best[:SNIPPET_CHARS].rsplit(' ', 1)[0] + '…'
+
+
+def _chunks(text, size=PASSAGE_WORDS):
+    """Runs of whole sentences of about ``size`` words"""
+    chunk, words = [], 0
+    for sentence in SENTENCE_RE.split(text.strip()):
+        if not sentence.strip():
+            continue
+        chunk.append(sentence.strip())
+        words += len(sentence.split())
+        if words >= size:
+            yield ' '.join(chunk)
+            chunk, words = [], 0
+    if chunk:
+        yield ' '.join(chunk)
+
+
+def _option_label(value):
+    return f"{value.attribute.name}: {value.value}" if value.attribute else value.value
+
+
+def product_passages(product_ids=None):
+    """Passages of every approved product, or of those among ``product_ids``"""
+    products = Product.objects.filter(status='approved')
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    products = products.select_related('category').prefetch_related(
+        Prefetch('variants__attributes', queryset=ProductAttributeValue.objects.select_related('attribute')),
+        Prefetch('reviews', queryset=Review.objects.exclude(comment='').only('id', 'product_id', 'comment')),
+    )
+    for product in products.iterator(chunk_size=500):
+        context = ' '.join(filter(None, [product.name, product.brand_name, product.category and product.category.name]))
+        for text in _chunks(product.description):
+            yield Passage(product.id, DESCRIPTION, product.name, context, text)
+        options = sorted({_option_label(value) for variant in product.variants.all() for value in variant.attributes.all()})
+        if options:
+            yield Passage(product.id, OPTIONS, product.name, context, f"Available options: {', '.join(options)}.")
+        for review in product.reviews.all():
+            for text in _chunks(review.comment):
+                yield Passage(product.id, REVIEW, product.name, context, text)
+
+
+@task
+def refresh_qa_index():
+    from chatbot import qa_index
+
+    qa_index.update()
+
+
+def products_changed(product_ids):
+    """Log the changes and make sure a refresh of the Q&A index is queued"""
+    ProductIndexChange.objects.bulk_create([ProductIndexChange(product_id=product_id) for product_id in product_ids])
+    # One refresh per delay window picks up every change logged until it runs
+    if cache.add('qa-index-refresh', True, REFRESH_DELAY):
+        refresh_qa_index.schedule(countdown=REFRESH_DELAY)
+
+
+def answer(question):
+    """Best passages of the product ``question`` is most likely about, [] without an index"""
+    from chatbot import qa_index
+
+    index = qa_index.get_index()
+    return index.answer(question) if index is not None else []
@@ -0,0 +1,31 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from chatbot import retrieval
+from products.models import Product, ProductVariant, Review
+from products.signals import products_imported
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def reindex_product(sender, instance, **kwargs):
+    retrieval.products_changed([instance.id])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def reindex_product_of(sender, instance, **kwargs):
+    retrieval.products_changed([instance.product_id])
+
+
+@receiver(m2m_changed, sender=ProductVariant.attributes.through)
+def reindex_variant_options(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        retrieval.products_changed([instance.product_id])
+
+
+@receiver(products_imported)
+def reindex_imported_products(sender, product_ids, **kwargs):
+    retrieval.products_changed(product_ids)
@@ -1,3 +1,109 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import User
+from categories.models import Category
+from chatbot import history, qa_index
+from chatbot.models import ChatArchive, ChatMessage, ChatSession, ProductIndexChange
+from products.models import Product
+from tasks.models import Task
+
+
+class QAIndexTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        seller = User.objects.create(username='seller', user_type='seller')
+        category = Category.objects.create(name='Outdoor', image='categories/outdoor.jpg')
+        self.jacket, self.tent = [
+            Product.objects.create(
+                seller=seller, category=category, sub_category='x', name=name, description=description,
+                image='products/x.jpg', brand_name='Acme', model_number='M1', base_price=100, discount=0,
+                stock=5, status='approved',
+            )
+            for name, description in [
+                ('Trail jacket', 'A waterproof shell with taped seams.'),
+                ('Dome tent', 'Sleeps two and packs small.'),
+            ]
+        ]
+        qa_index.build(self.directory)
+
+    def search(self, manifest, query):
+        return [hit.product_id for hit in qa_index.QAIndex(self.directory, manifest).search(query)]
+
+    def test_update_masks_the_old_passages(self):
+        self.jacket.description = 'A windproof shell with a hood.'
+        self.jacket.save()
+        manifest = qa_index.update(self.directory)
+        # The old segment stays, with the jacket masked out, next to a delta segment
+        self.assertEqual(len(manifest['segments']), 2)
+        self.assertIn('deleted', manifest['segments'][0])
+        self.assertEqual(self.search(manifest, 'waterproof'), [])
+        self.assertEqual(self.search(manifest, 'windproof'), [self.jacket.id])
+        self.assertEqual(self.search(manifest, 'sleeps two'), [self.tent.id])
+        self.assertFalse(ProductIndexChange.objects.exists())
+
+    def test_removed_products_drop_out(self):
+        self.tent.status = 'rejected'
+        self.tent.save()
+        manifest = qa_index.update(self.directory)
+        self.assertEqual(self.search(manifest, 'sleeps two'), [])
+        self.assertEqual(self.search(manifest, 'waterproof'), [self.jacket.id])
+
+    def test_update_without_changes_keeps_the_index(self):
+        manifest = qa_index.update(self.directory)
+        self.assertEqual(len(manifest['segments']), 1)
+        self.assertNotIn('deleted', manifest['segments'][0])
+
+    def test_too_many_segments_rebuild(self):
+        with mock.patch.object(qa_index, 'MAX_SEGMENTS', 2):
+            self.jacket.save()
+            self.assertEqual(len(qa_index.update(self.directory)['segments']), 2)
+            self.jacket.save()
+            manifest = qa_index.update(self.directory)
+        self.assertEqual(manifest['segments'], [{'name': manifest['segments'][0]['name']}])
+        self.assertEqual(self.search(manifest, 'waterproof'), [self.jacket.id])
+
+
+class ChatCompactionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='buyer', user_type='buyer')
+        self.session = ChatSession.objects.create(user=self.user)
+
+    def write(self, count):
+        ChatMessage.objects.bulk_create([
+            ChatMessage(session=self.session, message=f'message {n}', is_bot=bool(n % 2)) for n in range(count)
+        ])
+
+    def messages(self):
+        return [message for _, _, message in history.history(self.session.id)]
+
+    def test_compaction_keeps_the_latest_messages(self):
+        self.write(10)
+        self.assertEqual(history.compact(self.session.id, keep=4), 6)
+        self.assertEqual(ChatMessage.objects.filter(session=self.session).count(), 4)
+        self.assertEqual(self.messages(), [f'message {n}' for n in range(10)])
+        self.assertEqual(history.compact(self.session.id, keep=4), 0)
+
+    def test_archives_are_topped_up_then_chunked(self):
+        with mock.patch.object(history, 'ARCHIVE_CHUNK', 4):
+            self.write(5)
+            history.compact(self.session.id, keep=2)
+            self.write(6)
+            history.compact(self.session.id, keep=2)
+        counts = list(ChatArchive.objects.order_by('first_message_id').values_list('message_count', flat=True))
+        self.assertEqual(counts, [4, 4, 1])
+        self.assertEqual(self.messages(), [f'message {n}' for n in range(5)] + [f'message {n}' for n in range(6)])
+        self.assertEqual([is_bot for is_bot, _, _ in history.history(self.session.id)][:2], [False, True])
+
+    def test_exchanges_queue_a_compaction_every_hot_messages(self):
+        with mock.patch.object(history, 'HOT_MESSAGES', 4):
+            for n in range(4):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.assertEqual(history.record_exchange(self.user, f'question {n}', f'answer {n}'), self.session.id)
+        self.assertEqual(Task.objects.filter(name='chatbot.history.compact_session', args=[self.session.id]).count(), 2)
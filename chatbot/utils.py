@@ -1,37 +1,33 @@
 # chatbot/utils.py
 from products.models import Order
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.html import escape
+from . import retrieval
+from .classifier import get_classifier
+from .intents import registry
+
+def classify_messages(messages):
+    """
+    Intent for each message: keyword matches first, then one classifier
+    batch for the messages no keyword matched, else the unknown intent.
+    """
+    intents = [registry.match(message) for message in messages]
+    misses = [i for i, intent in enumerate(intents) if intent is None]
+    classifier = get_classifier() if misses else None
+    if classifier is not None:
+        for i, (name, _) in zip(misses, classifier.predict([messages[i] for i in misses])):
+            intents[i] = registry.get(name)
+    return [intent or registry.get('unknown') for intent in intents]
 
 class ChatbotEngine:
     def __init__(self, user):
         self.user = user
     
     def process_message(self, message):
-        message = message.lower().strip()
-        
-        # Order status queries
-        if any(keyword in message for keyword in ['order status', 'where is my order', 'track order', 'order tracking']):
-            return self.handle_order_status()
-            
-        # Product information
-        elif any(keyword in message for keyword in ['prime', 'sentimart prime', 'membership']):
-            return self.handle_prime_question()
-            
-        # Payment questions
-        elif any(keyword in message for keyword in ['payment', 'refund', 'money back']):
-            return self.handle_payment_questions()
-            
-        # Delivery questions
-        elif any(keyword in message for keyword in ['delivery', 'shipping', 'when will it arrive']):
-            return self.handle_delivery_questions()
-            
-        # General help
-        elif any(keyword in message for keyword in ['help', 'support', 'contact']):
-            return self.handle_help_questions()
-            
-        # Default response
-        else:
-            return self.default_response()
+        self.message = message.strip()
+        intent = classify_messages([self.message])[0]
+        return getattr(self, intent.handler)()
     
     def handle_order_status(self):
         orders = Order.objects.filter(user=self.user).order_by('-created_at')[:3]
@@ -86,6 +82,18 @@ You can check estimated delivery dates on the product page or your order details
 
 What specific help do you need?"""
     
+    def handle_product_question(self):
+        hits = retrieval.answer(self.message)
+        if not hits:
+            return self.default_response()
+
+        product_url = reverse('product-detail', args=[hits[0].product_id])
+        response = f"Here's what I found about <a href='{product_url}'>{escape(hits[0].title)}</a>:\n\n"
+        for hit in hits:
+            response += f"• \"{escape(hit.snippet(self.message))}\" (from {retrieval.SOURCES[hit.source]})\n"
+        response += "\nOpen the product page for full details."
+        return response
+
     def default_response(self):
         return """I'm sorry, I didn't understand that. Here are some things I can help with:
         
@@ -93,5 +101,6 @@ What specific help do you need?"""
 • Explain SentiMart Prime benefits
 • Answer delivery questions
 • Help with payments
+• Answer questions about products
 
 What would you like to know?"""
\ No newline at end of file
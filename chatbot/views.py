@@ -3,7 +3,7 @@ from django.shortcuts import render
 # Create your views here.
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
-from .models import ChatSession, ChatMessage
+from . import history
 from .utils import ChatbotEngine
 import json
 
@@ -13,29 +13,11 @@ def chat_api(request):
         data = json.loads(request.body)
         message = data.get('message', '').strip()
         
-        # Get or create chat session
-        session, created = ChatSession.objects.get_or_create(
-            user=request.user,
-            is_active=True
-        )
-        
-        # Save user message
-        ChatMessage.objects.create(
-            session=session,
-            message=message,
-            is_bot=False
-        )
-        
         # Get bot response
         bot = ChatbotEngine(request.user)
         bot_response = bot.process_message(message)
         
-        # Save bot response
-        ChatMessage.objects.create(
-            session=session,
-            message=bot_response,
-            is_bot=True
-        )
+        history.record_exchange(request.user, message, bot_response)
         
         return JsonResponse({'response': bot_response})
     
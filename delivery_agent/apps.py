@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DeliveryAgentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'delivery_agent'
+
+    def ready(self):
+        import delivery_agent.signals
@@ -0,0 +1,203 @@
+"""
+Automatic assignment of pending orders to delivery agents.
+
+Agents are indexed once per run by pincode and by city, together with
+their live load (orders they hold in Shipped or About to Deliver). Pending
+orders are taken oldest first and each goes to the best agent with spare
+capacity in its delivery pincode, or failing that in its city, where
+"best" is the agent's rating minus ``DISPATCH_LOAD_PENALTY`` per open
+order. Each bucket keeps a heap of agents by score with lazy deletion, so
+picking an agent and updating its load are both O(log n). Agents who have
+rejected an order are never offered it again.
+
+Orders are read and written in batches: one keyset-ordered read of the
+batch and one of its rejections, then per 500 orders a bulk insert of the
+offers into OrderVisibility and one UPDATE that copies the offered agents
+onto the orders, and finally one dashboard rollup update.
+"""
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery
+
+from admin_panel import metrics
+from delivery_agent.models import DeliveryAgent, OrderVisibility
+from products.models import Order
+
+MAX_LOAD = getattr(settings, 'DISPATCH_MAX_LOAD', 10)
+LOAD_PENALTY = getattr(settings, 'DISPATCH_LOAD_PENALTY', 0.25)
+BATCH_SIZE = 1000
+UPDATE_BATCH = 500
+OPEN_STATUSES = ('Shipped', 'About to Deliver')
+
+
+def normalize_pincode(pincode):
+    return (pincode or '').replace(' ', '')
+
+
+def normalize_city(city):
+    return ' '.join((city or '').lower().split())
+
+
+class AgentIndex:
+    def __init__(self, agents, loads, max_load=MAX_LOAD, load_penalty=LOAD_PENALTY):
+        """``loads`` maps agent id to the number of orders it is delivering"""
+        self.max_load = max_load
+        self.load_penalty = load_penalty
+        self.agents = {agent.id: agent for agent in agents}
+        self.load = {agent.id: loads.get(agent.id, 0) for agent in agents}
+        self.by_pincode = defaultdict(list)
+        self.by_city = defaultdict(list)
+        for agent in agents:
+            agent.open_orders = self.load[agent.id]
+            self.by_pincode[normalize_pincode(agent.pincode)].append(agent.id)
+            self.by_city[normalize_city(agent.city)].append(agent.id)
+        self._heaps = {}
+        for key, bucket in self._buckets():
+            self._heaps[key] = [self._entry(agent_id) for agent_id in bucket if self.has_capacity(agent_id)]
+            heapq.heapify(self._heaps[key])
+
+    @classmethod
+    def from_database(cls, **kwargs):
+        agents = list(DeliveryAgent.objects.select_related('user').order_by('id'))
+        loads = dict(
+            Order.objects.filter(status__in=OPEN_STATUSES, assigned_to__isnull=False)
+            .values_list('assigned_to')
+            .annotate(open_orders=Count('id'))
+            .order_by()
+        )
+        return cls(agents, loads, **kwargs)
+
+    def _buckets(self):
+        for pincode, bucket in self.by_pincode.items():
+            yield ('pincode', pincode), bucket
+        for city, bucket in self.by_city.items():
+            yield ('city', city), bucket
+
+    def score(self, agent_id):
+        return self.agents[agent_id].average_rating - self.load_penalty * self.load[agent_id]
+
+    def has_capacity(self, agent_id):
+        return self.load[agent_id] < self.max_load
+
+    def _entry(self, agent_id):
+        return (-self.score(agent_id), agent_id, self.load[agent_id])
+
+    def _best_in(self, key, exclude):
+        heap = self._heaps.get(key)
+        if not heap:
+            return None
+        skipped = []
+        found = None
+        while heap:
+            _, agent_id, load = heap[0]
+            if load != self.load[agent_id] or not self.has_capacity(agent_id):
+                heapq.heappop(heap)  # stale entry, the agent was pushed again with its new load
+            elif agent_id in exclude:
+                skipped.append(heapq.heappop(heap))
+            else:
+                found = agent_id
+                break
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        return found
+
+    def best(self, pincode, city, exclude=()):
+        """Agent to offer an order for this address to, or None"""
+        return (
+            self._best_in(('pincode', normalize_pincode(pincode)), exclude)
+            or self._best_in(('city', normalize_city(city)), exclude)
+        )
+
+    def assign(self, agent_id):
+        self.load[agent_id] += 1
+        agent = self.agents[agent_id]
+        agent.open_orders = self.load[agent_id]
+        if self.has_capacity(agent_id):
+            entry = self._entry(agent_id)
+            heapq.heappush(self._heaps[('pincode', normalize_pincode(agent.pincode))], entry)
+            heapq.heappush(self._heaps[('city', normalize_city(agent.city))], entry)
+
+    def candidates(self, pincode, city):
+        """Agents for the address, those in its pincode first, each group best first"""
+        local = self.by_pincode.get(normalize_pincode(pincode), [])
+        seen = set(local)
+        nearby = [agent_id for agent_id in self.by_city.get(normalize_city(city), []) if agent_id not in seen]
+        rank = lambda agent_id: (-self.score(agent_id), agent_id)
+        return [self.agents[agent_id] for agent_id in sorted(local, key=rank) + sorted(nearby, key=rank)]
+
+
+@dataclass
+class DispatchResult:
+    assigned: int = 0
+    unassigned: int = 0
+    batches: int = 0
+
+
+def pending_orders():
+    return Order.objects.filter(status='Pending', assigned_to__isnull=True)
+
+
+def _lock(queryset):
+    if connection.features.has_select_for_update_skip_locked and connection.features.has_select_for_update_of:
+        return queryset.select_for_update(skip_locked=True, of=('self',))
+    return queryset
+
+
+def write_assignments(orders, assignments):
+    """Ship ``orders`` to the agents in ``{order_id: agent_id}`` and record the offers"""
+    order_ids = list(assignments)
+    for start in range(0, len(order_ids), UPDATE_BATCH):
+        chunk = order_ids[start:start + UPDATE_BATCH]
+        # The offer rows carry the chosen agents into a single UPDATE; older
+        # offers that were neither taken nor refused are dropped first
+        OrderVisibility.objects.filter(order__in=chunk, rejected=False).delete()
+        OrderVisibility.objects.bulk_create(
+            [OrderVisibility(order_id=order_id, agent_id=assignments[order_id]) for order_id in chunk],
+        )
+        offer = OrderVisibility.objects.filter(order=OuterRef('pk'), rejected=False).values('agent')[:1]
+        pending_orders().filter(pk__in=chunk).update(assigned_to=Subquery(offer), status='Shipped', is_assigned=True)
+    metrics.record_status_changes([
+        (metrics.order_date(order), 'Pending', 'Shipped') for order in orders if order.id in assignments
+    ])
+
+
+def dispatch_pending(index=None, batch_size=BATCH_SIZE, dry_run=False):
+    """Assign every pending, unassigned order an agent can take"""
+    index = index or AgentIndex.from_database()
+    result = DispatchResult()
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = _lock(
+                pending_orders().filter(pk__gt=last_id)
+                .select_related('delivery_address')
+                .only('id', 'created_at', 'delivery_address__zip_code', 'delivery_address__city')
+                .order_by('pk')
+            )
+            orders = list(batch[:batch_size])
+            if not orders:
+                break
+            last_id = orders[-1].id
+            result.batches += 1
+
+            rejected = defaultdict(set)
+            refusals = OrderVisibility.objects.filter(order__in=[order.id for order in orders], rejected=True)
+            for order_id, agent_id in refusals.values_list('order_id', 'agent_id'):
+                rejected[order_id].add(agent_id)
+
+            assignments = {}
+            for order in orders:
+                address = order.delivery_address
+                agent_id = address and index.best(address.zip_code, address.city, rejected.get(order.id, ()))
+                if agent_id:
+                    index.assign(agent_id)
+                    assignments[order.id] = agent_id
+            result.assigned += len(assignments)
+            result.unassigned += len(orders) - len(assignments)
+            if assignments and not dry_run:
+                write_assignments(orders, assignments)
+    return result
@@ -0,0 +1,116 @@
+import random
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F
+
+from accounts.models import User
+from buyer.models import Address, Buyer
+from delivery_agent.dispatch import OPEN_STATUSES, AgentIndex, dispatch_pending
+from delivery_agent.models import DeliveryAgent, OrderVisibility
+from products.models import Order
+from sentimart.benchmarks import count_queries, scratch_database
+
+
+def seed(orders, agents, cities, pincodes, max_load, seed):
+    """
+    Agents and pending orders spread over ``pincodes`` pincodes in ``cities``
+    cities. Returns the number of orders agents are already delivering.
+    """
+    rng = random.Random(seed)
+    areas = [(f'City {i % cities}', f'{600000 + i:06d}') for i in range(pincodes)]
+
+    agent_users = User.objects.bulk_create([
+        User(username=f'bench-agent-{i}', user_type='delivery_agent') for i in range(agents)
+    ])
+    agent_rows = []
+    for i, user in enumerate(agent_users):
+        city, pincode = rng.choice(areas)
+        agent_rows.append(DeliveryAgent(
+            user=user, phone='9999999999', city=city, location=city, pincode=pincode,
+            licence_number=str(i), licence_expiry_date=date(2030, 1, 1), driving_licence='driving_licences/x.jpg',
+            average_rating=round(rng.uniform(3, 5), 1),
+        ))
+    agent_rows = DeliveryAgent.objects.bulk_create(agent_rows)
+
+    buyer = User.objects.create(username='bench-buyer', user_type='buyer')
+    profile = Buyer.objects.create(user=buyer, phone_number='9999999999')
+    addresses = dict(zip(areas, Address.objects.bulk_create([
+        Address(buyer=profile, name='Bench', phone_number='9999999999', street_address='1 Main Road',
+                city=city, state='Kerala', zip_code=pincode)
+        for city, pincode in areas
+    ])))
+
+    # Some agents already carry deliveries in their own pincode
+    busy = [Order(user=buyer, delivery_address=addresses[agent.city, agent.pincode], total_price=100,
+                  status='Shipped', assigned_to=agent, is_assigned=True)
+            for agent in rng.sample(agent_rows, len(agent_rows) // 4) for _ in range(rng.randint(1, max_load - 1))]
+    pending = [Order(user=buyer, delivery_address=rng.choice(list(addresses.values())), total_price=100, status='Pending')
+               for _ in range(orders)]
+    Order.objects.bulk_create(busy + pending, batch_size=1000)
+
+    # ...and some pending orders were already refused by an agent in their pincode
+    by_pincode = {}
+    for agent in agent_rows:
+        by_pincode.setdefault(agent.pincode, []).append(agent)
+    refusals = []
+    for order in Order.objects.filter(status='Pending').select_related('delivery_address')[:orders // 20]:
+        local = by_pincode.get(order.delivery_address.zip_code)
+        if local:
+            refusals.append(OrderVisibility(order=order, agent=rng.choice(local), rejected=True))
+    OrderVisibility.objects.bulk_create(refusals)
+    return len(busy)
+
+
+def verify(max_load):
+    """Raise CommandError if the assignments break a dispatch rule"""
+    loads = Order.objects.filter(status__in=OPEN_STATUSES).values('assigned_to').annotate(n=Count('id')).order_by()
+    busiest = max((row['n'] for row in loads), default=0)
+    if busiest > max_load:
+        raise CommandError(f"An agent holds {busiest} open orders, the limit is {max_load}")
+    if OrderVisibility.objects.filter(rejected=True, order__assigned_to=F('agent')).exists():
+        raise CommandError("An order was assigned to an agent who rejected it")
+    far = Order.objects.filter(status='Shipped').exclude(assigned_to__city=F('delivery_address__city')).count()
+    if far:
+        raise CommandError(f"{far} orders were assigned to an agent outside their city")
+
+
+class Command(BaseCommand):
+    help = 'Dispatch synthetic pending orders to delivery agents in a scratch database and check the result'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--agents', type=int, default=400)
+        parser.add_argument('--cities', type=int, default=10)
+        parser.add_argument('--pincodes', type=int, default=200)
+        parser.add_argument('--max-load', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--max-ms', type=float, default=None, help='Fail if dispatching takes longer')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            busy = seed(options['orders'], options['agents'], options['cities'], options['pincodes'],
+                        options['max_load'], options['seed'])
+            result = None
+
+            def run():
+                nonlocal result
+                result = dispatch_pending(AgentIndex.from_database(max_load=options['max_load']))
+
+            started = time.perf_counter()
+            queries = count_queries(run)
+            elapsed = time.perf_counter() - started
+            verify(options['max_load'])
+
+            pincode_matches = Order.objects.filter(
+                status='Shipped', delivery_address__zip_code=F('assigned_to__pincode'),
+            ).count() - busy
+            self.stdout.write(
+                f"Assigned {result.assigned} of {options['orders']} orders in {result.batches} batches: "
+                f"{queries} queries, {elapsed * 1000:.0f} ms ({result.assigned / elapsed:.0f} orders/s); "
+                f"{pincode_matches} matched on pincode, {result.unassigned} left unassigned"
+            )
+            if options['max_ms'] is not None and elapsed * 1000 > options['max_ms']:
+                raise CommandError(f"Dispatch took {elapsed * 1000:.0f} ms, budget is {options['max_ms']} ms")
+        self.stdout.write(self.style.SUCCESS('Dispatch respects agent capacity, refusals and cities'))
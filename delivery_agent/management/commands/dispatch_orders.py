@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from delivery_agent.dispatch import BATCH_SIZE, MAX_LOAD, AgentIndex, dispatch_pending
+
+
+class Command(BaseCommand):
+    help = 'Assign pending orders to delivery agents in their pincode or city'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Orders assigned per transaction')
+        parser.add_argument('--max-load', type=int, default=MAX_LOAD, help='Most open orders per agent')
+        parser.add_argument('--dry-run', action='store_true', help='Work out the assignments without saving them')
+
+    def handle(self, *args, **options):
+        index = AgentIndex.from_database(max_load=options['max_load'])
+        result = dispatch_pending(index, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = 'Would assign' if options['dry_run'] else 'Assigned'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result.assigned} orders to {len(index.agents)} agents in {result.batches} batches; "
+            f"{result.unassigned} left without an available agent"
+        ))
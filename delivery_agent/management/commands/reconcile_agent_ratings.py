@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+
+from delivery_agent.models import DEFAULT_RATING, DeliveryAgent
+
+
+class Command(BaseCommand):
+    help = "Recount delivery agents' rating totals from their delivered orders and fix any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted agents without saving')
+
+    def handle(self, *args, **options):
+        rated = Q(order__status='Delivered', order__delivery_rating__isnull=False)
+        agents = DeliveryAgent.objects.annotate(
+            counted=Count('order', filter=rated),
+            summed=Sum('order__delivery_rating', filter=rated),
+        ).only('id', 'total_ratings', 'rating_sum', 'average_rating')
+
+        drifted = []
+        for agent in agents.iterator(chunk_size=2000):
+            total = agent.summed or 0
+            average = round(total / agent.counted, 1) if agent.counted else DEFAULT_RATING
+            if (agent.total_ratings, agent.rating_sum, agent.average_rating) != (agent.counted, total, average):
+                self.stdout.write(
+                    f"Agent {agent.id}: {agent.total_ratings} ratings / {agent.rating_sum} "
+                    f"-> {agent.counted} / {total} (average {agent.average_rating} -> {average})"
+                )
+                agent.total_ratings, agent.rating_sum, agent.average_rating = agent.counted, total, average
+                drifted.append(agent)
+
+        if drifted and not options['dry_run']:
+            DeliveryAgent.objects.bulk_update(
+                drifted, ['total_ratings', 'rating_sum', 'average_rating'], batch_size=500,
+            )
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drifted)} agents with drifted ratings"))
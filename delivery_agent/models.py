@@ -1,9 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import Round
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import timedelta
 
 User = get_user_model()
+DEFAULT_RATING = 4.5
 # Create your models here.
 
 class DeliveryAgent(models.Model):
@@ -20,7 +23,7 @@ class DeliveryAgent(models.Model):
     last_login_date = models.DateField(null=True, blank=True)
     total_ratings = models.PositiveIntegerField(default=0)
     rating_sum = models.FloatField(default=0)
-    average_rating = models.FloatField(default=4.5)
+    average_rating = models.FloatField(default=DEFAULT_RATING)
 
     def __str__(self):
         return self.user.username
@@ -34,19 +37,41 @@ class DeliveryAgent(models.Model):
         elif self.last_login_date != today:
             self.login_streak = 1
         self.last_login_date = today
-        self.save()
+        # Only these fields: the rating totals are moved concurrently with F() updates
+        self.save(update_fields=['login_streak', 'last_login_date'])
     
+    @classmethod
+    def apply_rating_change(cls, agent_id, old=None, new=None):
+        """Move one delivery rating from ``old`` to ``new`` (None meaning absent)"""
+        if old == new:
+            return
+        with transaction.atomic():
+            cls.objects.filter(pk=agent_id).update(
+                total_ratings=F('total_ratings') + (new is not None) - (old is not None),
+                rating_sum=F('rating_sum') + (new or 0) - (old or 0),
+            )
+            cls.objects.filter(pk=agent_id).update(average_rating=cls.average_expression())
+
+    @staticmethod
+    def average_expression():
+        return Case(
+            When(total_ratings__gt=0, then=Round(F('rating_sum') / F('total_ratings'), 1)),
+            default=Value(DEFAULT_RATING),
+            output_field=models.FloatField(),
+        )
+
     def update_rating(self):
+        """Recount the rating totals from this agent's delivered orders"""
         from products.models import Order
-        ratings = Order.objects.filter(
+        totals = Order.objects.filter(
             assigned_to=self,
-            status='Delivered'
-        ).exclude(delivery_rating__isnull=True)
-        
-        self.total_ratings = ratings.count()
-        self.rating_sum = sum(r.delivery_rating for r in ratings if r.delivery_rating is not None)
-        self.average_rating = round(self.rating_sum / self.total_ratings, 1) if self.total_ratings > 0 else 4.5
-        self.save()
+            status='Delivered',
+            delivery_rating__isnull=False,
+        ).aggregate(count=Count('id'), total=Sum('delivery_rating'))
+        self.total_ratings = totals['count']
+        self.rating_sum = totals['total'] or 0
+        self.average_rating = round(self.rating_sum / self.total_ratings, 1) if self.total_ratings > 0 else DEFAULT_RATING
+        self.save(update_fields=['total_ratings', 'rating_sum', 'average_rating'])
 
 class OrderVisibility(models.Model):
     order = models.ForeignKey('products.Order', on_delete=models.CASCADE)
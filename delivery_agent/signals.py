@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from delivery_agent.models import DeliveryAgent
+from products.models import Order
+
+def _current_contribution(order):
+    return Order.rating_contribution(order.status, order.assigned_to_id, order.delivery_rating)
+
+@receiver(post_save, sender=Order)
+def update_agent_rating(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, '_loaded_rating_contribution', None)
+    new = _current_contribution(instance)
+    instance._loaded_rating_contribution = new
+    if old == new:
+        return
+    if old and new and old[0] == new[0]:
+        DeliveryAgent.apply_rating_change(new[0], old=old[1], new=new[1])
+        return
+    if old:
+        DeliveryAgent.apply_rating_change(old[0], old=old[1])
+    if new:
+        DeliveryAgent.apply_rating_change(new[0], new=new[1])
+
+@receiver(post_delete, sender=Order)
+def remove_agent_rating(sender, instance, **kwargs):
+    old = getattr(instance, '_loaded_rating_contribution', _current_contribution(instance))
+    if old:
+        DeliveryAgent.apply_rating_change(old[0], old=old[1])
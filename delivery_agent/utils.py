@@ -23,21 +23,3 @@ def calculate_streak(user):
             return 0
     except DeliveryAgent.DoesNotExist:
         return 0
-
-def calculate_rating(agent):
-    """
-    Calculate average rating for delivery agent based on delivered orders
-    """
-    from products.models import Order
-    
-    delivered_orders = Order.objects.filter(
-        assigned_to=agent,
-        status='Delivered'
-    ).exclude(delivery_rating__isnull=True)
-    
-    if not delivered_orders.exists():
-        return 4.5  # Default rating if no ratings yet
-    
-    total_ratings = sum(order.delivery_rating for order in delivered_orders)
-    average_rating = total_ratings / delivered_orders.count()
-    return round(average_rating, 1)
\ No newline at end of file
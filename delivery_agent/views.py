@@ -10,7 +10,7 @@ from django.contrib import messages
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from django.shortcuts import render
-from .utils import calculate_streak, calculate_rating
+from .utils import calculate_streak
 from products.models import Order
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
@@ -111,13 +111,13 @@ def delivery_agent_dashboard(request):
     context = {
         'login_streak': agent.login_streak,
         'deliverable_today': deliverable_today,
-        'agent_rating': calculate_rating(agent),
+        'agent_rating': agent.average_rating,
     }
     return render(request, 'delivery_agent/agent_dashboard.html', context)
 
 def delivery_requests(request):
     agent = DeliveryAgent.objects.get(user=request.user)
-    orders = Order.objects.filter(assigned_to=agent, is_assigned=True).exclude(status='Delivered')
+    orders = Order.objects.filter(assigned_to=agent, is_assigned=True).exclude(status='Delivered').select_related('user')
     return render(request, 'delivery_agent/delivery_requests.html', {'orders': orders})
 
 @login_required
@@ -134,7 +134,11 @@ def reject_order(request, order_id):
     order = get_object_or_404(Order, id=order_id)
     issue_reason = request.POST.get('issue_reason')
     if order.assigned_to.user == request.user:
-        order.status = 'Rejected'
+        # Remember the refusal and put the order back for dispatch to another agent
+        OrderVisibility.objects.update_or_create(order=order, agent=order.assigned_to, defaults={'rejected': True})
+        order.status = 'Pending'
+        order.assigned_to = None
+        order.is_assigned = False
         order.issue_reason = issue_reason
         order.save()
     return redirect('delivery_requests')
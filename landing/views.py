@@ -1,18 +1,15 @@
 from django.shortcuts import render
-from products.models import Product
-from categories.models import Category
-from recommendations.utils import get_popular_products, get_personalized_recommendations
+from products import catalog_cache
 
 # Create your views here.
 
 def landing_page(request):
-    popular_products = get_popular_products(limit=8)
     context = {
-        'smart_phones': Product.objects.filter(category__name='Smart Phones', status='approved'),
-        'smart_watches': Product.objects.filter(category__name='Smart Watches', status='approved'),
-        'categories': Category.objects.all(),
-        'popular_products': popular_products
+        'smart_phones': catalog_cache.category_shelf('Smart Phones'),
+        'smart_watches': catalog_cache.category_shelf('Smart Watches'),
+        'categories': catalog_cache.categories(),
+        'popular_products': catalog_cache.popular_products(limit=8),
     }
-    
+    context.update(catalog_cache.fragment_context(request))
 
     return render(request, 'landing/landing_page.html', context)
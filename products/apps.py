@@ -1,6 +1,24 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+def serves_requests():
+    """False for management commands other than runserver (and its autoreloader parent)"""
+    if os.path.basename(sys.argv[0]) not in ('manage.py', 'django-admin', '__main__.py'):
+        return True
+    return sys.argv[1:2] == ['runserver'] and (os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv)
 
 
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        import products.signals
+        from products import autocomplete
+
+        if getattr(settings, 'AUTOCOMPLETE_WARM', True) and serves_requests():
+            autocomplete.warm()
@@ -0,0 +1,285 @@
+"""
+In-process autocomplete index for the search box.
+
+Product names, brands and category names are normalized and stored as a
+sorted array of word-boundary suffixes ("galaxy s23 ultra" is reachable
+from "galaxy", "s23" and "ultra"), each pointing at a prebuilt suggestion
+with its URL. A prefix lookup is a bisect plus a short scan, so answering a
+keystroke never touches the database. When a prefix finds nothing, every
+edit-distance-1 variant of its last word is tried instead.
+
+Server processes build the index in a background thread at startup (see
+``ProductsConfig.ready``); management commands build it on first use.
+Catalog signals re-read just the changed products and categories into it,
+and it is rebuilt in the background every ``AUTOCOMPLETE_REFRESH_SECONDS``
+to pick up changes made by other processes. Objects refreshed while a
+rebuild is reading the catalog are re-read into the new index before it is
+swapped in, so a rebuild never drops a refresh.
+"""
+import logging
+import string
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = getattr(settings, 'AUTOCOMPLETE_REFRESH_SECONDS', 300)
+ALPHABET = string.ascii_lowercase + string.digits
+MAX_SCAN = 200
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode()
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in text.lower()).split())
+
+
+def edits1(word):
+    """All strings one insert, delete, substitution or transposition away from ``word``"""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    deletes = [a + b[1:] for a, b in splits if b]
+    transposes = [a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1]
+    replaces = [a + c + b[1:] for a, b in splits if b for c in ALPHABET]
+    inserts = [a + c + b for a, b in splits for c in ALPHABET]
+    return set(deletes + transposes + replaces + inserts) - {word}
+
+
+def index_keys(texts):
+    """Every word-boundary suffix of the normalized ``texts``"""
+    keys = set()
+    for value in texts:
+        words = normalize(value).split(' ')
+        for start in range(len(words)):
+            key = ' '.join(words[start:])
+            if key:
+                keys.add(key)
+    return keys
+
+
+def product_suggestion(pk, name, brand_name):
+    suggestion = {
+        'type': 'product',
+        'id': pk,
+        'name': name,
+        'brand_name': brand_name,
+        'url': reverse('product-detail', kwargs={'pk': pk}),
+    }
+    return suggestion, (name, brand_name)
+
+
+def category_suggestion(pk, name, slug):
+    suggestion = {
+        'type': 'category',
+        'id': pk,
+        'name': name,
+        'url': reverse('category_products', kwargs={'slug': slug}),
+    }
+    return suggestion, (name,)
+
+
+def approved_products():
+    from products.models import Product
+
+    return Product.objects.filter(status='approved').values_list('id', 'name', 'brand_name')
+
+
+def linked_categories():
+    from categories.models import Category
+
+    return Category.objects.exclude(slug__isnull=True).values_list('id', 'name', 'slug')
+
+
+class AutocompleteIndex:
+    def __init__(self, suggestions, texts):
+        """``texts[i]`` lists the strings under which ``suggestions[i]`` is found"""
+        self.suggestions = list(suggestions)
+        self.refs_by_id = {}
+        self.keys_by_ref = {}
+        pairs = []
+        for ref, (suggestion, values) in enumerate(zip(self.suggestions, texts)):
+            keys = index_keys(values)
+            self.refs_by_id[suggestion['type'], suggestion['id']] = ref
+            self.keys_by_ref[ref] = keys
+            pairs.extend((key, ref) for key in keys)
+        pairs.sort()
+        self.pairs = pairs
+
+    @classmethod
+    def from_database(cls):
+        suggestions, texts = [], []
+        for row in approved_products().iterator(chunk_size=5000):
+            suggestion, values = product_suggestion(*row)
+            suggestions.append(suggestion)
+            texts.append(values)
+        for row in linked_categories():
+            suggestion, values = category_suggestion(*row)
+            suggestions.append(suggestion)
+            texts.append(values)
+        return cls(suggestions, texts)
+
+    def remove(self, kind, pk):
+        ref = self.refs_by_id.pop((kind, pk), None)
+        if ref is None:
+            return
+        for key in self.keys_by_ref.pop(ref):
+            i = bisect_left(self.pairs, (key, ref))
+            del self.pairs[i]
+        self.suggestions[ref] = None
+
+    def add(self, suggestion, texts):
+        """Index ``suggestion`` under ``texts``, replacing any entry of the same object"""
+        self.remove(suggestion['type'], suggestion['id'])
+        ref = len(self.suggestions)
+        self.suggestions.append(suggestion)
+        keys = index_keys(texts)
+        self.refs_by_id[suggestion['type'], suggestion['id']] = ref
+        self.keys_by_ref[ref] = keys
+        for key in keys:
+            insort(self.pairs, (key, ref))
+
+    def _prefix_refs(self, prefix):
+        pairs = self.pairs
+        i = bisect_left(pairs, (prefix,))
+        end = min(i + MAX_SCAN, len(pairs))
+        while i < end and pairs[i][0].startswith(prefix):
+            yield pairs[i][1]
+            i += 1
+
+    def suggest(self, query, products=3, categories=2, typo_tolerant=True):
+        query = normalize(query)
+        limits = {'product': products, 'category': categories}
+        found = {'product': [], 'category': []}
+        seen = set()
+
+        def collect(refs):
+            for ref in refs:
+                if ref in seen:
+                    continue
+                seen.add(ref)
+                kind = self.suggestions[ref]['type']
+                if len(found[kind]) < limits[kind]:
+                    found[kind].append(self.suggestions[ref])
+                if all(len(found[k]) >= limits[k] for k in found):
+                    return True
+            return False
+
+        collect(self._prefix_refs(query))
+        head, _, last = query.rpartition(' ')
+        if not seen and typo_tolerant and len(last) >= 3:
+            head = f'{head} ' if head else ''
+            for variant in sorted(edits1(last)):
+                if collect(self._prefix_refs(head + variant)):
+                    break
+
+        return found['product'] + found['category']
+
+
+_index = None
+_built_at = 0.0
+# (kind, id) of the objects refreshed while a rebuild is reading the catalog, None between rebuilds
+_changed = None
+_lock = threading.Lock()
+_rebuilding = threading.Lock()
+
+
+def _apply(index, changed):
+    """Re-read the ``(kind, id)`` objects in ``changed`` into ``index``"""
+    product_ids = [pk for kind, pk in changed if kind == 'product']
+    category_ids = [pk for kind, pk in changed if kind == 'category']
+    rows = {
+        'product': {row[0]: row for row in approved_products().filter(pk__in=product_ids)} if product_ids else {},
+        'category': {row[0]: row for row in linked_categories().filter(pk__in=category_ids)} if category_ids else {},
+    }
+    build = {'product': product_suggestion, 'category': category_suggestion}
+    with _lock:
+        for kind, pk in changed:
+            index.remove(kind, pk)
+            if pk in rows[kind]:
+                index.add(*build[kind](*rows[kind][pk]))
+
+
+def _build():
+    global _index, _built_at, _changed
+    with _lock:
+        _changed = set()
+    try:
+        index = AutocompleteIndex.from_database()
+        # Objects refreshed since the build started may be stale in its snapshot;
+        # re-read them until none are left, then swap in the new index
+        while True:
+            with _lock:
+                changed, _changed = _changed, set()
+                if not changed:
+                    _index, _built_at, _changed = index, time.monotonic(), None
+                    return
+            _apply(index, changed)
+    except DatabaseError:
+        logger.exception('Building the autocomplete index failed')
+        with _lock:
+            _changed = None
+
+
+def rebuild():
+    """Build a fresh index from the catalog and swap it in, unless a build is already running"""
+    if _rebuilding.acquire(blocking=False):
+        try:
+            _build()
+        finally:
+            _rebuilding.release()
+
+
+def warm():
+    """Build the index in the background so the first keystroke does not wait for it"""
+    def run():
+        apps.ready_event.wait()
+        try:
+            rebuild()
+        finally:
+            connection.close()
+
+    threading.Thread(target=run, name='autocomplete-index', daemon=True).start()
+
+
+def get_index():
+    if _index is None:
+        # Not warmed in this process (a management command), or the startup build is still running
+        with _rebuilding:
+            if _index is None:
+                _build()
+    elif time.monotonic() - _built_at >= REFRESH_SECONDS:
+        warm()
+    return _index
+
+
+def _refresh(kind, ids):
+    with _lock:
+        if _changed is not None:
+            _changed.update((kind, pk) for pk in ids)
+        index = _index
+    if index is not None:
+        _apply(index, [(kind, pk) for pk in ids])
+
+
+def refresh_products(product_ids):
+    """Re-read ``product_ids`` into the index, dropping those that are gone or no longer approved"""
+    _refresh('product', product_ids)
+
+
+def refresh_categories(category_ids):
+    """Re-read ``category_ids`` into the index, dropping those that are gone or have no slug"""
+    _refresh('category', category_ids)
+
+
+def suggest(query, **kwargs):
+    index = get_index()
+    if index is None:
+        return []
+    # refresh_* edit the index in place
+    with _lock:
+        return index.suggest(query, **kwargs)
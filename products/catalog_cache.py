@@ -0,0 +1,93 @@
+"""
+Cached catalog shelves for the landing, home, category and recommendation pages.
+
+Every cache key embeds a catalog version number. Product, Category and
+Review changes bump the version (products.signals), which orphans every
+cached shelf and template fragment at once instead of tracking which keys
+a change affects; orphaned entries simply age out. Popularity shifts with
+orders rather than catalog edits, so the popular shelves also carry a
+shorter timeout of their own.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import QuerySet
+
+from categories.models import Category
+from products.models import Product
+from recommendations.utils import get_best_seller, get_popular_products
+from sentimart.pagination import PER_PAGE, KeysetPaginator
+
+TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 600)
+POPULAR_TIMEOUT = getattr(settings, 'CATALOG_POPULAR_CACHE_TIMEOUT', 120)
+VERSION_KEY = 'catalog:version'
+
+
+def catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock so a restarted cache never reuses an old version
+        cache.add(VERSION_KEY, int(time.time()), None)
+        version = cache.get(VERSION_KEY, 0)
+    return version
+
+
+def invalidate():
+    """Retire every cached shelf and fragment"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time()), None)
+
+
+def cached(name, build, *parts, timeout=TIMEOUT):
+    """Return ``build()`` (querysets evaluated to a list), cached under the current catalog version"""
+    def evaluate():
+        value = build()
+        return list(value) if isinstance(value, QuerySet) else value
+
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    key = f'catalog:{catalog_version()}:{name}:{digest}'
+    return cache.get_or_set(key, evaluate, timeout)
+
+
+def categories():
+    return cached('categories', Category.objects.all)
+
+
+def category_shelf(name):
+    """Approved products of the category called ``name``"""
+    return cached('shelf', lambda: Product.objects.filter(category__name=name, status='approved'), name)
+
+
+def category_by_slug(slug):
+    found = cached('category', lambda: Category.objects.filter(slug=slug)[:1], slug)
+    return found[0] if found else None
+
+
+def category_products(category, cursor=None, per_page=PER_PAGE):
+    """One keyset page of the category's products"""
+    paginator = KeysetPaginator(Product.objects.filter(category=category), ordering=('-id',), per_page=per_page)
+    return cached('category-products', lambda: paginator.page(cursor), category.pk, cursor, per_page)
+
+
+def popular_products(limit=8):
+    return cached('popular', lambda: get_popular_products(limit=limit), limit, timeout=POPULAR_TIMEOUT)
+
+
+def best_seller():
+    found = cached('best-seller', lambda: [get_best_seller()], timeout=POPULAR_TIMEOUT)
+    return found[0]
+
+
+def fragment_context(request):
+    """Template variables used in the ``{% cache %}`` keys of the shelf fragments"""
+    user = request.user
+    return {
+        'catalog_version': catalog_version(),
+        'catalog_timeout': TIMEOUT,
+        'popular_timeout': POPULAR_TIMEOUT,
+        'cache_role': user.user_type if user.is_authenticated else 'anonymous',
+    }
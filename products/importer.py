@@ -0,0 +1,415 @@
+"""
+Streaming catalog importer.
+
+Records are read one at a time from an NDJSON, CSV or JSON feed (a local
+file or an http(s) URL) and written in batches: images for a batch are
+fetched concurrently by a bounded thread pool, categories and attributes
+are resolved from in-memory caches, and products are upserted on ``sku``
+with one ``bulk_create`` per batch. Variants are matched to existing rows
+by attribute signature, so re-importing a feed updates prices and stock
+instead of duplicating variants (or deleting ones that carts and orders
+point at).
+
+After every committed batch the number of records consumed is written to a
+checkpoint file; a rerun with the same checkpoint skips that many records
+and carries on.
+
+A record looks like::
+
+    {"sku": "TV-55-X1", "name": "...", "description": "...", "category": "Televisions",
+     "brand_name": "...", "model_number": "...", "price": 499.0, "discount": 0, "stock": 12,
+     "image": "https://...", "variants": [{"price": 499.0, "stock": 12, "attributes": {"Size": "55in"}}]}
+
+FakeStore-style ``id``/``title`` fields are accepted for ``sku``/``name``.
+CSV feeds carry one variant per row with ``attribute:<Name>`` columns.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import string
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from urllib.parse import urlparse
+
+import requests
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from categories.models import Category
+from products import autocomplete, catalog_cache
+from products.models import Product, ProductAttribute, ProductAttributeValue, ProductVariant
+from products.search import get_search_backend
+from products.signals import products_imported
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+WORKERS = 8
+IMAGE_TIMEOUT = 15
+IMAGE_DIR = 'products/imported'
+DEFAULT_ATTRIBUTES = {'Color': 'Default'}
+# Updated when a sku already exists; seller and status are only set on insert, so a
+# re-import neither moves a product to the importing seller nor undoes moderation
+PRODUCT_FIELDS = [
+    'category', 'sub_category', 'name', 'description', 'image', 'brand_name',
+    'model_number', 'base_price', 'discount', 'stock',
+]
+
+
+class RecordError(Exception):
+    """A feed record that cannot be imported"""
+
+
+def is_url(source):
+    return urlparse(source).scheme in ('http', 'https')
+
+
+def detect_format(source):
+    path = urlparse(source).path if is_url(source) else source
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    if ext == '.csv':
+        return 'csv'
+    return 'json'
+
+
+def _lines(source):
+    if is_url(source):
+        response = requests.get(source, stream=True, timeout=30)
+        response.raise_for_status()
+        response.encoding = response.encoding or 'utf-8'
+        try:
+            yield from response.iter_lines(decode_unicode=True)
+        finally:
+            response.close()
+    else:
+        with open(source, newline='', encoding='utf-8') as feed:
+            for line in feed:
+                yield line.rstrip('\r\n')
+
+
+def _csv_record(row):
+    record = {key: value for key, value in row.items() if value not in (None, '') and not key.startswith('attribute:')}
+    attributes = {
+        key.split(':', 1)[1]: value for key, value in row.items()
+        if key and key.startswith('attribute:') and value
+    }
+    if attributes:
+        record['variants'] = [{'price': record.get('price'), 'stock': record.get('stock'), 'attributes': attributes}]
+    return record
+
+
+def read_records(source, fmt=None):
+    """Yield feed records one by one without loading the whole feed (except for a plain JSON array)"""
+    fmt = fmt or detect_format(source)
+    if fmt == 'ndjson':
+        for line in _lines(source):
+            if line.strip():
+                yield json.loads(line)
+    elif fmt == 'csv':
+        for row in csv.DictReader(_lines(source)):
+            yield _csv_record(row)
+    else:
+        if is_url(source):
+            response = requests.get(source, timeout=30)
+            response.raise_for_status()
+            data = response.json()
+        else:
+            with open(source, encoding='utf-8') as feed:
+                data = json.load(feed)
+        yield from (data if isinstance(data, list) else data.get('products', []))
+
+
+class Checkpoint:
+    """Number of feed records already imported, kept in a small JSON file"""
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = source
+
+    @staticmethod
+    def default_path(source):
+        return f".import-{hashlib.sha1(source.encode()).hexdigest()[:12]}.json"
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding='utf-8') as fh:
+            state = json.load(fh)
+        return state.get('done', 0) if state.get('source') == self.source else 0
+
+    def save(self, done):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump({'source': self.source, 'done': done}, fh)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ImageFetcher:
+    """
+    Download product images into storage. Each URL is fetched once per run;
+    the content-addressed default storage keeps one copy of identical images
+    across runs and products.
+    """
+
+    def __init__(self, workers=WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='import-image')
+        self._local = threading.local()
+        self._names = {}
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    @staticmethod
+    def upload_name(url):
+        ext = os.path.splitext(urlparse(url).path)[1].lower() or '.jpg'
+        return f"{IMAGE_DIR}/{hashlib.sha1(url.encode()).hexdigest()}{ext[:5]}"
+
+    def fetch(self, url):
+        """Bytes of the image at ``url``, or None if it cannot be downloaded"""
+        try:
+            response = self._session().get(url, timeout=IMAGE_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            logger.warning("Could not download %s: %s", url, exc)
+            return None
+        return response.content
+
+    def fetch_all(self, urls):
+        """{url: storage name} for every distinct url ('' if it could not be downloaded)"""
+        urls = list(dict.fromkeys(url for url in urls if url))
+        todo = [url for url in urls if url not in self._names]
+        # Only the downloads run in the pool; saving stays on this thread
+        # because storage queues a thumbnail job in the database for each image
+        for url, content in zip(todo, self.pool.map(self.fetch, todo)):
+            self._names[url] = default_storage.save(self.upload_name(url), ContentFile(content)) if content else ''
+        return {url: self._names[url] for url in urls}
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+def _decimal(value, default=0):
+    try:
+        return Decimal(str(value)) if value not in (None, '') else Decimal(default)
+    except InvalidOperation:
+        raise RecordError(f"invalid number {value!r}")
+
+
+def _int(value, default=0):
+    try:
+        return int(float(value)) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        raise RecordError(f"invalid integer {value!r}")
+
+
+@dataclass
+class ImportStats:
+    created: int = 0
+    updated: int = 0
+    variants: int = 0
+    skipped: int = 0
+    images_failed: int = 0
+    errors: list = field(default_factory=list)
+
+
+class CatalogImporter:
+    def __init__(self, seller, batch_size=BATCH_SIZE, workers=WORKERS):
+        self.seller = seller
+        self.batch_size = batch_size
+        self.images = ImageFetcher(workers)
+        self.stats = ImportStats()
+        self.categories = {c.name.lower(): c for c in Category.objects.all()}
+        self.attributes = {a.name.lower(): a for a in ProductAttribute.objects.all()}
+        self.values = {
+            (v.attribute_id, v.value.lower()): v
+            for v in ProductAttributeValue.objects.filter(attribute__isnull=False)
+        }
+
+    # -- in-memory lookups ----------------------------------------------------
+
+    def category(self, name):
+        if not name:
+            return None
+        name = string.capwords(str(name).strip())
+        category = self.categories.get(name.lower())
+        if category is None:
+            category = Category.objects.filter(name__iexact=name).first() or Category.objects.create(name=name)
+            self.categories[name.lower()] = category
+        return category
+
+    def attribute_value(self, name, value):
+        name, value = str(name).strip(), str(value).strip()
+        attribute = self.attributes.get(name.lower())
+        if attribute is None:
+            attribute, _ = ProductAttribute.objects.get_or_create(name=name)
+            self.attributes[name.lower()] = attribute
+        key = (attribute.id, value.lower())
+        attribute_value = self.values.get(key)
+        if attribute_value is None:
+            attribute_value, _ = ProductAttributeValue.objects.get_or_create(attribute=attribute, value=value)
+            self.values[key] = attribute_value
+        return attribute_value
+
+    # -- records --------------------------------------------------------------
+
+    def parse(self, record):
+        sku = record.get('sku') or record.get('id')
+        name = record.get('name') or record.get('title')
+        if not sku or not name:
+            raise RecordError("record needs a sku (or id) and a name (or title)")
+        price = _decimal(record.get('price', record.get('base_price')))
+        stock = _int(record.get('stock'), 10)
+        variants = []
+        for variant in record.get('variants') or [{'attributes': DEFAULT_ATTRIBUTES}]:
+            variants.append({
+                'price': _decimal(variant.get('price'), price),
+                'stock': _int(variant.get('stock'), stock),
+                'attributes': variant.get('attributes') or DEFAULT_ATTRIBUTES,
+            })
+        return {
+            'sku': str(sku)[:100],
+            'name': str(name)[:200],
+            'description': record.get('description') or 'No description',
+            'category': record.get('category'),
+            'sub_category': str(record.get('sub_category') or '')[:100],
+            'brand_name': str(record.get('brand_name') or record.get('brand') or '')[:100],
+            'model_number': str(record.get('model_number') or '')[:100],
+            'base_price': price,
+            'discount': _decimal(record.get('discount')),
+            'stock': stock,
+            'image_url': record.get('image') or '',
+            'variants': variants,
+        }
+
+    def import_batch(self, records):
+        parsed = {}
+        for record in records:
+            try:
+                item = self.parse(record)
+            except RecordError as exc:
+                self.stats.skipped += 1
+                self.stats.errors.append(str(exc))
+                continue
+            parsed[item['sku']] = item  # a later duplicate of a sku wins
+        if not parsed:
+            return
+
+        # Network work happens before the transaction so no locks are held while downloading
+        images = self.images.fetch_all(item['image_url'] for item in parsed.values())
+        self.stats.images_failed += sum(1 for name in images.values() if not name)
+
+        with transaction.atomic():
+            existing = dict(Product.objects.filter(sku__in=parsed).values_list('sku', 'image'))
+            products = []
+            for sku, item in parsed.items():
+                image = images.get(item['image_url']) or existing.get(sku) or ''
+                products.append(Product(
+                    seller=self.seller,
+                    category=self.category(item['category']),
+                    sub_category=item['sub_category'],
+                    name=item['name'],
+                    description=item['description'],
+                    image=image,
+                    brand_name=item['brand_name'],
+                    model_number=item['model_number'],
+                    base_price=item['base_price'],
+                    discount=item['discount'],
+                    stock=item['stock'],
+                    status='approved',
+                    sku=sku,
+                ))
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=['sku'],
+                update_fields=PRODUCT_FIELDS,
+            )
+            ids = dict(Product.objects.filter(sku__in=parsed).values_list('sku', 'id'))
+            self.stats.created += len(parsed) - len(existing)
+            self.stats.updated += len(existing)
+            self._write_variants(parsed, ids)
+
+            product_ids = list(ids.values())
+            transaction.on_commit(lambda: get_search_backend().index_products(
+                Product.objects.filter(pk__in=product_ids).select_related('category')
+            ))
+            transaction.on_commit(lambda: autocomplete.refresh_products(product_ids))
+            transaction.on_commit(catalog_cache.invalidate)
+            # The bulk writes fire no model signals, so tell the apps that index products
+            transaction.on_commit(lambda: products_imported.send(sender=CatalogImporter, product_ids=product_ids))
+
+    def _write_variants(self, parsed, ids):
+        wanted = {}
+        for sku, item in parsed.items():
+            for variant in item['variants']:
+                value_ids = [self.attribute_value(name, value).id for name, value in variant['attributes'].items()]
+                signature = ProductVariant.signature_for(value_ids)
+                wanted[(ids[sku], signature)] = (variant, value_ids)
+
+        existing = {
+            (v.product_id, v.attribute_signature): v
+            for v in ProductVariant.objects.filter(product_id__in=ids.values())
+        }
+        changed, new = [], []
+        for key, (variant, value_ids) in wanted.items():
+            row = existing.get(key)
+            if row is None:
+                new.append((ProductVariant(
+                    product_id=key[0], price=variant['price'], stock=variant['stock'], attribute_signature=key[1],
+                ), value_ids))
+            elif row.price != variant['price'] or row.stock != variant['stock']:
+                row.price, row.stock = variant['price'], variant['stock']
+                changed.append(row)
+
+        if changed:
+            ProductVariant.objects.bulk_update(changed, ['price', 'stock'], batch_size=1000)
+        if new:
+            created = ProductVariant.objects.bulk_create([variant for variant, _ in new], batch_size=1000)
+            Through = ProductVariant.attributes.through
+            Through.objects.bulk_create([
+                Through(productvariant_id=variant.id, productattributevalue_id=value_id)
+                for variant, (_, value_ids) in zip(created, new)
+                for value_id in value_ids
+            ], batch_size=2000)
+        self.stats.variants += len(changed) + len(new)
+
+    def run(self, records, checkpoint=None, limit=None, progress=None):
+        """Import ``records``, resuming after the checkpoint; returns the stats"""
+        done = checkpoint.load() if checkpoint else 0
+        records = islice(records, done, None)
+        if limit is not None:
+            records = islice(records, max(limit - done, 0))
+        try:
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    break
+                self.import_batch(batch)
+                done += len(batch)
+                if checkpoint:
+                    checkpoint.save(done)
+                if progress:
+                    progress(done, self.stats)
+        finally:
+            self.images.close()
+        if checkpoint and (limit is None or done < limit):
+            # The feed ran out, so the next run starts from the top again
+            checkpoint.clear()
+        return self.stats
@@ -0,0 +1,108 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from accounts.models import User
+from products.importer import CatalogImporter, Checkpoint, read_records
+from products.models import Product, ProductVariant
+from sentimart.benchmarks import scratch_database
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def write_feed(directory, products, images, seed):
+    """Write an NDJSON feed plus small image files for it into ``directory``"""
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(directory, 'img'))
+    for i in range(images):
+        colour = tuple(rng.randrange(256) for _ in range(3))
+        Image.new('RGB', (640, 480), colour).save(os.path.join(directory, 'img', f'{i}.jpg'), 'JPEG')
+    with open(os.path.join(directory, 'feed.ndjson'), 'w') as feed:
+        for i in range(products):
+            price = rng.randint(100, 90000)
+            feed.write(json.dumps({
+                'sku': f'BENCH-{i}',
+                'name': f'Bench product {i}',
+                'description': 'Synthetic product for the import benchmark',
+                'category': rng.choice(['Smart Phones', 'Smart Watches', 'Laptops', 'Televisions']),
+                'brand_name': rng.choice(['Acme', 'Globex', 'Initech']),
+                'price': price,
+                'stock': rng.randint(0, 50),
+                'image': f'/img/{rng.randrange(images)}.jpg',
+                'variants': [
+                    {'price': price, 'stock': 5, 'attributes': {'Color': colour, 'Storage': storage}}
+                    for colour in ('Black', 'Blue') for storage in ('128GB', '256GB')
+                ],
+            }) + '\n')
+
+
+class Command(BaseCommand):
+    help = 'Import a synthetic NDJSON feed served by a local HTTP server into a scratch database, with an interrupted first run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--images', type=int, default=500)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            feed_dir = os.path.join(tmp, 'feed')
+            os.makedirs(feed_dir)
+            write_feed(feed_dir, options['products'], options['images'], options['seed'])
+            server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=feed_dir))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base = f'http://127.0.0.1:{server.server_address[1]}'
+            try:
+                with scratch_database(), override_settings(MEDIA_ROOT=os.path.join(tmp, 'media')):
+                    self.run_import(base, tmp, options)
+            finally:
+                server.shutdown()
+
+    def run_import(self, base, tmp, options):
+        seller = User.objects.create(username='bench-importer', is_superuser=True)
+        source = f'{base}/feed.ndjson'
+        checkpoint = Checkpoint(os.path.join(tmp, 'checkpoint.json'), source)
+
+        def records():
+            for record in read_records(source):
+                record['image'] = base + record['image']
+                yield record
+
+        def importer():
+            return CatalogImporter(seller, batch_size=options['batch_size'], workers=options['workers'])
+
+        half = options['products'] // 2
+        started = time.perf_counter()
+        # The first run stops half way, as if interrupted, and leaves its checkpoint behind
+        importer().run(records(), checkpoint=checkpoint, limit=half)
+        stats = importer().run(records(), checkpoint=checkpoint)
+        elapsed = time.perf_counter() - started
+
+        products = Product.objects.count()
+        variants = ProductVariant.objects.count()
+        self.stdout.write(f"{products} products, {variants} variants in {elapsed:.1f}s "
+                          f"({products / elapsed:.0f} products/s); resumed run created {stats.created}")
+        if products != options['products'] or variants != options['products'] * 4:
+            raise CommandError("Resumed import did not produce exactly one copy of every product and variant")
+
+        started = time.perf_counter()
+        stats = importer().run(records())
+        self.stdout.write(f"re-import: {stats.updated} updated, {stats.created} created, "
+                          f"{ProductVariant.objects.count()} variants in {time.perf_counter() - started:.1f}s")
+        if stats.created or ProductVariant.objects.count() != variants:
+            raise CommandError("Re-importing the same feed created duplicates")
+        self.stdout.write(self.style.SUCCESS("Import is resumable and idempotent"))
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from categories.models import Category
+from products.models import Product, Review
+from sentimart import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Create missing WebP thumbnails for product, category and review images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+
+    def image_names(self):
+        names = set()
+        for model in (Product, Category, Review):
+            names.update(
+                model.objects.exclude(image__isnull=True).exclude(image='')
+                .values_list('image', flat=True).distinct().iterator(chunk_size=5000)
+            )
+        return sorted(name for name in names if thumbnails.is_image(name))
+
+    def handle(self, *args, **options):
+        names = self.image_names()
+        written = failed = 0
+
+        def render(name):
+            try:
+                return len(thumbnails.generate(name, default_storage)), None
+            except Exception as exc:
+                return 0, f"{name}: {exc}"
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for count, error in pool.map(render, names):
+                written += count
+                if error:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(error))
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {len(names)} images, wrote {written} thumbnails, {failed} failed"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from products.models import ProductRating, Review
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored review count, sum, star histogram and sentiment counts of every product'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            ProductRating.objects.all().delete()
+            ProductRating.objects.bulk_create(
+                [ProductRating(**row) for row in ProductRating.totals(Review.objects.all()).iterator(chunk_size=2000)],
+                batch_size=1000,
+            )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ratings for {ProductRating.objects.count()} products"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for approved products'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.ensure_index()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search index with {type(backend).__name__}"))
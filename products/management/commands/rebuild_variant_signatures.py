@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from products.models import ProductVariant
+
+
+class Command(BaseCommand):
+    help = 'Recompute the attribute signature of every product variant'
+
+    def handle(self, *args, **options):
+        variants = ProductVariant.objects.prefetch_related('attributes')
+        updated = []
+        for variant in variants.iterator(chunk_size=2000):
+            variant.attribute_signature = ProductVariant.signature_for(a.id for a in variant.attributes.all())
+            updated.append(variant)
+            if len(updated) >= 2000:
+                ProductVariant.objects.bulk_update(updated, ['attribute_signature'])
+                updated = []
+        ProductVariant.objects.bulk_update(updated, ['attribute_signature'])
+        self.stdout.write(self.style.SUCCESS("Variant signatures rebuilt"))
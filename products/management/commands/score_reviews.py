@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from products import sentiment
+from products.models import ProductRating, Review
+from recommendations.popularity import refresh_popularity
+
+
+def chunks(queryset, size):
+    """(review ids, comments) of ``queryset`` in id order, ``size`` reviews at a time"""
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_id).order_by('pk').values_list('id', 'comment')[:size])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [review_id for review_id, _ in rows], [comment for _, comment in rows]
+
+
+class Command(BaseCommand):
+    help = 'Score the comment sentiment of unscored reviews, or of every review, in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Rescore every review and rebuild the product sentiment aggregates and popularity')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=sentiment.BATCH_SIZE, help='Reviews scored per worker task')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            with transaction.atomic():
+                Review.objects.update(sentiment=None)
+                ProductRating.objects.update(positive=0, neutral=0, negative=0, sentiment_total=0)
+
+        started = time.perf_counter()
+        batches = chunks(sentiment.pending_reviews(), max(1, options['chunk_size']))
+        stored = 0
+        if options['processes'] > 1:
+            # Workers only score text; reads and writes stay in this process.
+            # Forked workers must not share the parent's database connections
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options['processes'],
+                mp_context=multiprocessing.get_context('fork'),
+            ) as pool:
+                pending = []
+                for ids, comments in batches:
+                    pending.append((ids, pool.submit(sentiment.score_texts, comments)))
+                    if len(pending) >= options['processes'] * 2:
+                        ids, future = pending.pop(0)
+                        stored += sentiment.store_scores(dict(zip(ids, future.result())))
+                for ids, future in pending:
+                    stored += sentiment.store_scores(dict(zip(ids, future.result())))
+        else:
+            for ids, comments in batches:
+                stored += sentiment.store_scores(dict(zip(ids, sentiment.score_texts(comments))))
+
+        if options['all']:
+            # Scoring added every review's sentiment to popularity again on top of the old scores
+            refresh_popularity()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {stored} reviews in {time.perf_counter() - started:.1f}s"
+        ))
@@ -1,10 +1,12 @@
-from django.db import models
+import hashlib
+from django.db import models, transaction
 from django.conf import settings
 from categories.models import Category
 from delivery_agent.models import DeliveryAgent
 from buyer.models import Address
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import F, Sum
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
 
 # Create your models here.
 
@@ -78,11 +80,48 @@ class ProductVariant(models.Model):
     attributes = models.ManyToManyField(ProductAttributeValue)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     stock = models.IntegerField()
+    # Hash of the sorted attribute value ids ('' without any), kept in sync by products.signals
+    attribute_signature = models.CharField(max_length=40, blank=True, default='')
+
+    class Meta:
+        indexes = [models.Index(fields=['product', 'attribute_signature'])]
 
     def __str__(self):
         attrs = ", ".join(str(val) for val in self.attributes.all())
         return f"{self.product.name} Variant ({attrs})"
 
+    @staticmethod
+    def signature_for(value_ids):
+        """Canonical signature for a set of attribute value ids, '' (the field default) for none"""
+        key = ",".join(str(value_id) for value_id in sorted({int(v) for v in value_ids}))
+        return hashlib.sha1(key.encode()).hexdigest() if key else ''
+
+    def refresh_signature(self):
+        self.attribute_signature = self.signature_for(self.attributes.values_list('id', flat=True))
+        ProductVariant.objects.filter(pk=self.pk).update(attribute_signature=self.attribute_signature)
+
+    @classmethod
+    def fill_missing_signatures(cls, batch_size=2000):
+        """
+        Sign variants stored before signatures existed (attributes but an
+        empty signature) or with the old hash of an empty set; returns how
+        many were fixed.
+        """
+        empty_hash = hashlib.sha1(b'').hexdigest()
+        stale = cls.objects.filter(
+            Q(attribute_signature='', attributes__isnull=False) | Q(attribute_signature=empty_hash)
+        ).values_list('pk', flat=True).distinct()
+        fixed = 0
+        while True:
+            # Fixed rows drop out of the filter, so each pass takes the next batch
+            variants = list(cls.objects.filter(pk__in=list(stale[:batch_size])).prefetch_related('attributes'))
+            if not variants:
+                return fixed
+            for variant in variants:
+                variant.attribute_signature = cls.signature_for(a.id for a in variant.attributes.all())
+            cls.objects.bulk_update(variants, ['attribute_signature'])
+            fixed += len(variants)
+
 class CartItem(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -104,6 +143,8 @@ class Order(models.Model):
         ('Delivered', 'Delivered'),
         ('Rejected', 'Rejected'),
     ]
+    # Placed at checkout but not paid (yet); they hold stock but are not sales
+    UNPAID_STATUSES = ('pending_payment', 'payment_expired')
     PAYMENT_METHOD_CHOICES = [
         ('credit_card', 'Credit/Debit Card'),
         ('upi', 'UPI'),
@@ -124,11 +165,28 @@ class Order(models.Model):
         default='credit_card'
     )
 
-    def save(self, *args, **kwargs):
-        # Update agent rating when order is delivered with rating
-        if self.status == 'Delivered' and self.delivery_rating and self.assigned_to:
-            self.assigned_to.update_rating()
-        super().save(*args, **kwargs)
+    @staticmethod
+    def rating_contribution(status, agent_id, rating):
+        """(agent id, rating) an order counts towards its agent's rating, or None"""
+        if status == 'Delivered' and agent_id and rating is not None:
+            return agent_id, rating
+        return None
+
+    class Meta:
+        indexes = [models.Index(fields=['-created_at'])]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so the dashboard rollups can move the order between buckets
+        instance._loaded_status = instance.__dict__.get('status')
+        # and the agent rating it counts towards, so agent totals only move when that changes
+        instance._loaded_rating_contribution = cls.rating_contribution(
+            instance.__dict__.get('status'),
+            instance.__dict__.get('assigned_to_id'),
+            instance.__dict__.get('delivery_rating'),
+        )
+        return instance
 
     def __str__(self):
         return f"Order #{self.id} - {self.user.username} - {self.status}"
@@ -152,14 +210,144 @@ class Review(models.Model):
     comment = models.TextField(blank=True)
     image = models.ImageField(upload_to='review_images/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Comment sentiment from -1 to 1, filled in by products.sentiment; None until scored
+    sentiment = models.FloatField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', '-created_at', '-id']),
+            models.Index(fields=['id'], condition=Q(sentiment__isnull=True), name='review_sentiment_pending'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.product.name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored rating so the aggregates can apply a delta on save
+        instance._loaded_rating = instance.__dict__.get('rating')
+        return instance
+
+class ProductRating(models.Model):
+    """Running review totals for a product, maintained by products.signals"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    count = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    stars_1 = models.IntegerField(default=0)
+    stars_2 = models.IntegerField(default=0)
+    stars_3 = models.IntegerField(default=0)
+    stars_4 = models.IntegerField(default=0)
+    stars_5 = models.IntegerField(default=0)
+    # Scored reviews by comment sentiment, and the sum of their scores
+    positive = models.IntegerField(default=0)
+    neutral = models.IntegerField(default=0)
+    negative = models.IntegerField(default=0)
+    sentiment_total = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.average} ({self.count})"
+
+    @property
+    def average(self):
+        return round(self.total / self.count, 1) if self.count else 0
+
+    @property
+    def scored(self):
+        return self.positive + self.neutral + self.negative
+
+    @property
+    def sentiment(self):
+        """Mean comment sentiment of the scored reviews, from -1 to 1"""
+        return round(self.sentiment_total / self.scored, 2) if self.scored else 0
+
+    @property
+    def positive_percent(self):
+        return round(100 * self.positive / self.scored) if self.scored else 0
+
+    @property
+    def negative_percent(self):
+        return round(100 * self.negative / self.scored) if self.scored else 0
+
+    def histogram(self):
+        """(stars, count, percent) from 5 stars down to 1"""
+        return [
+            (stars, getattr(self, f'stars_{stars}'),
+             round(100 * getattr(self, f'stars_{stars}') / self.count) if self.count else 0)
+            for stars in range(5, 0, -1)
+        ]
+
+    @classmethod
+    def totals(cls, reviews):
+        """Summary rows, as dicts of field values, of the products of ``reviews``"""
+        from products.sentiment import NEGATIVE_THRESHOLD, POSITIVE_THRESHOLD
+
+        return reviews.values('product_id').annotate(
+            count=Count('id'),
+            total=Sum('rating'),
+            **{f'stars_{n}': Count('id', filter=Q(rating=n)) for n in range(1, 6)},
+            positive=Count('id', filter=Q(sentiment__gte=POSITIVE_THRESHOLD)),
+            neutral=Count('id', filter=Q(sentiment__gt=NEGATIVE_THRESHOLD, sentiment__lt=POSITIVE_THRESHOLD)),
+            negative=Count('id', filter=Q(sentiment__lte=NEGATIVE_THRESHOLD)),
+            sentiment_total=Coalesce(Sum('sentiment'), 0.0),
+        ).order_by()
+
+    @classmethod
+    def fill_missing(cls, batch_size=1000):
+        """Create the summary of every reviewed product that has none yet; returns how many were created"""
+        missing = Review.objects.filter(product__rating_summary__isnull=True)
+        return len(cls.objects.bulk_create(
+            [cls(**row) for row in cls.totals(missing).iterator(chunk_size=2000)],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        ))
+
+    @classmethod
+    def apply_change(cls, product_id, old=None, new=None):
+        """Move one review from rating ``old`` to ``new`` (None meaning absent)"""
+        if old == new:
+            return
+        changes = {
+            'count': F('count') + (new is not None) - (old is not None),
+            'total': F('total') + (new or 0) - (old or 0),
+        }
+        if new in range(1, 6):
+            changes[f'stars_{new}'] = F(f'stars_{new}') + 1
+        if old in range(1, 6):
+            changes[f'stars_{old}'] = F(f'stars_{old}') - 1
+        with transaction.atomic():
+            if new is not None:
+                # Removals never create the row, which may belong to a product being deleted
+                cls.objects.bulk_create([cls(product_id=product_id)], ignore_conflicts=True)
+            cls.objects.filter(product_id=product_id).update(**changes)
+
+    @classmethod
+    def apply_sentiment(cls, deltas, create=True, batch_size=500):
+        """Add ``{product_id: (positive, neutral, negative, total)}`` deltas, one UPDATE per batch"""
+        fields = [('positive', IntegerField()), ('neutral', IntegerField()), ('negative', IntegerField()),
+                  ('sentiment_total', FloatField())]
+        product_ids = list(deltas)
+        with transaction.atomic():
+            for start in range(0, len(product_ids), batch_size):
+                batch = product_ids[start:start + batch_size]
+                if create:
+                    cls.objects.bulk_create([cls(product_id=product_id) for product_id in batch], ignore_conflicts=True)
+                cls.objects.filter(product_id__in=batch).update(**{
+                    name: F(name) + Case(
+                        *[When(product_id=product_id, then=Value(deltas[product_id][i])) for product_id in batch],
+                        default=Value(0), output_field=output_field,
+                    )
+                    for i, (name, output_field) in enumerate(fields)
+                })
     
 class Invoice(models.Model):
     order = models.OneToOneField(Order, on_delete=models.CASCADE)
     invoice_id = models.CharField(max_length=100, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Rendered once by buyer.invoices; the storage names the file by its sha256
+    pdf = models.FileField(upload_to='invoices/', blank=True)
+    pdf_sha256 = models.CharField(max_length=64, blank=True)
+    rendered_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.invoice_id
\ No newline at end of file
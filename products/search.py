@@ -0,0 +1,247 @@
+"""
+Full-text index over approved products.
+
+The backend is picked from the database vendor (or ``PRODUCT_SEARCH_BACKEND``
+in settings): SQLite uses an FTS5 virtual table ranked with BM25, PostgreSQL a
+tsvector side table with a GIN index, and anything else falls back to the
+old ``icontains`` scan. Backends own their DDL and are kept in sync from the
+Product/Category signals in ``products.signals``.
+
+Field weights follow ``recommendations.utils.enhance_search_with_keywords``:
+name 3, brand and category 2, model number 2, description 1.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from products.models import Product
+
+PAGE_SIZE = 24
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _tokens(query):
+    return WORD_RE.findall(query.lower())
+
+
+class SearchBackend:
+    def ensure_index(self):
+        pass
+
+    def index_products(self, products):
+        pass
+
+    def remove_products(self, product_ids):
+        pass
+
+    def rebuild(self):
+        self.remove_all()
+        products = Product.objects.filter(status='approved').select_related('category')
+        self.index_products(products.iterator(chunk_size=2000))
+
+    def remove_all(self):
+        pass
+
+    def search(self, query, offset=0, limit=PAGE_SIZE):
+        """Return ranked approved products for ``query[offset:offset + limit]``"""
+        raise NotImplementedError
+
+
+class LikeSearchBackend(SearchBackend):
+    """Unindexed fallback for databases without a full-text engine"""
+
+    def search(self, query, offset=0, limit=PAGE_SIZE):
+        match = Q()
+        for word in _tokens(query):
+            match |= (
+                Q(name__icontains=word) |
+                Q(description__icontains=word) |
+                Q(brand_name__icontains=word) |
+                Q(model_number__icontains=word) |
+                Q(category__name__icontains=word)
+            )
+        if not match:
+            return []
+        return list(
+            Product.objects.filter(match, status='approved')
+            .select_related('category').distinct()
+            .order_by('-created_at')[offset:offset + limit]
+        )
+
+
+class SQLiteFTSBackend(SearchBackend):
+    table = 'products_product_fts'
+    weights = (3.0, 2.0, 2.0, 2.0, 1.0)
+
+    def __init__(self):
+        self._ready = False
+
+    def ensure_index(self):
+        if self._ready:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [self.table])
+            exists = cursor.fetchone() is not None
+            if not exists:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {self.table} USING fts5("
+                    "name, brand_name, model_number, category, description, "
+                    "tokenize = 'porter unicode61', prefix = '2 3')"
+                )
+        self._ready = True
+        if not exists:
+            self.rebuild()
+
+    def index_products(self, products):
+        self.ensure_index()
+        rows, ids = [], []
+        for product in products:
+            ids.append(product.id)
+            rows.append((
+                product.id, product.name, product.brand_name, product.model_number,
+                product.category.name if product.category else '', product.description,
+            ))
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(i,) for i in ids])
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, name, brand_name, model_number, category, description) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                rows,
+            )
+
+    def remove_products(self, product_ids):
+        self.ensure_index()
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(i,) for i in product_ids])
+
+    def remove_all(self):
+        self.ensure_index()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def search(self, query, offset=0, limit=PAGE_SIZE):
+        tokens = _tokens(query)
+        if not tokens:
+            return []
+        self.ensure_index()
+        match = ' OR '.join(f'"{token}"*' for token in tokens)
+        weights = ', '.join(str(w) for w in self.weights)
+        return list(
+            Product.objects.filter(status='approved')
+            .select_related('category')
+            .extra(
+                tables=[self.table],
+                where=[f'{self.table}.rowid = products_product.id', f'{self.table} MATCH %s'],
+                params=[match],
+                select={'rank': f'bm25({self.table}, {weights})'},
+                order_by=['rank'],
+            )[offset:offset + limit]
+        )
+
+
+class PostgresSearchBackend(SearchBackend):
+    table = 'products_product_search'
+
+    def __init__(self):
+        self._ready = False
+
+    def ensure_index(self):
+        if self._ready:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [self.table])
+            exists = cursor.fetchone()[0] is not None
+            if not exists:
+                cursor.execute(
+                    f"CREATE TABLE {self.table} ("
+                    "product_id bigint PRIMARY KEY REFERENCES products_product (id) ON DELETE CASCADE, "
+                    "document tsvector NOT NULL)"
+                )
+                cursor.execute(f"CREATE INDEX {self.table}_document ON {self.table} USING gin (document)")
+        self._ready = True
+        if not exists:
+            self.rebuild()
+
+    def index_products(self, products):
+        self.ensure_index()
+        rows = [
+            (product.id, product.name, product.brand_name,
+             product.category.name if product.category else '', product.model_number, product.description)
+            for product in products
+        ]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (product_id, document) VALUES (%s, "
+                "setweight(to_tsvector('english', %s), 'A') || "
+                "setweight(to_tsvector('english', %s), 'B') || "
+                "setweight(to_tsvector('english', %s), 'B') || "
+                "setweight(to_tsvector('english', %s), 'C') || "
+                "setweight(to_tsvector('english', %s), 'D')) "
+                "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove_products(self, product_ids):
+        self.ensure_index()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE product_id = ANY(%s)", [list(product_ids)])
+
+    def remove_all(self):
+        self.ensure_index()
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+
+    def search(self, query, offset=0, limit=PAGE_SIZE):
+        tokens = _tokens(query)
+        if not tokens:
+            return []
+        self.ensure_index()
+        tsquery = "to_tsquery('english', %s)"
+        match = ' | '.join(f'{token}:*' for token in tokens)
+        return list(
+            Product.objects.filter(status='approved')
+            .select_related('category')
+            .extra(
+                tables=[self.table],
+                where=[f'{self.table}.product_id = products_product.id', f'{self.table}.document @@ {tsquery}'],
+                params=[match],
+                select={'rank': f"ts_rank('{{0.1, 0.2, 0.4, 1.0}}', {self.table}.document, {tsquery})"},
+                select_params=[match],
+                order_by=['-rank'],
+            )[offset:offset + limit]
+        )
+
+
+BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+        backend_class = import_string(path) if path else BACKENDS.get(connection.vendor, LikeSearchBackend)
+        _backend = backend_class()
+    return _backend
+
+
+def search_products(query, page=1, page_size=PAGE_SIZE):
+    """
+    Ranked search over approved products. Returns ``(products, has_next)``;
+    one extra row is fetched to know whether another page exists.
+    """
+    offset = (page - 1) * page_size
+    products = get_search_backend().search(query, offset=offset, limit=page_size + 1)
+    return products[:page_size], len(products) > page_size
@@ -0,0 +1,219 @@
+"""
+Review comment sentiment.
+
+Comments are scored against a sentiment lexicon in the style of VADER.
+Each known word carries a weight. A negator ("not", "never", "don't") flips
+and damps the next few words up to the end of the clause, and an
+intensifier ("very", "really") boosts the word after it. Every word, and
+its negated and intensified forms, is a column of a feature matrix. A
+batch of comments is scored with one sparse matrix-vector product, and the
+sum is squashed into -1..1.
+
+Scoring happens off the request path. New or edited reviews are left with
+``sentiment`` NULL and queue a ``score_new_reviews`` job at most once per
+``SENTIMENT_BATCH_DELAY`` seconds; the job scores every pending review in
+chunks of ``SENTIMENT_BATCH_SIZE``. Each chunk's counts and score sums are
+added to the products' ProductRating rows and its decayed scores to
+ProductPopularity; editing or deleting a review takes its old score back
+out of both. ``manage.py score_reviews`` backfills or rescores
+everything in a process pool.
+"""
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from products.models import ProductRating, Review
+from recommendations import popularity
+from tasks.queue import task
+
+BATCH_SIZE = getattr(settings, 'SENTIMENT_BATCH_SIZE', 1000)
+BATCH_DELAY = getattr(settings, 'SENTIMENT_BATCH_DELAY', 10)
+
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+NEGATION_SCALE = -0.74
+NEGATION_SCOPE = 3
+BOOST = 1.3
+# Normalization constant of the compound score, as in VADER
+ALPHA = 15
+
+LEXICON = {
+    # positive
+    'amazing': 3.0, 'awesome': 3.0, 'excellent': 3.2, 'fantastic': 3.0, 'outstanding': 3.2, 'perfect': 3.0,
+    'superb': 3.0, 'brilliant': 2.8, 'love': 3.0, 'loved': 3.0, 'loves': 3.0, 'best': 3.0, 'wonderful': 2.9,
+    'great': 3.0, 'good': 1.9, 'nice': 1.8, 'happy': 2.5, 'satisfied': 2.0, 'recommend': 1.8,
+    'recommended': 1.8, 'worth': 1.5, 'beautiful': 2.6, 'comfortable': 1.8, 'sturdy': 1.5, 'durable': 1.6,
+    'reliable': 1.6, 'fast': 1.2, 'quick': 1.2, 'smooth': 1.4, 'easy': 1.5, 'solid': 1.5, 'premium': 1.5,
+    'quality': 1.2, 'value': 1.0, 'fine': 0.8, 'decent': 1.0, 'works': 1.0, 'working': 0.8, 'like': 1.5,
+    'liked': 1.5, 'pleased': 2.0, 'impressed': 2.2, 'impressive': 2.3, 'genuine': 1.4, 'accurate': 1.3,
+    'bright': 1.1, 'clear': 1.2, 'crisp': 1.3, 'elegant': 2.0, 'stylish': 1.9, 'lightweight': 1.0,
+    'affordable': 1.3, 'cheap': 0.4, 'fresh': 1.2, 'delicious': 2.7, 'soft': 1.0, 'helpful': 1.8,
+    'useful': 1.6, 'handy': 1.4, 'super': 2.0, 'favourite': 2.2, 'favorite': 2.2, 'thanks': 1.9,
+    'flawless': 2.8, 'loud': 0.5, 'powerful': 1.7, 'efficient': 1.6, 'satisfying': 2.0, 'glad': 2.0,
+    # negative
+    'bad': -2.5, 'worst': -3.1, 'terrible': -3.0, 'horrible': -3.0, 'awful': -3.0, 'poor': -2.1,
+    'disappointed': -2.3, 'disappointing': -2.2, 'disappointment': -2.3, 'useless': -2.5, 'waste': -2.2,
+    'broken': -2.2, 'broke': -2.0, 'damaged': -2.2, 'defective': -2.5, 'faulty': -2.3, 'fake': -2.4,
+    'hate': -2.7, 'hated': -2.7, 'return': -0.8, 'returned': -1.2, 'refund': -1.0, 'slow': -1.3,
+    'late': -1.2, 'delayed': -1.3, 'cheaply': -1.5, 'flimsy': -1.9, 'fragile': -1.2, 'noisy': -1.4,
+    'uncomfortable': -1.8, 'overpriced': -1.9, 'expensive': -0.9, 'problem': -1.6, 'problems': -1.6,
+    'issue': -1.3, 'issues': -1.3, 'fault': -1.7, 'stopped': -1.2, 'leaks': -1.7, 'leaking': -1.7,
+    'scratched': -1.6, 'scratches': -1.4, 'missing': -1.5, 'wrong': -1.9, 'rude': -2.0, 'dirty': -1.9,
+    'smell': -1.0, 'smells': -1.2, 'hot': -0.6, 'heating': -1.2, 'overheats': -2.0, 'lag': -1.4,
+    'laggy': -1.6, 'crash': -1.9, 'crashes': -1.9, 'dead': -2.1, 'dull': -1.3, 'weak': -1.5,
+    'fails': -2.0, 'failed': -2.1, 'junk': -2.6, 'garbage': -2.7, 'regret': -2.2, 'avoid': -1.9,
+    'annoying': -2.0, 'unusable': -2.6, 'unhappy': -2.3, 'bland': -1.2, 'stale': -1.6, 'tight': -0.5,
+}
+NEGATORS = frozenset([
+    'not', 'no', 'never', 'nothing', 'nor', 'neither', 'without', 'hardly', 'barely',
+    'dont', 'doesnt', 'didnt', 'isnt', 'wasnt', 'arent', 'werent', 'cant', 'cannot', 'wont', 'wouldnt',
+    'shouldnt', 'couldnt', 'aint', 'havent', 'hasnt',
+])
+INTENSIFIERS = frozenset([
+    'very', 'really', 'extremely', 'super', 'so', 'too', 'totally', 'absolutely', 'highly', 'incredibly',
+    'truly', 'quite', 'completely', 'most',
+])
+TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?|[.!?;,]")
+
+
+class LexiconModel:
+    def __init__(self, lexicon=LEXICON):
+        weights = []
+        self.columns = {}
+        for word, weight in lexicon.items():
+            for feature, value in ((word, weight), (f'not_{word}', weight * NEGATION_SCALE), (f'very_{word}', weight * BOOST)):
+                self.columns[feature] = len(weights)
+                weights.append(value)
+        self.weights = weights
+
+    def features(self, text):
+        """Column of every sentiment word in ``text``, in its negated or intensified form"""
+        columns = []
+        negated = 0
+        boosted = False
+        for token in TOKEN_RE.findall(text.lower()):
+            if token in '.!?;,':
+                negated, boosted = 0, False
+                continue
+            token = token.replace("'", '')
+            if token in NEGATORS:
+                negated = NEGATION_SCOPE
+                continue
+            if token in INTENSIFIERS and token not in self.columns:
+                boosted = True
+                continue
+            prefix = 'not_' if negated else 'very_' if boosted else ''
+            column = self.columns.get(prefix + token)
+            if column is not None:
+                columns.append(column)
+            negated = max(negated - 1, 0)
+            boosted = False
+        return columns
+
+    def score(self, texts):
+        """Compound sentiment of every text from -1 to 1, as a numpy array"""
+        import numpy as np
+        from scipy.sparse import csr_matrix
+
+        columns, offsets = [], [0]
+        for text in texts:
+            columns.extend(self.features(text or ''))
+            offsets.append(len(columns))
+        matrix = csr_matrix(
+            (np.ones(len(columns), dtype=np.float64), columns, offsets),
+            shape=(len(offsets) - 1, len(self.weights)),
+        )
+        raw = matrix @ np.asarray(self.weights)
+        return raw / np.sqrt(raw * raw + ALPHA)
+
+
+_model = None
+
+
+def get_model():
+    global _model
+    if _model is None:
+        _model = LexiconModel()
+    return _model
+
+
+def score_texts(texts):
+    """Scores of ``texts`` as floats; the unit of work of the backfill process pool"""
+    return get_model().score(texts).tolist()
+
+
+def label(score):
+    """0 for positive, 1 for neutral and 2 for negative, the order of ProductRating's counters"""
+    if score >= POSITIVE_THRESHOLD:
+        return 0
+    if score <= NEGATIVE_THRESHOLD:
+        return 2
+    return 1
+
+
+def deltas(scores, sign=1):
+    """ProductRating.apply_sentiment deltas for ``(product_id, score)`` pairs"""
+    result = defaultdict(lambda: [0, 0, 0, 0.0])
+    for product_id, score in scores:
+        result[product_id][label(score)] += sign
+        result[product_id][3] += sign * score
+    return result
+
+
+def forget(product_id, created_at, score):
+    """Take a scored review out of its product's aggregates and popularity"""
+    ProductRating.apply_sentiment(deltas([(product_id, score)], sign=-1), create=False)
+    popularity.record_sentiment([(product_id, created_at, score)], sign=-1)
+
+
+def _lock(queryset):
+    if connection.features.has_select_for_update_skip_locked:
+        return queryset.select_for_update(skip_locked=True)
+    return queryset
+
+
+def pending_reviews():
+    return Review.objects.filter(sentiment__isnull=True)
+
+
+def store_scores(scores):
+    """
+    Save ``{review_id: score}`` for the reviews still unscored and fold them
+    into the product aggregates; returns how many were stored.
+    """
+    with transaction.atomic():
+        rows = list(_lock(pending_reviews().filter(pk__in=scores)).values_list('id', 'product_id', 'created_at'))
+        if not rows:
+            return 0
+        Review.objects.bulk_update(
+            [Review(id=review_id, sentiment=scores[review_id]) for review_id, _, _ in rows],
+            ['sentiment'],
+            batch_size=500,
+        )
+        ProductRating.apply_sentiment(deltas([(product_id, scores[review_id]) for review_id, product_id, _ in rows]))
+        popularity.record_sentiment([(product_id, created_at, scores[review_id]) for review_id, product_id, created_at in rows])
+    return len(rows)
+
+
+def score_pending(limit=BATCH_SIZE):
+    """Score the oldest ``limit`` unscored reviews; returns how many were stored"""
+    rows = list(pending_reviews().order_by('id').values_list('id', 'comment')[:limit])
+    if not rows:
+        return 0
+    scores = score_texts([comment for _, comment in rows])
+    return store_scores({review_id: score for (review_id, _), score in zip(rows, scores)})
+
+
+def schedule():
+    """Queue a scoring run unless one is already due within the batch window"""
+    if cache.add('sentiment-pending', True, BATCH_DELAY):
+        score_new_reviews.schedule(countdown=BATCH_DELAY)
+
+
+@task
+def score_new_reviews():
+    while score_pending():
+        pass
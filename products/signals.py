@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed, post_migrate
+from django.dispatch import Signal, receiver
+from categories.models import Category
+from products import autocomplete, catalog_cache, sentiment
+from products.models import Product, ProductRating, ProductVariant, Review
+from products.search import get_search_backend
+
+# Sent with ``product_ids`` after each committed importer batch; its bulk writes fire no model signals
+products_imported = Signal()
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    transaction.on_commit(catalog_cache.invalidate)
+    transaction.on_commit(lambda: autocomplete.refresh_products([instance.id]))
+    if instance.status == 'approved':
+        transaction.on_commit(lambda: get_search_backend().index_products([instance]))
+    else:
+        transaction.on_commit(lambda: get_search_backend().remove_products([instance.id]))
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    transaction.on_commit(catalog_cache.invalidate)
+    product_id = instance.id
+    transaction.on_commit(lambda: autocomplete.refresh_products([product_id]))
+    transaction.on_commit(lambda: get_search_backend().remove_products([product_id]))
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    transaction.on_commit(catalog_cache.invalidate)
+    transaction.on_commit(lambda: autocomplete.refresh_categories([instance.id]))
+    if created:
+        return
+    products = Product.objects.filter(category=instance, status='approved').select_related('category')
+    transaction.on_commit(lambda: get_search_backend().index_products(products.iterator(chunk_size=2000)))
+
+
+@receiver(post_delete, sender=Category)
+def drop_category_suggestion(sender, instance, **kwargs):
+    transaction.on_commit(catalog_cache.invalidate)
+    category_id = instance.id
+    transaction.on_commit(lambda: autocomplete.refresh_categories([category_id]))
+
+
+@receiver(m2m_changed, sender=ProductVariant.attributes.through)
+def update_variant_signature(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # post_clear carries no pk_set, so remember which variants lose this value
+        instance._cleared_variant_ids = list(instance.productvariant_set.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.refresh_signature()
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_variant_ids', None)
+    if pk_set:
+        for variant in ProductVariant.objects.filter(pk__in=pk_set):
+            variant.refresh_signature()
+
+
+@receiver(post_migrate)
+def backfill_denormalized_fields(sender, **kwargs):
+    # The deploy runs migrate on every start; once nothing is missing these are one query each
+    if sender.name == 'products':
+        ProductVariant.fill_missing_signatures()
+        ProductRating.fill_missing()
+
+
+@receiver(pre_save, sender=Review)
+def reset_review_sentiment(sender, instance, **kwargs):
+    # The scoring job may have run since this instance was loaded, so compare with the stored row
+    stored = Review.objects.filter(pk=instance.pk).values_list('comment', 'sentiment', 'created_at').first() if instance.pk else None
+    if stored is None:
+        instance.sentiment = None
+    elif stored[0] == instance.comment:
+        instance.sentiment = stored[1]
+    else:
+        instance.sentiment = None
+        if stored[1] is not None:
+            sentiment.forget(instance.product_id, stored[2], stored[1])
+
+@receiver(post_save, sender=Review)
+def update_rating_summary(sender, instance, created, **kwargs):
+    transaction.on_commit(catalog_cache.invalidate)
+    old = None if created else getattr(instance, '_loaded_rating', None)
+    ProductRating.apply_change(instance.product_id, old=old, new=instance.rating)
+    instance._loaded_rating = instance.rating
+    if instance.sentiment is None:
+        sentiment.schedule()
+
+@receiver(pre_delete, sender=Review)
+def load_review_sentiment(sender, instance, **kwargs):
+    # An instance loaded before the scoring job ran still says None; forget the stored score
+    if instance.sentiment is None and instance.pk:
+        instance.sentiment = Review.objects.filter(pk=instance.pk).values_list('sentiment', flat=True).first()
+
+@receiver(post_delete, sender=Review)
+def remove_from_rating_summary(sender, instance, **kwargs):
+    transaction.on_commit(catalog_cache.invalidate)
+    ProductRating.apply_change(instance.product_id, old=getattr(instance, '_loaded_rating', instance.rating))
+    if instance.sentiment is not None:
+        sentiment.forget(instance.product_id, instance.created_at, instance.sentiment)
@@ -0,0 +1,20 @@
+from django import template
+from sentimart import thumbnails
+
+register = template.Library()
+
+# Thumbnails never change once written, so a name seen on disk is remembered
+_existing = set()
+
+
+@register.filter
+def thumbnail(image, size='medium'):
+    """URL of the ``size`` WebP thumbnail of an image field, or of the original until it exists"""
+    if not image:
+        return ''
+    name = thumbnails.thumbnail_name(image.name, size)
+    if name not in _existing:
+        if not image.storage.exists(name):
+            return image.url
+        _existing.add(name)
+    return image.storage.url(name)
@@ -1,3 +1,133 @@
+import hashlib
+
+from django.apps import apps
+from django.db.models.signals import post_migrate
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import User
+from categories.models import Category
+from products.models import Product, ProductAttribute, ProductAttributeValue, ProductRating, ProductVariant, Review
+
+
+def make_product(name='Product'):
+    seller, _ = User.objects.get_or_create(username='seller', defaults={'user_type': 'seller'})
+    category, _ = Category.objects.get_or_create(name='Tests', defaults={'image': 'categories/tests.jpg'})
+    return Product.objects.create(
+        seller=seller, category=category, sub_category='x', name=name, description='',
+        image='products/x.jpg', brand_name='Acme', model_number='M1', base_price=100, discount=0, stock=10,
+    )
+
+
+def send_post_migrate():
+    config = apps.get_app_config('products')
+    post_migrate.send(sender=config, app_config=config, verbosity=0, interactive=False, using='default', apps=apps, plan=[])
+
+
+class ProductRatingTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+        self.users = [User.objects.create(username=f'buyer{n}', user_type='buyer') for n in range(3)]
+
+    def summary(self):
+        return ProductRating.objects.get(product=self.product)
+
+    def review(self, user, rating, comment='fine'):
+        return Review.objects.create(product=self.product, user=user, rating=rating, comment=comment)
+
+    def test_new_reviews_are_added(self):
+        self.review(self.users[0], 5)
+        self.review(self.users[1], 2)
+        summary = self.summary()
+        self.assertEqual((summary.count, summary.total, summary.stars_5, summary.stars_2), (2, 7, 1, 1))
+        self.assertEqual(summary.average, 3.5)
+
+    def test_edit_moves_the_review_between_stars(self):
+        review = self.review(self.users[0], 5)
+        review.rating = 3
+        review.save()
+        summary = self.summary()
+        self.assertEqual((summary.count, summary.total, summary.stars_5, summary.stars_3), (1, 3, 0, 1))
+
+    def test_edit_of_a_reloaded_review(self):
+        self.review(self.users[0], 4)
+        review = Review.objects.get(product=self.product)
+        review.rating = 1
+        review.save()
+        review.save()
+        summary = self.summary()
+        self.assertEqual((summary.count, summary.total, summary.stars_4, summary.stars_1), (1, 1, 0, 1))
+
+    def test_delete_removes_the_review(self):
+        self.review(self.users[0], 4)
+        review = self.review(self.users[1], 2)
+        review.delete()
+        summary = self.summary()
+        self.assertEqual((summary.count, summary.total, summary.stars_2), (1, 4, 0))
+
+    def test_missing_summaries_are_filled_after_migrate(self):
+        self.review(self.users[0], 5, comment='great')
+        self.review(self.users[1], 1, comment='awful')
+        Review.objects.filter(user=self.users[0]).update(sentiment=0.6)
+        Review.objects.filter(user=self.users[1]).update(sentiment=-0.4)
+        ProductRating.objects.all().delete()
+        send_post_migrate()
+        summary = self.summary()
+        self.assertEqual((summary.count, summary.total, summary.stars_5, summary.stars_1), (2, 6, 1, 1))
+        self.assertEqual((summary.positive, summary.neutral, summary.negative), (1, 0, 1))
+        self.assertAlmostEqual(summary.sentiment_total, 0.2)
+        # Existing summaries are left alone
+        with self.assertNumQueries(1):
+            self.assertEqual(ProductRating.fill_missing(), 0)
+
+
+class VariantSignatureTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+        colour = ProductAttribute.objects.create(name='Colour')
+        size = ProductAttribute.objects.create(name='Size')
+        self.blue = ProductAttributeValue.objects.create(attribute=colour, value='Blue')
+        self.red = ProductAttributeValue.objects.create(attribute=colour, value='Red')
+        self.large = ProductAttributeValue.objects.create(attribute=size, value='L')
+
+    def variant(self, *values):
+        variant = ProductVariant.objects.create(product=self.product, price=100, stock=5)
+        variant.attributes.set(values)
+        return variant
+
+    def match(self, value_ids):
+        return ProductVariant.objects.filter(
+            product=self.product, attribute_signature=ProductVariant.signature_for(value_ids),
+        ).first()
+
+    def test_signature_ignores_order_and_duplicates(self):
+        ids = [self.blue.id, self.large.id]
+        self.assertEqual(ProductVariant.signature_for(ids), ProductVariant.signature_for([str(ids[1]), ids[0], ids[1]]))
+        self.assertEqual(ProductVariant.signature_for([]), '')
+
+    def test_variants_match_their_attribute_values(self):
+        blue_large = self.variant(self.blue, self.large)
+        red_large = self.variant(self.red, self.large)
+        plain = self.variant()
+        self.assertEqual(self.match([self.large.id, self.blue.id]), blue_large)
+        self.assertEqual(self.match([self.red.id, self.large.id]), red_large)
+        self.assertEqual(self.match([]), plain)
+        self.assertIsNone(self.match([self.blue.id]))
+
+    def test_signature_follows_attribute_changes(self):
+        variant = self.variant(self.blue, self.large)
+        variant.attributes.remove(self.blue)
+        self.assertEqual(self.match([self.large.id]), variant)
+        # Changes made from the value's side of the relation
+        self.red.productvariant_set.add(variant)
+        self.assertEqual(self.match([self.red.id, self.large.id]), variant)
+        self.large.productvariant_set.clear()
+        self.assertEqual(self.match([self.red.id]), variant)
+
+    def test_stale_signatures_are_fixed_after_migrate(self):
+        unsigned = self.variant(self.blue)
+        old_empty = self.variant()
+        ProductVariant.objects.filter(pk=unsigned.pk).update(attribute_signature='')
+        ProductVariant.objects.filter(pk=old_empty.pk).update(attribute_signature=hashlib.sha1(b'').hexdigest())
+        send_post_migrate()
+        self.assertEqual(self.match([self.blue.id]), unsigned)
+        self.assertEqual(self.match([]), old_empty)
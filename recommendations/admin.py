@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import UserProductInteraction
+from .models import UserProductInteraction, ProductSimilarity
 # Register your models here.
 
 admin.site.register(UserProductInteraction)
+admin.site.register(ProductSimilarity)
@@ -0,0 +1,58 @@
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from recommendations.matrix import InteractionMatrix
+
+
+def synthetic_rows(users, products, interactions, seed):
+    """Yield (user_id, product_id, view_count, purchased) with a long-tail product popularity"""
+    rng = np.random.default_rng(seed)
+    chunk = 100000
+    for start in range(0, interactions, chunk):
+        n = min(chunk, interactions - start)
+        user_ids = rng.integers(1, users + 1, n)
+        product_ids = np.minimum(rng.zipf(1.3, n), products)
+        views = rng.integers(0, 10, n)
+        purchased = rng.random(n) < 0.1
+        yield from zip(user_ids.tolist(), product_ids.tolist(), views.tolist(), purchased.tolist())
+
+
+class Command(BaseCommand):
+    help = 'Benchmark memory and time of the sparse interaction matrix on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200000)
+        parser.add_argument('--products', type=int, default=50000)
+        parser.add_argument('--interactions', type=int, default=1000000)
+        parser.add_argument('--top-k', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--skip-similarity', action='store_true')
+
+    def handle(self, *args, **options):
+        tracemalloc.start()
+        started = time.perf_counter()
+        matrix = InteractionMatrix.from_rows(synthetic_rows(
+            options['users'], options['products'], options['interactions'], options['seed']
+        ))
+        build_time = time.perf_counter() - started
+        _, build_peak = tracemalloc.get_traced_memory()
+
+        users, products = matrix.shape
+        dense_bytes = users * products * 8
+        self.stdout.write(f"matrix: {users} users x {products} products, {matrix.nnz} non-zeros")
+        self.stdout.write(f"build: {build_time:.2f}s, peak {build_peak / 2**20:.1f} MiB, "
+                          f"stored {matrix.nbytes() / 2**20:.1f} MiB "
+                          f"({matrix.nbytes() / matrix.nnz:.1f} bytes per interaction)")
+        self.stdout.write(f"dense float64 pivot would need {dense_bytes / 2**30:.1f} GiB")
+
+        if not options['skip_similarity']:
+            tracemalloc.reset_peak()
+            started = time.perf_counter()
+            pairs = sum(len(n) for _, n in matrix.product_neighbours(options['top_k']))
+            _, sim_peak = tracemalloc.get_traced_memory()
+            self.stdout.write(f"item-item top-{options['top_k']}: {pairs} pairs in "
+                              f"{time.perf_counter() - started:.2f}s, peak {sim_peak / 2**20:.1f} MiB")
+
+        tracemalloc.stop()
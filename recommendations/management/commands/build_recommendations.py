@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from recommendations.similarity import build_similarity_model, NEIGHBOURS
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed item-item similarity model used for recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=NEIGHBOURS,
+                            help='Number of neighbours kept per product')
+
+    def handle(self, *args, **options):
+        rows = build_similarity_model(top_k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f"Stored {rows} product similarities"))
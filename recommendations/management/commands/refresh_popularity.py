@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from recommendations.popularity import refresh_popularity, WINDOW_DAYS
+
+
+class Command(BaseCommand):
+    help = 'Rebuild time-decayed product popularity scores from recent orders and reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window-days', type=int, default=WINDOW_DAYS,
+                            help='Only count orders and reviews from the last N days')
+
+    def handle(self, *args, **options):
+        scored = refresh_popularity(window_days=options['window_days'])
+        self.stdout.write(self.style.SUCCESS(f"Scored {scored} products"))
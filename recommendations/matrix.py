@@ -0,0 +1,115 @@
+"""
+Sparse user x product interaction matrix.
+
+Interactions are streamed out of the database in chunks and stored as a
+scipy CSR matrix with int32 row/column indices, so memory follows the
+number of interactions instead of users x products. Cosine similarities are
+computed on the sparse matrix in row blocks and reduced to top-K neighbour
+lists straight away.
+"""
+from array import array
+from functools import cached_property
+
+import numpy as np
+from scipy import sparse
+
+from recommendations.models import UserProductInteraction
+from recommendations.similarity import interaction_weight
+
+CHUNK_SIZE = 10000
+BLOCK_SIZE = 2048
+
+
+class InteractionMatrix:
+    """Weighted interactions with id <-> index maps for both axes"""
+
+    def __init__(self, matrix, user_ids, product_ids):
+        self.matrix = matrix.tocsr()
+        self.user_ids = user_ids
+        self.product_ids = product_ids
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from an iterable of (user_id, product_id, view_count, purchased)"""
+        user_index, product_index = {}, {}
+        row_idx, col_idx, data = array('i'), array('i'), array('f')
+
+        for user_id, product_id, view_count, purchased in rows:
+            weight = interaction_weight(view_count, purchased)
+            if not weight:
+                continue
+            row_idx.append(user_index.setdefault(user_id, len(user_index)))
+            col_idx.append(product_index.setdefault(product_id, len(product_index)))
+            data.append(weight)
+
+        if not data:
+            return None
+
+        matrix = sparse.coo_matrix(
+            (np.frombuffer(data, dtype=np.float32),
+             (np.frombuffer(row_idx, dtype=np.int32), np.frombuffer(col_idx, dtype=np.int32))),
+            shape=(len(user_index), len(product_index)),
+        ).tocsr()
+        matrix.sum_duplicates()
+
+        user_ids = np.fromiter(user_index, dtype=np.int64, count=len(user_index))
+        product_ids = np.fromiter(product_index, dtype=np.int64, count=len(product_index))
+        return cls(matrix, user_ids, product_ids)
+
+    @classmethod
+    def from_database(cls, chunk_size=CHUNK_SIZE):
+        rows = (
+            UserProductInteraction.objects
+            .values_list('user_id', 'product_id', 'view_count', 'purchased')
+            .iterator(chunk_size=chunk_size)
+        )
+        return cls.from_rows(rows)
+
+    @cached_property
+    def user_index(self):
+        return {int(uid): i for i, uid in enumerate(self.user_ids)}
+
+    @cached_property
+    def product_index(self):
+        return {int(pid): i for i, pid in enumerate(self.product_ids)}
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    @property
+    def nnz(self):
+        return self.matrix.nnz
+
+    def nbytes(self):
+        m = self.matrix
+        return m.data.nbytes + m.indices.nbytes + m.indptr.nbytes + self.user_ids.nbytes + self.product_ids.nbytes
+
+    def user_neighbours(self, top_k):
+        """Yield (user_id, [(user_id, score), ...]) for every user"""
+        return self._neighbours(self.matrix, self.user_ids, top_k)
+
+    def product_neighbours(self, top_k):
+        """Yield (product_id, [(product_id, score), ...]) for every product"""
+        return self._neighbours(self.matrix.T.tocsr(), self.product_ids, top_k)
+
+    @staticmethod
+    def _neighbours(vectors, ids, top_k, block_size=BLOCK_SIZE):
+        norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        normalized = sparse.diags(1 / norms).dot(vectors).tocsr().astype(np.float32)
+        transposed = normalized.T.tocsr()
+
+        for start in range(0, normalized.shape[0], block_size):
+            block = (normalized[start:start + block_size] @ transposed).tocsr()
+            for offset in range(block.shape[0]):
+                row = start + offset
+                lo, hi = block.indptr[offset], block.indptr[offset + 1]
+                cols, scores = block.indices[lo:hi], block.data[lo:hi]
+                keep = (cols != row) & (scores > 0)
+                cols, scores = cols[keep], scores[keep]
+                if len(cols) > top_k:
+                    best = np.argpartition(-scores, top_k - 1)[:top_k]
+                    cols, scores = cols[best], scores[best]
+                order = np.argsort(-scores)
+                yield int(ids[row]), [(int(ids[c]), float(s)) for c, s in zip(cols[order], scores[order])]
@@ -17,4 +17,34 @@ class UserProductInteraction(models.Model):
         unique_together = ('user', 'product')
 
     def __str__(self):
-        return f"{self.user.username} - {self.product.name}"
\ No newline at end of file
+        return f"{self.user.username} - {self.product.name}"
+
+class ProductSimilarity(models.Model):
+    """One entry of a product's precomputed top-K neighbour list"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similarities')
+    similar_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='neighbour_of')
+    score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('product', 'similar_product')
+        indexes = [models.Index(fields=['product', '-score'])]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.similar_product_id} ({self.score:.3f})"
+
+
+class ProductPopularity(models.Model):
+    """
+    Materialized popularity of a product. Scores are forward-decayed: every
+    event is weighted by how recent it is relative to a fixed epoch, so rows
+    can be incremented in place and still rank like a time-decayed score.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+    purchase_score = models.FloatField(default=0)
+    rating_score = models.FloatField(default=0)
+    score = models.FloatField(default=0, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.score:.3f}"
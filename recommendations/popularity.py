@@ -0,0 +1,144 @@
+"""
+Time-decayed popularity ranking.
+
+Purchases and reviews are folded into ProductPopularity as they happen
+(review edits and deletions apply the difference), and
+the ``refresh_popularity`` command periodically rebuilds the table from the
+last ``POPULARITY_WINDOW_DAYS`` of history so old activity falls out. Reads
+are a single ordered query on the materialized score.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from products.models import Order, OrderItem, Product, Review
+from recommendations.models import ProductPopularity
+
+HALF_LIFE_DAYS = getattr(settings, 'POPULARITY_HALF_LIFE_DAYS', 14)
+WINDOW_DAYS = getattr(settings, 'POPULARITY_WINDOW_DAYS', 90)
+RATING_WEIGHT = getattr(settings, 'POPULARITY_RATING_WEIGHT', 0.5)
+# Weight of a review's comment sentiment (-1..1) next to its rating (0..1)
+SENTIMENT_WEIGHT = getattr(settings, 'POPULARITY_SENTIMENT_WEIGHT', 0.5)
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def decay_boost(when=None):
+    """Weight of an event at ``when``; doubles every half-life after EPOCH"""
+    when = when or timezone.now()
+    if isinstance(when, datetime):
+        elapsed = (when - EPOCH).total_seconds()
+    else:
+        elapsed = (datetime.combine(when, datetime.min.time(), tzinfo=dt_timezone.utc) - EPOCH).total_seconds()
+    return 2 ** (elapsed / (HALF_LIFE_DAYS * 86400))
+
+
+def _increment(deltas, create=True):
+    """Apply {product_id: (purchase_delta, rating_delta)} in a single F() update; ``create`` adds missing rows"""
+    if not deltas:
+        return
+
+    def delta(value):
+        return Case(
+            *[When(product_id=pid, then=Value(value(d))) for pid, d in deltas.items()],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+
+    with transaction.atomic():
+        if create:
+            ProductPopularity.objects.bulk_create(
+                [ProductPopularity(product_id=pid) for pid in deltas],
+                ignore_conflicts=True,
+            )
+        ProductPopularity.objects.filter(product_id__in=deltas).update(
+            purchase_score=F('purchase_score') + delta(lambda d: d[0]),
+            rating_score=F('rating_score') + delta(lambda d: d[1]),
+            score=F('score') + delta(lambda d: d[0] + RATING_WEIGHT * d[1]),
+            updated_at=timezone.now(),
+        )
+
+
+def record_purchases(items, when=None):
+    """Fold purchased (product_id, quantity) pairs into the popularity scores"""
+    boost = decay_boost(when)
+    deltas = defaultdict(lambda: [0.0, 0.0])
+    for product_id, quantity in items:
+        deltas[product_id][0] += quantity * boost
+    _increment(deltas)
+
+
+def record_rating_change(product_id, created_at, old=None, new=None):
+    """Move a review's rating term from ``old`` to ``new`` stars (None meaning absent)"""
+    if old == new:
+        return
+    delta = ((new or 0) - (old or 0)) / 5 * decay_boost(created_at)
+    _increment({product_id: (0.0, delta)}, create=new is not None)
+
+
+def record_sentiment(reviews, sign=1):
+    """
+    Fold scored ``(product_id, created_at, sentiment)`` reviews into the
+    rating scores, or take them back out with ``sign=-1``.
+    """
+    deltas = defaultdict(lambda: [0.0, 0.0])
+    for product_id, created_at, sentiment in reviews:
+        deltas[product_id][1] += sign * SENTIMENT_WEIGHT * sentiment * decay_boost(created_at)
+    # Taking a review out must not recreate the row of a product being deleted
+    _increment(deltas, create=sign > 0)
+
+
+def refresh_popularity(window_days=WINDOW_DAYS):
+    """Rebuild every score from the recent window. Returns the number of products scored."""
+    since = timezone.now() - timedelta(days=window_days)
+    scores = defaultdict(lambda: [0.0, 0.0])
+
+    purchases = (
+        OrderItem.objects.filter(order__created_at__gte=since)
+        .exclude(order__status__in=Order.UNPAID_STATUSES)
+        .annotate(day=TruncDate('order__created_at'))
+        .values_list('product_id', 'day')
+        .annotate(units=Sum('quantity'))
+    )
+    for product_id, day, units in purchases:
+        scores[product_id][0] += units * decay_boost(day)
+
+    ratings = (
+        Review.objects.filter(created_at__gte=since)
+        .annotate(day=TruncDate('created_at'))
+        .values_list('product_id', 'day')
+        .annotate(total=Sum('rating'), sentiment=Sum('sentiment'))
+    )
+    for product_id, day, total, sentiment in ratings:
+        scores[product_id][1] += (total / 5 + SENTIMENT_WEIGHT * (sentiment or 0)) * decay_boost(day)
+
+    now = timezone.now()
+    with transaction.atomic():
+        ProductPopularity.objects.all().delete()
+        ProductPopularity.objects.bulk_create(
+            [
+                ProductPopularity(
+                    product_id=product_id,
+                    purchase_score=purchase,
+                    rating_score=rating,
+                    score=purchase + RATING_WEIGHT * rating,
+                    updated_at=now,
+                )
+                for product_id, (purchase, rating) in scores.items()
+            ],
+            batch_size=1000,
+        )
+    return len(scores)
+
+
+def top_products(limit=5, category=None, order_by='score'):
+    """Top approved products by materialized popularity, optionally within a category"""
+    products = Product.objects.filter(status='approved', **{f'popularity__{order_by}__gt': 0})
+    if category is not None:
+        products = products.filter(category=category)
+    return list(products.order_by(f'-popularity__{order_by}', 'id')[:limit])
@@ -1,23 +1,28 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from recommendations.models import UserProductInteraction
+from recommendations import popularity, tasks
 from products.models import OrderItem, Review
 
 @receiver(post_save, sender=OrderItem)
 def update_purchased_interaction(sender, instance, created, **kwargs):
+    # Bulk order placement bypasses this receiver and enqueues
+    # one record_purchases job for the whole order instead.
     if created:
-        interaction, created = UserProductInteraction.objects.get_or_create(
-            user=instance.order.user,
-            product=instance.product
-        )
-        interaction.purchased = True
-        interaction.save()
+        tasks.record_purchases.delay(instance.order.user_id, [(instance.product_id, instance.quantity)])
+
+@receiver(pre_save, sender=Review)
+def remember_popularity_rating(sender, instance, **kwargs):
+    # products.signals moves _loaded_rating on in its post_save, which runs before ours
+    instance._popularity_rating = getattr(instance, '_loaded_rating', None) if instance.pk else None
 
 @receiver(post_save, sender=Review)
 def update_rating_interaction(sender, instance, created, **kwargs):
-    interaction, created = UserProductInteraction.objects.get_or_create(
-        user=instance.user,
-        product=instance.product
-    )
-    interaction.rating = instance.rating
-    interaction.save()
\ No newline at end of file
+    old = None if created else getattr(instance, '_popularity_rating', None)
+    popularity.record_rating_change(instance.product_id, instance.created_at, old=old, new=instance.rating)
+    instance._popularity_rating = instance.rating
+    tasks.record_review_interaction.delay(instance.id, created)
+
+@receiver(post_delete, sender=Review)
+def remove_rating_popularity(sender, instance, **kwargs):
+    old = getattr(instance, '_popularity_rating', getattr(instance, '_loaded_rating', instance.rating))
+    popularity.record_rating_change(instance.product_id, instance.created_at, old=old)
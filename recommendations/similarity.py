@@ -0,0 +1,147 @@
+"""
+Persisted item-item similarity model.
+
+Every product keeps a top-K list of its most similar products in
+ProductSimilarity. The full model is built offline by the
+``build_recommendations`` command; between builds the lists of products
+touched by a new interaction are refreshed from the interaction table so
+the request path only has to read a handful of indexed rows.
+"""
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Sum, Value, When
+
+from recommendations.models import ProductSimilarity, UserProductInteraction
+
+NEIGHBOURS = getattr(settings, 'RECOMMENDATION_NEIGHBOURS', 20)
+
+# Same weighting as the interaction matrix: a purchase is worth ten views.
+INTERACTION_WEIGHT = F('view_count') * 0.1 + Case(
+    When(purchased=True, then=Value(1.0)),
+    default=Value(0.0),
+    output_field=FloatField(),
+)
+
+
+def interaction_weight(view_count, purchased):
+    return view_count * 0.1 + (1.0 if purchased else 0.0)
+
+
+def _write_neighbours(rows):
+    """Upsert (product_id, similar_product_id, score) rows"""
+    ProductSimilarity.objects.bulk_create(
+        [ProductSimilarity(product_id=p, similar_product_id=s, score=score) for p, s, score in rows],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['product', 'similar_product'],
+        update_fields=['score', 'updated_at'],
+    )
+
+
+def build_similarity_model(top_k=NEIGHBOURS):
+    """Rebuild every neighbour list from scratch. Returns the number of rows written."""
+    from recommendations.utils import create_interaction_matrix
+
+    interaction_matrix = create_interaction_matrix()
+    if interaction_matrix is None:
+        ProductSimilarity.objects.all().delete()
+        return 0
+
+    written = 0
+    with transaction.atomic():
+        ProductSimilarity.objects.all().delete()
+        batch = []
+        for product_id, neighbours in interaction_matrix.product_neighbours(top_k):
+            batch.extend((product_id, pid, score) for pid, score in neighbours)
+            if len(batch) >= 10000:
+                _write_neighbours(batch)
+                written += len(batch)
+                batch = []
+        _write_neighbours(batch)
+        written += len(batch)
+    return written
+
+
+def refresh_neighbours(product_ids, top_k=NEIGHBOURS):
+    """
+    Recompute the neighbour lists of the given products and push their new
+    scores into the lists of the products they co-occur with.
+
+    Only users who interacted with those products are read, so the cost
+    follows their audience rather than the whole interaction table. Reverse
+    lists may briefly hold more than ``top_k`` entries; the next full build
+    trims them. Returns the number of neighbour rows written.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return 0
+    audience = UserProductInteraction.objects.filter(product_id__in=product_ids).values('user_id')
+    user_rows = defaultdict(list)
+    for user_id, pid, views, purchased in (
+        UserProductInteraction.objects.filter(user_id__in=audience)
+        .values_list('user_id', 'product_id', 'view_count', 'purchased')
+    ):
+        user_rows[user_id].append((pid, interaction_weight(views, purchased)))
+
+    targets = defaultdict(dict)
+    for user_id, rows in user_rows.items():
+        for pid, weight in rows:
+            if pid in product_ids and weight:
+                targets[pid][user_id] = weight
+
+    dots = {}
+    for target_id, weights in targets.items():
+        products = defaultdict(float)
+        for user_id, target_weight in weights.items():
+            for pid, weight in user_rows[user_id]:
+                if pid != target_id and weight:
+                    products[pid] += target_weight * weight
+        dots[target_id] = products
+
+    candidates = set().union(*dots.values()) if dots else set()
+    norms = dict(
+        UserProductInteraction.objects.filter(product_id__in=candidates)
+        .values('product_id')
+        .annotate(sq=Sum(INTERACTION_WEIGHT * INTERACTION_WEIGHT, output_field=FloatField()))
+        .values_list('product_id', 'sq')
+    ) if candidates else {}
+
+    rows = []
+    for target_id, products in dots.items():
+        target_norm = math.sqrt(sum(w * w for w in targets[target_id].values()))
+        scores = {
+            pid: dot / (target_norm * math.sqrt(norms[pid]))
+            for pid, dot in products.items() if norms.get(pid)
+        }
+        rows.extend((target_id, pid, score) for pid, score in sorted(scores.items(), key=lambda item: -item[1])[:top_k])
+        rows.extend((pid, target_id, score) for pid, score in scores.items() if pid not in product_ids)
+
+    with transaction.atomic():
+        ProductSimilarity.objects.filter(product_id__in=product_ids).delete()
+        _write_neighbours(rows)
+    return len(rows)
+
+
+def similar_products_for_user(user_id, queryset, limit=5, seeds=50):
+    """
+    Rank ``queryset`` by summed similarity to the user's most recent
+    interactions, excluding products the user has already seen.
+    """
+    seed_ids = list(
+        UserProductInteraction.objects.filter(user_id=user_id)
+        .order_by('-last_interaction')
+        .values_list('product_id', flat=True)[:seeds]
+    )
+    if not seed_ids:
+        return []
+
+    seen = UserProductInteraction.objects.filter(user_id=user_id).values('product_id')
+    return list(
+        queryset.filter(neighbour_of__product_id__in=seed_ids)
+        .exclude(id__in=seen)
+        .annotate(affinity=Sum('neighbour_of__score'))
+        .order_by('-affinity')[:limit]
+    )
@@ -0,0 +1,29 @@
+from products.models import Review
+from recommendations.models import UserProductInteraction
+from recommendations.similarity import refresh_neighbours
+from recommendations.utils import record_order_purchases
+from tasks.queue import task
+
+
+@task
+def record_purchases(user_id, purchases):
+    """Fold an order's [product_id, quantity] pairs into the user's interactions and popularity"""
+    record_order_purchases(user_id, purchases)
+
+
+@task
+def refresh_product_neighbours(product_ids):
+    """Recompute the neighbour lists of products whose interactions changed"""
+    refresh_neighbours(product_ids)
+
+
+@task
+def record_review_interaction(review_id, created):
+    review = Review.objects.filter(pk=review_id).first()
+    if review is None:
+        return
+    UserProductInteraction.objects.update_or_create(
+        user_id=review.user_id,
+        product_id=review.product_id,
+        defaults={'rating': review.rating},
+    )
@@ -0,0 +1,126 @@
+"""
+Write-behind buffer for product view counts.
+
+Page views only bump an in-memory counter. The buffer is flushed to
+UserProductInteraction every ``VIEW_COUNTER_FLUSH_INTERVAL`` seconds (or
+once ``VIEW_COUNTER_MAX_PENDING`` distinct pairs are waiting) with a bulk
+insert of missing rows and grouped ``F('view_count') + n`` updates. Views
+recorded since the last flush are lost if the process dies, which is an
+accepted trade-off for a ranking signal; set the interval to 0 to write
+every view straight through.
+
+Views change the interaction weights, so each flush also queues a
+neighbour refresh for the viewed products. A product is refreshed at most
+once per ``VIEW_NEIGHBOUR_REFRESH_DELAY`` seconds; the job runs at the end
+of that window and picks up every view flushed during it.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from recommendations.models import UserProductInteraction
+from recommendations.tasks import refresh_product_neighbours
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 5)
+MAX_PENDING = getattr(settings, 'VIEW_COUNTER_MAX_PENDING', 1000)
+NEIGHBOUR_REFRESH_DELAY = getattr(settings, 'VIEW_NEIGHBOUR_REFRESH_DELAY', 300)
+UPDATE_BATCH = 200
+
+
+def schedule_neighbour_refresh(product_ids):
+    """Queue a neighbour refresh for the products not already waiting for one"""
+    due = [pid for pid in sorted(product_ids) if cache.add(f'neighbours-refresh:{pid}', True, NEIGHBOUR_REFRESH_DELAY)]
+    if due:
+        refresh_product_neighbours.schedule(args=(due,), countdown=NEIGHBOUR_REFRESH_DELAY)
+
+
+def write_view_counts(counts):
+    """Persist {(user_id, product_id): views} with a few bulk statements"""
+    if not counts:
+        return
+    now = timezone.now()
+    by_increment = defaultdict(list)
+    for key, views in counts.items():
+        by_increment[views].append(key)
+
+    with transaction.atomic():
+        UserProductInteraction.objects.bulk_create(
+            [UserProductInteraction(user_id=user_id, product_id=product_id) for user_id, product_id in counts],
+            ignore_conflicts=True,
+            batch_size=500,
+        )
+        for views, keys in by_increment.items():
+            for start in range(0, len(keys), UPDATE_BATCH):
+                match = Q()
+                for user_id, product_id in keys[start:start + UPDATE_BATCH]:
+                    match |= Q(user_id=user_id, product_id=product_id)
+                UserProductInteraction.objects.filter(match).update(
+                    view_count=F('view_count') + views,
+                    last_interaction=now,
+                )
+        schedule_neighbour_refresh({product_id for _, product_id in counts})
+
+
+class ViewCounterBuffer:
+    def __init__(self, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def record(self, user_id, product_id, views=1):
+        if not self.flush_interval:
+            write_view_counts({(user_id, product_id): views})
+            return
+        with self._lock:
+            self._pending[(user_id, product_id)] += views
+            full = len(self._pending) >= self.max_pending
+            if self._flusher is None:
+                self._start_flusher()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+        try:
+            write_view_counts(pending)
+        except Exception:
+            logger.exception("Could not flush %d buffered view counts", len(pending))
+            with self._lock:
+                # Retry on the next flush unless the backlog is already large
+                if len(self._pending) < self.max_pending:
+                    self._pending.update(pending)
+
+    def _start_flusher(self):
+        self._flusher = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+
+view_counter = ViewCounterBuffer()
+
+
+def record_view(user_id, product_id):
+    view_counter.record(user_id, product_id)
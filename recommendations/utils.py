@@ -1,87 +1,53 @@
-import numpy as np
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-from products.models import Product, OrderItem, Review
+from django.db import transaction
+from products.models import Product
 from recommendations.models import UserProductInteraction
-from django.db import models
+from recommendations.popularity import record_purchases, top_products
+from recommendations.similarity import refresh_neighbours, similar_products_for_user
 
-def get_popular_products(limit=5):
-    """Get most popular products based on purchases and reviews"""
-    # Get top purchased products
-    top_purchased = list(OrderItem.objects.values('product')
-                        .annotate(count=models.Count('product'))
-                        .order_by('-count')[:limit])
-    
-    # Get top rated products
-    top_rated = list(Review.objects.values('product')
-                    .annotate(avg_rating=models.Avg('rating'))
-                    .order_by('-avg_rating')[:limit])
-    
-    # Combine and deduplicate
-    product_ids = set()
-    popular_products = []
-    
-    for item in top_purchased + top_rated:
-        if item['product'] not in product_ids:
-            product_ids.add(item['product'])
-            try:
-                product = Product.objects.get(id=item['product'])
-                popular_products.append(product)
-            except Product.DoesNotExist:
-                continue
-    
-    return popular_products[:limit]
+def get_popular_products(limit=5, category=None):
+    """Get most popular products based on decayed purchase and review scores"""
+    return top_products(limit, category=category)
+
+def get_best_seller():
+    """Get the approved product with the highest decayed purchase score"""
+    products = top_products(1, order_by='purchase_score')
+    return products[0] if products else None
+
+def record_order_purchases(user_id, purchases):
+    """
+    Mark (product_id, quantity) ``purchases`` as bought by the user: one
+    interaction upsert, one popularity update and a neighbour refresh once
+    the transaction commits.
+    """
+    purchases = [(product_id, quantity) for product_id, quantity in purchases]
+    product_ids = {product_id for product_id, _ in purchases}
+    if not product_ids:
+        return
+    UserProductInteraction.objects.bulk_create(
+        [UserProductInteraction(user_id=user_id, product_id=pid, purchased=True) for pid in product_ids],
+        update_conflicts=True,
+        unique_fields=['user', 'product'],
+        update_fields=['purchased', 'last_interaction'],
+    )
+    record_purchases(purchases)
+    transaction.on_commit(lambda: refresh_neighbours(product_ids))
 
 def create_interaction_matrix():
-    """Create a user-product interaction matrix for collaborative filtering"""
-    interactions = UserProductInteraction.objects.all().values('user', 'product', 'view_count', 'purchased')
-    
-    if not interactions:
-        return None, None, None
-    
-    df = pd.DataFrame.from_records(interactions)
-    
-    # Create a weight for each interaction
-    df['weight'] = df['view_count'] * 0.1 + df['purchased'] * 1.0
-    
-    # Create pivot table
-    interaction_matrix = df.pivot_table(index='user', columns='product', values='weight', fill_value=0)
-    
-    # Calculate cosine similarity
-    user_similarity = cosine_similarity(interaction_matrix)
-    product_similarity = cosine_similarity(interaction_matrix.T)
-    
-    return interaction_matrix, user_similarity, product_similarity
+    """Create a sparse user-product interaction matrix for collaborative filtering"""
+    from recommendations.matrix import InteractionMatrix
+
+    return InteractionMatrix.from_database()
 
 def get_personalized_recommendations(user_id, limit=5):
-    """Get personalized recommendations for a user"""
-    interaction_matrix, user_similarity, product_similarity = create_interaction_matrix()
-    
-    if interaction_matrix is None:
-        return get_popular_products(limit)
-    
-    try:
-        user_idx = interaction_matrix.index.get_loc(user_id)
-    except KeyError:
+    """Get personalized recommendations for a user from the precomputed similarity model"""
+    products = similar_products_for_user(
+        user_id,
+        Product.objects.filter(status='approved'),
+        limit=limit,
+    )
+    if not products:
         return get_popular_products(limit)
-    
-    # Get similar users
-    similar_users = np.argsort(user_similarity[user_idx])[::-1][1:4]  # top 3 similar users
-    
-    # Get products those users interacted with
-    recommended_products = set()
-    for sim_user_idx in similar_users:
-        sim_user_id = interaction_matrix.index[sim_user_idx]
-        top_products = interaction_matrix.loc[sim_user_id].sort_values(ascending=False).index[:5]
-        recommended_products.update(top_products)
-    
-    # Get products the user hasn't interacted with
-    user_products = set(interaction_matrix.columns[interaction_matrix.loc[user_id] > 0])
-    recommended_products = recommended_products - user_products
-    
-    # Get product objects
-    products = Product.objects.filter(id__in=recommended_products)[:limit]
-    
+
     return products
 
 def enhance_search_with_keywords(query, products):
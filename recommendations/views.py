@@ -2,12 +2,12 @@ from django.shortcuts import render
 
 # Create your views here.
 from django.shortcuts import render
-from products.models import Product
-from recommendations.utils import get_popular_products, get_personalized_recommendations
+from products import catalog_cache
+from recommendations.utils import get_personalized_recommendations
 
 def product_recommendations(request):
     # Get popular products
-    popular_products = get_popular_products(limit=8)
+    popular_products = catalog_cache.popular_products(limit=8)
     
     # Get personalized recommendations if user is authenticated
     personalized_products = []
@@ -19,4 +19,4 @@ def product_recommendations(request):
         'personalized_products': personalized_products,
     }
     
-    return render(request, 'recommendations/recommendations.html', context)
\ No newline at end of file
+    return render(request, 'recommendations/recommendations.html', context)
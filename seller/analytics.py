@@ -0,0 +1,56 @@
+"""
+Seller dashboard figures, computed by the database.
+
+The headline numbers come from one aggregate over the seller's order items
+(nothing is loaded into Python), best sellers from the per-product daily
+rollups maintained by admin_panel.metrics, so a dashboard view costs a
+handful of queries whatever the seller's order volume.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from products.models import Order, OrderItem, Product
+
+NEW_ORDER_DAYS = 7
+
+
+def sales_totals(seller, now=None):
+    """Revenue, distinct customers and orders placed in the last week, in one query"""
+    since = (now or timezone.now()) - timedelta(days=NEW_ORDER_DAYS)
+    totals = OrderItem.objects.filter(product__seller=seller).exclude(order__status__in=Order.UNPAID_STATUSES).aggregate(
+        total_sales=Sum(F('price') * F('quantity')),
+        customers=Count('order__user', distinct=True),
+        new_orders=Count('order', distinct=True, filter=Q(order__created_at__gte=since)),
+    )
+    totals['total_sales'] = totals['total_sales'] or 0
+    return totals
+
+
+def best_sellers(seller, limit=6):
+    return Product.objects.filter(seller=seller).annotate(
+        total_sold=Coalesce(Sum('daily_sales__units'), 0)
+    ).order_by('-total_sold')[:limit]
+
+
+def recent_orders(seller, limit=6):
+    # EXISTS instead of a join + DISTINCT, so the newest orders can be checked one by one
+    sold_here = OrderItem.objects.filter(order=OuterRef('pk'), product__seller=seller)
+    return (
+        Order.objects.filter(Exists(sold_here))
+        .exclude(status__in=Order.UNPAID_STATUSES)
+        .select_related('user')
+        .order_by('-created_at')[:limit]
+    )
+
+
+def dashboard_context(seller):
+    context = sales_totals(seller)
+    context.update({
+        'best_sellers': best_sellers(seller),
+        'low_stock': Product.objects.filter(seller=seller, stock__lt=10),
+        'recent_orders': recent_orders(seller),
+    })
+    return context
@@ -0,0 +1,82 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from admin_panel.metrics import backfill
+from categories.models import Category
+from products.models import Order, OrderItem, Product
+from seller import analytics
+from sentimart.benchmarks import measure, scratch_database
+
+
+def evaluate_dashboard(seller):
+    """Build the dashboard context and evaluate every queryset the template reads"""
+    context = analytics.dashboard_context(seller)
+    for key in ('best_sellers', 'low_stock', 'recent_orders'):
+        context[key] = list(context[key])
+    return context
+
+
+class Command(BaseCommand):
+    help = 'Seed a high-volume seller in a scratch database and check the seller dashboard query count and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--buyers', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--items-per-order', type=int, default=4)
+        parser.add_argument('--max-queries', type=int, default=4)
+        parser.add_argument('--max-ms', type=float, default=1000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        seller = User.objects.create(username='bench-seller', user_type='seller')
+        category = Category.objects.create(name='Bench', image='categories/bench.jpg')
+        products = Product.objects.bulk_create([
+            Product(
+                seller=seller, category=category, sub_category='bench', name=f'Bench product {i}',
+                description='', image='products/bench.jpg', brand_name='Bench', model_number=str(i),
+                base_price=Decimal(rng.randint(100, 5000)), discount=0, stock=rng.randint(0, 100),
+                status='approved',
+            )
+            for i in range(options['products'])
+        ], batch_size=1000)
+        buyers = User.objects.bulk_create([
+            User(username=f'bench-buyer-{i}', user_type='buyer') for i in range(options['buyers'])
+        ], batch_size=1000)
+        orders = Order.objects.bulk_create([
+            Order(user=rng.choice(buyers), total_price=0, status='Delivered')
+            for _ in range(options['orders'])
+        ], batch_size=1000)
+        # Spread the orders over the last 90 days so the new-orders window is selective
+        now = timezone.now()
+        for days in range(90):
+            Order.objects.filter(pk__in=[o.pk for o in orders[days::90]]).update(created_at=now - timedelta(days=days))
+
+        items = []
+        for order in orders:
+            for product in rng.sample(products, options['items_per_order']):
+                items.append(OrderItem(order=order, product=product, quantity=rng.randint(1, 3), price=product.base_price))
+        OrderItem.objects.bulk_create(items, batch_size=2000)
+        backfill()
+        return seller, len(items)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            started = time.perf_counter()
+            with transaction.atomic():
+                seller, item_count = self.seed(options)
+            self.stdout.write(f"seeded {options['orders']} orders, {item_count} order items "
+                              f"in {time.perf_counter() - started:.1f}s")
+
+            result = measure(evaluate_dashboard, seller)
+            self.stdout.write(f"seller dashboard: {result}")
+            result.check(options['max_queries'], options['max_ms'], label='seller dashboard')
+        self.stdout.write(self.style.SUCCESS("Seller dashboard is within budget"))
@@ -10,10 +10,8 @@ from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt 
-from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Sum 
-from django.db.models.functions import Coalesce
+from seller import analytics
+from sentimart.pagination import json_page, paginate, wants_json
 
 @never_cache
 def seller_registration(request):
@@ -114,41 +112,7 @@ def seller_dashboard(request):
     if request.user.user_type != 'seller':
         return redirect('dashboard')
     
-    seller = request.user
-    products = Product.objects.filter(seller=seller)
-    
-    order_items = OrderItem.objects.filter(product__seller=seller).select_related('order', 'product')
-    
-    total_sales = sum(item.price * item.quantity for item in order_items)
-    
-    new_orders = order_items.filter(
-        order__created_at__gte=timezone.now()-timedelta(days=7)
-    ).values('order').distinct().count()
-    
-    customer_ids = order_items.values_list('order__user', flat=True).distinct()
-    customers = len(customer_ids)
-    
- 
-    best_sellers = products.annotate(
-        total_sold=Coalesce(Sum('orderitems__quantity'), 0)
-    ).order_by('-total_sold')[:6]
-    
-    
-    low_stock = products.filter(stock__lt=10)
-    
-  
-    recent_orders = Order.objects.filter(
-        id__in=order_items.values_list('order', flat=True).distinct()
-    ).order_by('-created_at')[:6]
-    
-    context = {
-        'total_sales': total_sales,
-        'new_orders': new_orders,
-        'customers': customers,
-        'best_sellers': best_sellers,
-        'low_stock': low_stock,
-        'recent_orders': recent_orders,
-    }
+    context = analytics.dashboard_context(request.user)
     return render(request, 'seller/seller_dashboard.html', context)
 
 @login_required
@@ -241,13 +205,12 @@ def add_variants(request, product_id):
             return redirect('add_variants', product_id=product.id)
 
         # Check for existing variant with exactly these attributes
-        existing_variants = ProductVariant.objects.filter(product=product).prefetch_related('attributes')
-        for variant in existing_variants:
-            variant_attrs = {attr.id for attr in variant.attributes.all()}
-            selected_attrs = {int(val) for val in selected_values}
-            if variant_attrs == selected_attrs:
-                messages.error(request, "A variant with these exact attributes already exists.")
-                return redirect('add_variants', product_id=product.id)
+        if ProductVariant.objects.filter(
+            product=product,
+            attribute_signature=ProductVariant.signature_for(selected_values)
+        ).exists():
+            messages.error(request, "A variant with these exact attributes already exists.")
+            return redirect('add_variants', product_id=product.id)
 
         # Create new variant
         variant = ProductVariant.objects.create(
@@ -321,6 +284,9 @@ def view_products(request):
         products = Product.objects.filter(seller=request.user, status=status)
     else:
         products = Product.objects.filter(seller=request.user)
+    products = paginate(request, products.select_related('seller', 'category'))
+    if wants_json(request):
+        return json_page(products, ['id', 'sku', 'name', 'status', 'stock', 'base_price'])
     return render(request, 'seller/view_products.html', {'products': products, 'current_status': status or 'all'})
 
 @require_POST
@@ -349,7 +315,9 @@ def seller_orders(request):
         return redirect('dashboard')
 
     seller = request.user
-    order_items = OrderItem.objects.filter(product__seller=seller).select_related('order', 'product')
+    order_items = paginate(request, OrderItem.objects.filter(product__seller=seller).select_related('order__user', 'product'))
+    if wants_json(request):
+        return json_page(order_items, ['id', 'order_id', 'order__status', 'order__created_at', 'product_id', 'product__name', 'quantity', 'price'])
 
     context = {
         'order_items': order_items
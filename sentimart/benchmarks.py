@@ -0,0 +1,89 @@
+"""
+Helpers for the ``bench_*`` management commands.
+
+Benchmarks seed their data into a throwaway test database (never the
+configured one) and report the number of queries and the wall time of the
+code under test, so a regression in either shows up as a failed command.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    """Run the block against a freshly created test database that is dropped afterwards"""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity)
+
+
+@dataclass
+class Measurement:
+    queries: int
+    seconds: float
+
+    def __str__(self):
+        return f"{self.queries} queries, {self.seconds * 1000:.1f} ms"
+
+    def check(self, max_queries=None, max_ms=None, label='benchmark'):
+        """Raise CommandError if the measurement is over either budget"""
+        if max_queries is not None and self.queries > max_queries:
+            raise CommandError(f"{label}: {self.queries} queries, budget is {max_queries}")
+        if max_ms is not None and self.seconds * 1000 > max_ms:
+            raise CommandError(f"{label}: {self.seconds * 1000:.1f} ms, budget is {max_ms} ms")
+
+
+def measure(func, *args, repeat=5, **kwargs):
+    """Query count of one call to ``func`` and its median wall time over ``repeat`` calls"""
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            func(*args, **kwargs)
+            timings.append(time.perf_counter() - started)
+        queries = len(captured)
+    return Measurement(queries, statistics.median(timings))
+
+
+def count_queries(func, *args, **kwargs):
+    with CaptureQueriesContext(connection) as captured:
+        func(*args, **kwargs)
+    return len(captured)
+
+
+def check_query_growth(label, seed, fetch, sizes=(2, 10), max_queries=None):
+    """
+    Render a view at several row counts and require the same number of
+    queries each time. ``seed(n)`` adds ``n`` more rows the view lists and
+    ``fetch()`` requests it; returns the query count per size.
+    """
+    counts = []
+    seeded = 0
+    for size in sizes:
+        seed(size - seeded)
+        seeded = size
+        response = None
+
+        def request():
+            nonlocal response
+            response = fetch()
+
+        counts.append(count_queries(request))
+        if response.status_code != 200:
+            raise CommandError(f"{label}: HTTP {response.status_code} with {size} rows")
+    if len(set(counts)) > 1:
+        detail = ', '.join(f"{size} rows: {count}" for size, count in zip(sizes, counts))
+        raise CommandError(f"{label}: query count grows with rows ({detail})")
+    if max_queries is not None and counts[-1] > max_queries:
+        raise CommandError(f"{label}: {counts[-1]} queries, budget is {max_queries}")
+    return counts
@@ -0,0 +1,145 @@
+"""
+Keyset (seek) pagination.
+
+Instead of OFFSET, each page remembers the ordering key of its last row in
+an opaque cursor token and the next page asks for rows strictly after it,
+so fetching page 1000 costs the same indexed range scan as page 1.
+Nullable keys sort their NULLs last in either direction, so a cursor
+holding NULL still has a well-defined set of rows after it.
+"""
+import base64
+import json
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.http import JsonResponse
+
+PER_PAGE = 20
+CURSOR_PARAM = 'after'
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    next_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``ordering``, e.g. ``('-created_at', '-id')``.
+    The last key must be unique and non-null so every row has a distinct position.
+    """
+
+    def __init__(self, queryset, ordering=('-id',), per_page=PER_PAGE):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = per_page
+        self.fields = [key.lstrip('-') for key in ordering]
+        model_fields = [queryset.model._meta.get_field(name) for name in self.fields]
+        self._parsers = [field.to_python for field in model_fields]
+        self._nullable = [field.null for field in model_fields]
+
+    def _order_by(self):
+        for key, name, nullable in zip(self.ordering, self.fields, self._nullable):
+            if not nullable:
+                yield key
+            elif key.startswith('-'):
+                yield F(name).desc(nulls_last=True)
+            else:
+                yield F(name).asc(nulls_last=True)
+
+    def _after(self, values):
+        """Q matching rows that sort strictly after ``values``"""
+        condition = Q()
+        for i, key in enumerate(self.ordering):
+            if values[i] is None:
+                # NULLs sort last, so only rows tied on this key can come after
+                continue
+            lookup = 'lt' if key.startswith('-') else 'gt'
+            step = Q(**{f'{self.fields[i]}__{lookup}': values[i]})
+            if self._nullable[i]:
+                step |= Q(**{f'{self.fields[i]}__isnull': True})
+            for j in range(i):
+                if values[j] is None:
+                    step &= Q(**{f'{self.fields[j]}__isnull': True})
+                else:
+                    step &= Q(**{self.fields[j]: values[j]})
+            condition |= step
+        # Every key NULL: nothing can follow, rather than serving the first page again
+        return condition or Q(pk__in=[])
+
+    def page(self, cursor=None):
+        queryset = self.queryset.order_by(*self._order_by())
+        values = decode_cursor(cursor) if cursor else None
+        if values and len(values) == len(self.fields):
+            try:
+                values = [parse(value) for parse, value in zip(self._parsers, values)]
+            except ValidationError:
+                values = None
+            if values is not None:
+                queryset = queryset.filter(self._after(values))
+
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            last = rows[-1]
+            next_cursor = encode_cursor([getattr(last, name) for name in self.fields])
+        return KeysetPage(rows, next_cursor)
+
+
+def paginate(request, queryset, ordering=('-id',), per_page=PER_PAGE):
+    """Page of ``queryset`` after the cursor in the request's ``after`` parameter"""
+    return KeysetPaginator(queryset, ordering, per_page).page(request.GET.get(CURSOR_PARAM))
+
+
+def wants_json(request):
+    return request.GET.get('format') == 'json'
+
+
+def _lookup(obj, path):
+    for name in path.split('__'):
+        try:
+            obj = getattr(obj, name, None)
+        except ValueError:
+            # FieldFile.url and .path raise when no file is set
+            return None
+        if obj is None:
+            break
+    return obj
+
+
+def json_page(page, fields):
+    """
+    JSON variant of a listing: ``fields`` of every row (``__`` follows
+    relations) plus the cursor to pass back as ``after`` for the next page.
+    """
+    return JsonResponse({
+        'results': [{field: _lookup(row, field) for field in fields} for row in page],
+        'next_cursor': page.next_cursor,
+    })
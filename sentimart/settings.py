@@ -54,7 +54,8 @@ INSTALLED_APPS = [
     'buyer',
     'delivery_agent',
     'recommendations',
-    'chatbot'
+    'chatbot',
+    'tasks',
 ]
 
 MIDDLEWARE = [
@@ -96,10 +97,29 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # The task worker writes concurrently with the web process; take the
+        # write lock up front instead of failing on a read-to-write upgrade
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process; point this at a shared backend (file, Redis,
+# Memcached) when running several workers so invalidation reaches all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sentimart',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+CATALOG_CACHE_TIMEOUT = 600
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -147,4 +167,39 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
\ No newline at end of file
+STORAGES = {
+    'default': {'BACKEND': 'sentimart.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+THUMBNAIL_SIZES = {'small': 200, 'medium': 400, 'large': 800}
+
+# Background jobs (tasks app): run them in-process after commit instead of
+# through `manage.py run_tasks`, and how long a worker may hold a job before
+# it is considered dead and the job is handed out again
+TASKS_ALWAYS_EAGER = False
+TASKS_LOCK_TIMEOUT = 600
+
+# Automatic delivery dispatch (delivery_agent.dispatch): most open orders an
+# agent is given, and how much each open order lowers an agent's rating score
+DISPATCH_MAX_LOAD = 10
+DISPATCH_LOAD_PENALTY = 0.25
+
+# Chatbot fallback intent classifier, written by `manage.py train_intent_classifier`
+CHATBOT_INTENT_MODEL = os.path.join(BASE_DIR, 'var', 'intent_classifier.joblib')
+CHATBOT_INTENT_MIN_CONFIDENCE = 0.4
+
+# Chat history (chatbot.history): messages kept per session before older
+# ones are compacted into archives, and how often updated_at is refreshed
+CHAT_HOT_MESSAGES = 50
+CHAT_TOUCH_INTERVAL = 60
+
+# Review sentiment (products.sentiment): reviews scored per batch, and how
+# long after a new review the scoring job runs so that reviews queue up
+SENTIMENT_BATCH_SIZE = 1000
+SENTIMENT_BATCH_DELAY = 10
+
+# Product Q&A index (chatbot.retrieval), built by `manage.py build_qa_index`
+# and refreshed by a queued job this many seconds after a catalog change
+CHATBOT_QA_INDEX = os.path.join(BASE_DIR, 'var', 'qa_index')
+CHATBOT_QA_MAX_SEGMENTS = 8
+CHATBOT_QA_REFRESH_DELAY = 30
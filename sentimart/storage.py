@@ -0,0 +1,47 @@
+"""
+Content-addressed file storage.
+
+Uploads are stored under the sha256 of their bytes inside the field's
+``upload_to`` directory (``products/3f/3fa9….jpg``), so the same image
+uploaded for many products, or imported twice, is kept on disk once and
+every record points at the same blob. Image uploads also get their WebP
+thumbnails queued for the task worker (sentimart.thumbnails).
+
+Blobs can be shared, so deleting a file through one record removes it for
+every other record using the same content; the models here never delete
+uploads, and stale blobs should be cleaned up by reference, not per record.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+from sentimart import thumbnails
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, **kwargs):
+        # Rewriting a name only ever writes the same bytes (blobs) or a
+        # regenerated rendition (thumbnails), so an existing file is never a conflict
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def content_name(name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        return '/'.join(filter(None, [directory, hexdigest[:2], f"{hexdigest}{ext}"]))
+
+    def _save(self, name, content):
+        if thumbnails.is_thumbnail(name):
+            return super()._save(name, content)
+        name = self.content_name(name, content)
+        if not self.exists(name):
+            name = super()._save(name, content)
+        thumbnails.schedule(name)
+        return name
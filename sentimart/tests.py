@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from categories.models import Category
+from products.models import Product
+from sentimart.pagination import KeysetPaginator, decode_cursor, encode_cursor
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create(username='seller', user_type='seller')
+        category = Category.objects.create(name='Pages', image='categories/pages.jpg')
+        cls.products = [
+            Product.objects.create(
+                seller=seller, category=category, sub_category='x', name=f'Product {n}', description='',
+                image='products/x.jpg', brand_name='Acme', model_number=str(n), base_price=10, discount=0, stock=1,
+            )
+            for n in range(7)
+        ]
+        # Two rows without a creation date, which sort last either way
+        now = timezone.now()
+        for n, product in enumerate(cls.products[:5]):
+            Product.objects.filter(pk=product.pk).update(created_at=now - timedelta(days=n))
+        Product.objects.filter(pk__in=[p.pk for p in cls.products[5:]]).update(created_at=None)
+
+    def walk(self, ordering, per_page=2):
+        paginator = KeysetPaginator(Product.objects.all(), ordering=ordering, per_page=per_page)
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(product.pk for product in page)
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+
+    def test_descending_pages_end_with_null_keys(self):
+        ids = [p.pk for p in self.products]
+        self.assertEqual(self.walk(('-created_at', '-id')), ids[:5] + [ids[6], ids[5]])
+
+    def test_ascending_pages_end_with_null_keys(self):
+        ids = [p.pk for p in self.products]
+        self.assertEqual(self.walk(('created_at', 'id')), ids[4::-1] + ids[5:])
+
+    def test_page_boundary_on_a_null_key(self):
+        # With three per page the second cursor is the first NULL row
+        ids = [p.pk for p in self.products]
+        self.assertEqual(self.walk(('-created_at', '-id'), per_page=3), ids[:5] + [ids[6], ids[5]])
+
+    def test_cursor_of_null_keys_only_is_the_end(self):
+        paginator = KeysetPaginator(Product.objects.all(), ordering=('-created_at', '-id'))
+        # The last key is never NULL in practice, but such a cursor must not restart at page one
+        self.assertEqual(len(paginator.page(encode_cursor([None, None]))), 0)
+
+    def test_malformed_cursor_serves_the_first_page(self):
+        paginator = KeysetPaginator(Product.objects.all(), ordering=('-id',), per_page=2)
+        self.assertIsNone(decode_cursor('not base64!'))
+        self.assertEqual([p.pk for p in paginator.page('not base64!')], [self.products[6].pk, self.products[5].pk])
+        self.assertEqual([p.pk for p in paginator.page(encode_cursor(['x']))], [self.products[6].pk, self.products[5].pk])
@@ -0,0 +1,66 @@
+"""
+WebP thumbnails for uploaded images.
+
+Each image gets one thumbnail per size in ``THUMBNAIL_SIZES`` (a name to
+bounding-box width map), stored next to the originals under
+``thumbs/<size>/``. They are rendered by a background task queued when the
+upload is saved, so requests never wait for Pillow. Templates pick a size with the
+``thumbnail`` filter from ``product_images`` and fall back to the original
+until the thumbnail exists.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from tasks.queue import task
+
+SIZES = getattr(settings, 'THUMBNAIL_SIZES', {'small': 200, 'medium': 400, 'large': 800})
+QUALITY = getattr(settings, 'THUMBNAIL_QUALITY', 80)
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp'}
+THUMBNAIL_DIR = 'thumbs'
+
+
+def is_image(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def is_thumbnail(name):
+    return name.startswith(f"{THUMBNAIL_DIR}/")
+
+
+def thumbnail_name(name, size):
+    return f"{THUMBNAIL_DIR}/{size}/{os.path.splitext(name)[0]}.webp"
+
+
+def generate(name, storage=None):
+    """Render every missing thumbnail of ``name``; returns the names written"""
+    from PIL import Image, ImageOps
+
+    storage = storage or default_storage
+    missing = {size: width for size, width in SIZES.items() if not storage.exists(thumbnail_name(name, size))}
+    if not missing:
+        return []
+    written = []
+    with storage.open(name, 'rb') as fh:
+        image = ImageOps.exif_transpose(Image.open(fh))
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        for size, width in sorted(missing.items(), key=lambda item: -item[1]):
+            image.thumbnail((width, width))
+            buffer = BytesIO()
+            image.save(buffer, 'WEBP', quality=QUALITY, method=4)
+            written.append(storage.save(thumbnail_name(name, size), ContentFile(buffer.getvalue())))
+    return written
+
+
+@task(max_attempts=2)
+def create_thumbnails(name):
+    generate(name)
+
+
+def schedule(name):
+    """Queue the thumbnails of an uploaded image"""
+    if is_image(name) and not is_thumbnail(name):
+        create_thumbnails.delay(name)
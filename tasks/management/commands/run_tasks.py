@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from tasks.queue import claim, execute, purge, worker_name
+
+PURGE_EVERY = 3600
+
+
+def run_job(job):
+    try:
+        return execute(job)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Tasks to run concurrently')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due')
+        parser.add_argument('--keep-days', type=int, default=7, help='Delete finished tasks older than N days')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        worker = worker_name()
+        running = set()
+        succeeded = failed = 0
+        last_purge = 0.0
+        self.stdout.write(f"Worker {worker} running up to {workers} tasks at a time")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='task') as pool:
+            try:
+                while True:
+                    finished = {future for future in running if future.done()}
+                    running -= finished
+                    for future in finished:
+                        if future.result():
+                            succeeded += 1
+                        else:
+                            failed += 1
+
+                    if time.monotonic() - last_purge > PURGE_EVERY:
+                        purge(options['keep_days'])
+                        last_purge = time.monotonic()
+
+                    close_old_connections()
+                    jobs = claim(workers - len(running), worker) if len(running) < workers else []
+                    running.update(pool.submit(run_job, job) for job in jobs)
+
+                    if jobs:
+                        continue
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll'])
+                    else:
+                        wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping; waiting for running tasks to finish")
+                wait(running)
+
+        self.stdout.write(self.style.SUCCESS(f"{succeeded} tasks done, {failed} failed"))
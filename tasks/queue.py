@@ -0,0 +1,136 @@
+"""
+Database-backed task queue.
+
+Slow side effects are declared with ``@task`` and enqueued with
+``func.delay(*args, **kwargs)``; the call is stored as a Task row once the
+surrounding transaction commits and executed by ``manage.py run_tasks``.
+Arguments must be JSON-serializable, so pass ids rather than model
+instances. A failing task is retried with exponential backoff up to its
+``max_attempts``; a worker that dies mid-task leaves a lock that expires
+after ``TASKS_LOCK_TIMEOUT`` seconds, after which another worker picks the
+task up again, so tasks should be safe to run twice.
+
+With ``TASKS_ALWAYS_EAGER`` the task runs in-process right after commit
+instead, which is handy for tests and single-process development.
+"""
+import logging
+import os
+import socket
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+ALWAYS_EAGER = getattr(settings, 'TASKS_ALWAYS_EAGER', False)
+LOCK_TIMEOUT = getattr(settings, 'TASKS_LOCK_TIMEOUT', 600)
+
+registry = {}
+
+
+class TaskFunction:
+    def __init__(self, func, name, max_attempts, retry_delay):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return self.schedule(args, kwargs)
+
+    def schedule(self, args=(), kwargs=None, countdown=0):
+        """Enqueue a call once the current transaction commits"""
+        kwargs = kwargs or {}
+        if ALWAYS_EAGER:
+            transaction.on_commit(lambda: self.func(*args, **kwargs))
+            return
+        transaction.on_commit(lambda: Task.objects.create(
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs,
+            max_attempts=self.max_attempts,
+            run_at=timezone.now() + timedelta(seconds=countdown),
+        ))
+
+    def backoff(self, attempts):
+        return timedelta(seconds=self.retry_delay * 2 ** (attempts - 1))
+
+
+def task(func=None, *, name=None, max_attempts=3, retry_delay=30):
+    """Register ``func`` as a task; its default name is its dotted import path"""
+    def register(func):
+        task_name = name or f"{func.__module__}.{func.__qualname__}"
+        registry[task_name] = TaskFunction(func, task_name, max_attempts, retry_delay)
+        return registry[task_name]
+
+    return register(func) if func is not None else register
+
+
+def get_task(name):
+    if name not in registry:
+        # Importing the defining module registers it
+        import_string(name)
+    return registry[name]
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(limit, worker):
+    """Lock up to ``limit`` due tasks for ``worker`` and return them"""
+    now = timezone.now()
+    Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=now - timedelta(seconds=LOCK_TIMEOUT),
+    ).update(status=Task.QUEUED, locked_by='', locked_at=None)
+
+    due = Task.objects.filter(status=Task.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic() if skip_locked else nullcontext():
+        if skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:limit])
+        # The status condition makes the claim safe where SKIP LOCKED is unavailable
+        Task.objects.filter(id__in=ids, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+        )
+    return list(Task.objects.filter(id__in=ids, status=Task.RUNNING, locked_by=worker))
+
+
+def execute(job):
+    """Run one claimed task and record the outcome"""
+    try:
+        func = get_task(job.name)
+        func(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Task %s #%s failed (attempt %s/%s)", job.name, job.id, job.attempts, job.max_attempts)
+        if job.attempts < job.max_attempts:
+            delay = func.backoff(job.attempts) if job.name in registry else timedelta(seconds=30)
+            Task.objects.filter(pk=job.pk).update(
+                status=Task.QUEUED, run_at=timezone.now() + delay, locked_by='', locked_at=None, last_error=error,
+            )
+        else:
+            Task.objects.filter(pk=job.pk).update(status=Task.FAILED, finished_at=timezone.now(), last_error=error)
+        return False
+    Task.objects.filter(pk=job.pk).update(status=Task.DONE, finished_at=timezone.now())
+    return True
+
+
+def purge(older_than_days=7):
+    """Delete finished tasks older than the given age"""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted, _ = Task.objects.filter(status=Task.DONE, finished_at__lt=cutoff).delete()
+    return deleted